@@ -1,7 +1,8 @@
 from src.selenium_finsemble_launcher import \
     launch_chromedriver_for_finsemble_from_src, launch_chromedriver_for_finsemble_from_exe
+from src.component_readiness import ComponentReadinessWaiter, ReadinessCondition
 from src.finsemble_component_discoverer import FinsembleComponentDiscoverer
-from src.wait import wait_until
+from src.input_macro import InputMacro, InputMacroRunner
 from selenium.webdriver.common.by import By
 from selenium.webdriver.common.keys import Keys
 
@@ -67,21 +68,24 @@ driver.execute_script(
 )
 
 
-# We can use the same `FinsembleComponentDiscoverer` as above to easily find the new app window that we
-# just launched, and target it with Selenium.
-print("Locating the example ChartIQ app window with Selenium...")
-chartiq_app_handle = component_discoverer.get_selenium_handle_of_page_containing_url('Finsemble-SD-ChartIQ/technical-analysis-chart.html')
+# The new app window can be found by its URL the moment it opens, but it won't be usable until it has finished
+# loading. The `ComponentReadinessWaiter` waits for both at once: it finds the window, then waits for Finsemble to
+# signal (from within the window itself) that it's ready - rather than polling for the URL, then polling the DOM.
+print("Waiting for the example ChartIQ app window to be ready...")
+component_readiness = ComponentReadinessWaiter(driver, component_discoverer)
+chartiq_app_handle = component_readiness.wait_for_ready('Finsemble-SD-ChartIQ/technical-analysis-chart.html').handle
 driver.switch_to.window(chartiq_app_handle)
 
 
 # All standard Selenium operations that you would perform in a normal web app are available to you even from within
-# Finsemble. You can send keyboard input into an app's window...
+# Finsemble. You can send keyboard input into an app's window... Rather than a `send_keys()` command (and round trip)
+# per hotkey, an `InputMacro` describes the whole sequence up front, and is dispatched into the window in one go.
 print("Zooming out & in of the example ChartIQ app via hotkeys...")
-chartiq_window_body = driver.find_element(By.TAG_NAME, 'body')
-for i in range(5):
-    chartiq_window_body.send_keys(Keys.CONTROL, Keys.SUBTRACT)  # Ctrl -
-for i in range(5):
-    chartiq_window_body.send_keys(Keys.CONTROL, Keys.ADD)  # Ctrl +
+input_macros = InputMacroRunner(driver, component_discoverer)
+zoom_out_and_in = InputMacro('zoom_out_and_in') \
+    .send_keys(Keys.CONTROL, Keys.SUBTRACT).repeat(5) \
+    .then(InputMacro().send_keys(Keys.CONTROL, Keys.ADD).repeat(5))  # Ctrl - (x5), then Ctrl + (x5)
+print(f"  {input_macros.run(zoom_out_and_in, chartiq_app_handle)}")
 
 
 # ... And you can also locate DOM elements to interact with. In a larger e2e test framework, you should
@@ -92,17 +96,17 @@ driver.find_element(By.TAG_NAME, 'cq-share-create').click()
 
 
 # Use explicit "wait logic" to pause the e2e execution until the underlying app finishes working...
-# (Better than hard-coded sleeps.)
-def _get_share_url_when_complete() -> str:
-    try:
-        url = driver.find_element(By.CLASS_NAME, 'share-link-div').text
-        return url if url.startswith("http") else ""
-    except:
-        return ""
-
+# (Better than hard-coded sleeps.) The condition is re-checked within the app's window every time its DOM changes, and
+# whatever it evaluates to once it's "truth-y" is handed back.
+SHARE_URL_WHEN_COMPLETE = """(() => {
+    const shareLink = document.querySelector('.share-link-div');
+    const url = shareLink ? shareLink.textContent.trim() : '';
+    return url.startsWith('http') ? url : '';
+})()"""
 
 print("Waiting for the example ChartIQ app to finish generating a screenshot...")
-share_link_result = wait_until(lambda: _get_share_url_when_complete(), timeout_in_seconds=10)
+share_link_result = component_readiness.wait_for_ready(
+    ReadinessCondition('Finsemble-SD-ChartIQ/technical-analysis-chart.html', SHARE_URL_WHEN_COMPLETE)).value
 print(f"Your screenshot generated by an e2e script is available at: {share_link_result}")
 
 
@@ -114,6 +118,7 @@ driver.execute_script(
 )
 
 print("Closing ChromeDriver...")
+input_macros.close()
 driver.quit()
 
 print("Goodbye.")
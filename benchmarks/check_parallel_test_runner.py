@@ -0,0 +1,209 @@
+"""
+Checks of `ParallelTestRunner`'s scheduling, run against a fake launcher so that they need nothing but Python (i.e.
+they can run on a plain Linux CI agent.) The fake sessions can be made to crash, and the fake launcher to fail, so that
+the crash, relaunch and retire paths are all exercised without starting Electron.
+
+Usage (from the root of this repo):
+    $ python -m benchmarks.check_parallel_test_runner   # Exits with 1 if any check fails.
+"""
+
+from __future__ import annotations
+import sys
+import time
+from src.parallel_test_runner import ParallelRunReport, ParallelTestRunner, ScenarioResult
+from src.wait import BackoffPolicy
+from threading import Lock, Thread, current_thread
+from typing import Callable, Dict, List, Optional
+
+
+# Fail a check rather than hang forever if the runner never finishes.
+_RUN_TIMEOUT_IN_SECONDS: float = 30
+
+_LAUNCH_DELAY_IN_SECONDS: float = 0.05
+
+
+class FakeDriver:
+    def __init__(self, session: FakeSession) -> None:
+        self._session: FakeSession = session
+
+    @property
+    def window_handles(self) -> List[str]:
+        if not self._session.is_alive:
+            raise ConnectionRefusedError('The fake session has crashed.')
+        return ['CDwindow-TOOLBAR']
+
+
+class FakeSession:
+    """
+    A stand-in for a `FinsembleSession`, which "crashes" when `crash()` is called.
+    """
+
+    def __init__(self, worker_name: str) -> None:
+        self.worker_name: str = worker_name
+        self.is_alive: bool = True
+        self.driver: FakeDriver = FakeDriver(self)
+
+    def crash(self) -> None:
+        self.is_alive = False
+
+    def quit(self) -> None:
+        self.is_alive = False
+
+
+class FakeLauncher:
+    """
+    Launches `FakeSession`s, failing every launch made by the workers whose thread names are listed in
+    `failing_workers`. Every launch attempt is recorded, by worker.
+    """
+
+    def __init__(self, failing_workers: Optional[List[str]] = None) -> None:
+        self.failing_workers: List[str] = failing_workers or []
+        self.launch_times_by_worker: Dict[str, List[float]] = {}
+        self._lock: Lock = Lock()
+
+    def __call__(self) -> FakeSession:
+        worker_name = current_thread().name
+        with self._lock:
+            self.launch_times_by_worker.setdefault(worker_name, []).append(time.monotonic())
+        if any(worker_name.endswith(f'-{failing_worker}') for failing_worker in self.failing_workers):
+            raise Exception(f'The fake launcher refuses to launch for {worker_name}.')
+        return FakeSession(worker_name)
+
+
+def _run(launcher: FakeLauncher, scenarios: Dict[str, Callable], worker_count: int,
+         **runner_options) -> Optional[ParallelRunReport]:
+    """
+    :return: The report of the run, or `None` if it didn't finish within `_RUN_TIMEOUT_IN_SECONDS`.
+    """
+
+    runner = ParallelTestRunner(launcher, worker_count,
+                                launch_backoff=BackoffPolicy.fixed(_LAUNCH_DELAY_IN_SECONDS), **runner_options)
+    reports = []
+    thread = Thread(target=lambda: reports.append(runner.run(scenarios)), daemon=True)
+    thread.start()
+    thread.join(_RUN_TIMEOUT_IN_SECONDS)
+    return reports[0] if reports else None
+
+
+def _get_statuses(report: ParallelRunReport) -> Dict[str, str]:
+    return {result.name: result.status for result in report.results}
+
+
+def _sleep_then(duration_in_seconds: float, then: Optional[Callable] = None) -> Callable:
+    def _scenario(session: FakeSession) -> None:
+        time.sleep(duration_in_seconds)
+        if then:
+            then(session)
+    return _scenario
+
+
+def _fail(_session: FakeSession) -> None:
+    raise AssertionError('This scenario always fails.')
+
+
+def check_passes_and_failures() -> List[str]:
+    scenarios = {f'pass-{index}': _sleep_then(0.01) for index in range(6)}
+    scenarios['fail'] = _fail
+    report = _run(FakeLauncher(), scenarios, worker_count=3)
+    if report is None:
+        return ['The run did not finish.']
+
+    expected = {name: ScenarioResult.PASSED for name in scenarios}
+    expected['fail'] = ScenarioResult.FAILED
+    return [] if _get_statuses(report) == expected else [f'Unexpected statuses: {_get_statuses(report)}']
+
+
+def check_crash_and_relaunch() -> List[str]:
+    crashed_once = []
+
+    def _crash_once(session: FakeSession) -> None:
+        if not crashed_once:
+            crashed_once.append(session.worker_name)
+            session.crash()
+            raise ConnectionRefusedError('The session crashed.')
+
+    def _always_crash(session: FakeSession) -> None:
+        session.crash()
+        raise ConnectionRefusedError('The session crashed.')
+
+    report = _run(FakeLauncher(), {'crash-once': _crash_once, 'always-crash': _always_crash}, worker_count=1)
+    if report is None:
+        return ['The run did not finish.']
+
+    failures = []
+    crash_once, always_crash = report.results
+    if (crash_once.status, crash_once.attempts) != (ScenarioResult.PASSED, 2):
+        failures.append(f'"crash-once" should pass on its second attempt: {crash_once.to_dict()}')
+    if (always_crash.status, always_crash.attempts) != (ScenarioResult.CRASHED, 2):
+        failures.append(f'"always-crash" should crash on both attempts: {always_crash.to_dict()}')
+    if report.relaunch_count != 3:
+        failures.append(f'Expected 3 relaunches, not {report.relaunch_count}.')
+    return failures
+
+
+def check_retired_worker_hands_its_scenario_back() -> List[str]:
+    # Worker 1 finishes its own (short) shard long before worker 0 has given up launching, and so has to wait for the
+    # scenario that worker 0 gives back when it retires, rather than stopping.
+    launcher = FakeLauncher(failing_workers=['0'])
+    scenarios = {'long': _sleep_then(0.01), 'short': _sleep_then(0.0)}
+    report = _run(launcher, scenarios, worker_count=2, max_launch_failures_per_worker=3)
+    if report is None:
+        return ['The run did not finish.']
+
+    failures = []
+    if set(_get_statuses(report).values()) != {ScenarioResult.PASSED}:
+        failures.append(f'Every scenario should have been run by the healthy worker: {_get_statuses(report)}')
+    launch_times = launcher.launch_times_by_worker.get('ParallelTestRunner-worker-0', [])
+    if len(launch_times) != 3:
+        failures.append(f'The failing worker should launch 3 times before retiring, not {len(launch_times)}.')
+    gaps = [later - earlier for earlier, later in zip(launch_times, launch_times[1:])]
+    if any(gap < _LAUNCH_DELAY_IN_SECONDS * 0.9 for gap in gaps):
+        failures.append(f'Failed launches should be retried after a delay: {gaps}')
+    return failures
+
+
+def check_every_worker_retiring() -> List[str]:
+    report = _run(FakeLauncher(failing_workers=['0', '1']), {'a': _sleep_then(0.0), 'b': _sleep_then(0.0)},
+                  worker_count=2, max_launch_failures_per_worker=2)
+    if report is None:
+        return ['The run did not finish.']
+    statuses = _get_statuses(report)
+    return [] if set(statuses.values()) == {ScenarioResult.NOT_RUN} else [f'Unexpected statuses: {statuses}']
+
+
+def check_health_check_errors() -> List[str]:
+    def _raising_health_check(_session: FakeSession) -> bool:
+        raise RuntimeError('The health check itself is broken.')
+
+    scenarios = {'fail': _fail, **{f'pass-{index}': _sleep_then(0.01) for index in range(4)}}
+    report = _run(FakeLauncher(), scenarios, worker_count=2, health_check=_raising_health_check)
+    if report is None:
+        return ['The run did not finish.']
+
+    expected = {name: ScenarioResult.PASSED for name in scenarios}
+    expected['fail'] = ScenarioResult.ERROR
+    return [] if _get_statuses(report) == expected else [f'Unexpected statuses: {_get_statuses(report)}']
+
+
+CHECKS: List[Callable[[], List[str]]] = [
+    check_passes_and_failures,
+    check_crash_and_relaunch,
+    check_retired_worker_hands_its_scenario_back,
+    check_every_worker_retiring,
+    check_health_check_errors
+]
+
+
+def main() -> int:
+    failed_check_count = 0
+    for check in CHECKS:
+        failures = check()
+        print(f'[{"FAIL" if failures else "ok":>4}] {check.__name__}')
+        for failure in failures:
+            print(f'         {failure}')
+        failed_check_count += bool(failures)
+    return 1 if failed_check_count else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
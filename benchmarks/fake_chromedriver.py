@@ -0,0 +1,422 @@
+from __future__ import annotations
+import base64
+import hashlib
+import json
+import random
+import re
+import socket
+import struct
+import time
+import uuid
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Event, Lock, Thread
+from typing import IO, Dict, Iterator, List, Optional, Set
+
+
+# Appended to a websocket client's key to compute the `Sec-WebSocket-Accept` header. (See RFC 6455, section 1.3.)
+_WEBSOCKET_GUID: str = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+_WEBSOCKET_TEXT_OPCODE: int = 0x1
+_WEBSOCKET_CLOSE_OPCODE: int = 0x8
+_WEBSOCKET_PING_OPCODE: int = 0x9
+_WEBSOCKET_PONG_OPCODE: int = 0xA
+
+
+class FakeChromeDriverServer:
+    """
+    A local stand-in for ChromeDriver (speaking the JSON Wire Protocol, as the rest of this project expects) and for
+    the Remote Debugger that sits alongside it, so that page discovery & waiting can be exercised and measured on any
+    machine - without Windows, Electron, or a running Finsemble.
+
+    Both are served from the same port. The fake simulates any number of windows, a per-request response latency, and
+    (optionally) "churn": windows closing and new ones opening in the background at a steady rate. Every request is
+    counted by endpoint, so that the number of requests a lookup costs can be measured.
+
+    Only the endpoints used by this project's discovery & waiting helpers are implemented: `/sessions`, `/json`,
+    `/json/version`, and the WebDriver session commands to create & quit a session, list, focus, and query windows, and
+    execute scripts (which always return `null`.)
+
+    `/json/version` also advertises a browser-level DevTools websocket, so that discovery via pushed target events
+    (see `CdpTargetWatcher`) can be measured too. It answers `Target.setDiscoverTargets` & `Target.getTargets`, and
+    from then on pushes a `Target.targetCreated` / `Target.targetDestroyed` event whenever a window opens or closes.
+    Every DevTools command is counted as a request; pushed events are not.
+    """
+
+    def __init__(self, window_count: int = 10, latency_in_seconds: float = 0.0, churn_per_second: float = 0.0,
+                 debugger_available: bool = True, stable_window_count: int = 1, seed: int = 0) -> None:
+        """
+        :param window_count: The number of windows open to begin with, including the Toolbar.
+        :type window_count: int
+
+        :param latency_in_seconds: How long every response is delayed by.
+        :type latency_in_seconds: float
+
+        :param churn_per_second: How many times per second a random window (other than the stable ones) is closed and
+                                 replaced by a new one. `0` disables churn.
+        :type churn_per_second: float
+
+        :param debugger_available: Whether or not `/sessions` advertises the Remote Debugger. If not, helpers have to
+                                   fall back to discovering windows with Selenium alone.
+        :type debugger_available: bool
+
+        :param stable_window_count: How many of the initial windows (starting with the Toolbar) never churn, so that
+                                    lookups for them always succeed.
+        :type stable_window_count: int
+
+        :param seed: The seed for the (deterministic) choice of which windows churn.
+        :type seed: int
+        """
+
+        self.latency_in_seconds: float = latency_in_seconds
+        self.churn_per_second: float = churn_per_second
+        self.debugger_available: bool = debugger_available
+        self.request_counts: Counter = Counter()
+
+        self._random: random.Random = random.Random(seed)
+        self._lock: Lock = Lock()
+        self._windows: Dict[str, dict] = {}
+        self._stable_handles: Set[str] = set()
+        self._window_serial: int = 0
+        self._focused_handle: Optional[str] = None
+        self._session_id: Optional[str] = None
+        self._browser_target_id: str = uuid.UUID(int=self._random.getrandbits(128)).hex.upper()
+        self._devtools_clients: List[_DevToolsClient] = []
+        self._stopped: Event = Event()
+
+        self.spawn_window('http://localhost:3375/components/toolbar/Toolbar/index.html', 'Toolbar',
+                          stable=stable_window_count > 0)
+        for index in range(1, window_count):
+            self.spawn_window(stable=index < stable_window_count)
+
+        self._server: ThreadingHTTPServer = ThreadingHTTPServer(('127.0.0.1', 0), self._create_request_handler())
+        self._server.daemon_threads = True
+        self._threads: List[Thread] = [Thread(target=self._server.serve_forever, daemon=True)]
+        if churn_per_second > 0:
+            self._threads.append(Thread(target=self._churn, daemon=True))
+
+    @property
+    def port(self) -> int:
+        return self._server.server_address[1]
+
+    @property
+    def url(self) -> str:
+        """
+        :return: The URL to use as a Selenium `command_executor`.
+        :rtype: str
+        """
+
+        return f'http://127.0.0.1:{self.port}'
+
+    @property
+    def window_handles(self) -> List[str]:
+        with self._lock:
+            return list(self._windows)
+
+    @property
+    def window_urls(self) -> List[str]:
+        with self._lock:
+            return [window['url'] for window in self._windows.values()]
+
+    def start(self) -> FakeChromeDriverServer:
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stopped.set()
+        self._server.shutdown()
+        self._server.server_close()
+        with self._lock:
+            devtools_clients = list(self._devtools_clients)
+        for client in devtools_clients:
+            client.disconnect()
+
+    def __enter__(self) -> FakeChromeDriverServer:
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    def reset_request_counts(self) -> None:
+        with self._lock:
+            self.request_counts.clear()
+
+    def spawn_window(self, url: Optional[str] = None, title: Optional[str] = None, stable: bool = False) -> str:
+        """
+        Open a new window.
+
+        :param url: The window's URL. Defaults to a unique component URL.
+        :type url: Optional[str]
+
+        :param title: The window's title.
+        :type title: Optional[str]
+
+        :param stable: If true, the window is never closed by churn.
+        :type stable: bool
+
+        :return: The Selenium window handle of the new window.
+        :rtype: str
+        """
+
+        with self._lock:
+            self._window_serial += 1
+            target_id = uuid.UUID(int=self._random.getrandbits(128)).hex.upper()
+            handle = f'CDwindow-{target_id}'
+            window = self._windows[handle] = {
+                'id': target_id,
+                'url': url or f'http://localhost:3375/components/app-{self._window_serial}/index.html',
+                'title': title or f'App {self._window_serial}'
+            }
+            if stable:
+                self._stable_handles.add(handle)
+            if self._focused_handle is None:
+                self._focused_handle = handle
+            devtools_clients = [client for client in self._devtools_clients if client.is_discovering_targets]
+        for client in devtools_clients:
+            client.send({'method': 'Target.targetCreated', 'params': {'targetInfo': self._get_target_info(window)}})
+        return handle
+
+    def close_window(self, handle: str) -> None:
+        with self._lock:
+            window = self._windows.pop(handle, None)
+            self._stable_handles.discard(handle)
+            if self._focused_handle == handle:
+                self._focused_handle = None
+            devtools_clients = [client for client in self._devtools_clients if client.is_discovering_targets]
+        if window:
+            for client in devtools_clients:
+                client.send({'method': 'Target.targetDestroyed', 'params': {'targetId': window['id']}})
+
+    def _churn(self) -> None:
+        while not self._stopped.wait(1 / self.churn_per_second):
+            with self._lock:
+                closable_handles = [handle for handle in self._windows if handle not in self._stable_handles]
+            if closable_handles:
+                self.close_window(self._random.choice(closable_handles))
+                self.spawn_window()
+
+    def _create_request_handler(self) -> type:
+        server = self
+
+        class _RequestHandler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # Headers & body are written separately, which Nagle's algorithm would otherwise delay by ~40ms.
+            disable_nagle_algorithm = True
+
+            def do_GET(self) -> None:
+                is_websocket_upgrade = self.headers.get('Upgrade', '').lower() == 'websocket'
+                if is_websocket_upgrade and self.path.startswith('/devtools/browser/'):
+                    self._handle_devtools_websocket()
+                else:
+                    self._handle('GET')
+
+            def do_POST(self) -> None:
+                self._handle('POST')
+
+            def do_DELETE(self) -> None:
+                self._handle('DELETE')
+
+            def log_message(self, *args) -> None:
+                pass
+
+            def _handle(self, method: str) -> None:
+                content_length = int(self.headers.get('Content-Length') or 0)
+                body = json.loads(self.rfile.read(content_length) or b'{}') if content_length else {}
+                if server.latency_in_seconds:
+                    time.sleep(server.latency_in_seconds)
+                endpoint, response = server._respond(method, self.path, body)
+                with server._lock:
+                    server.request_counts[endpoint] += 1
+
+                response_body = json.dumps(response).encode()
+                # ChromeDriver reports JSON Wire Protocol errors via the response's `status`, not the HTTP status.
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json; charset=utf-8')
+                self.send_header('Content-Length', str(len(response_body)))
+                self.end_headers()
+                self.wfile.write(response_body)
+
+            def _handle_devtools_websocket(self) -> None:
+                accept_key = base64.b64encode(hashlib.sha1(
+                    (self.headers['Sec-WebSocket-Key'] + _WEBSOCKET_GUID).encode()).digest()).decode()
+                self.send_response(101)
+                self.send_header('Upgrade', 'websocket')
+                self.send_header('Connection', 'Upgrade')
+                self.send_header('Sec-WebSocket-Accept', accept_key)
+                self.end_headers()
+                self.wfile.flush()
+                self.close_connection = True
+
+                client = _DevToolsClient(self.connection, self.rfile, self.wfile)
+                with server._lock:
+                    server._devtools_clients.append(client)
+                try:
+                    for message in client.receive_messages():
+                        command = json.loads(message)
+                        if server.latency_in_seconds:
+                            time.sleep(server.latency_in_seconds)
+                        server._respond_to_devtools_command(client, command)
+                finally:
+                    with server._lock:
+                        server._devtools_clients.remove(client)
+
+        return _RequestHandler
+
+    def _respond(self, method: str, path: str, body: dict) -> tuple:
+        """
+        :return: The name of the endpoint that was requested (for counting), and the JSON response to it.
+        """
+
+        path = path.split('?', 1)[0].rstrip('/')
+        session_match = re.match(r'^/session/([^/]+)(/.*)?$', path)
+        command = f'{method} {session_match.group(2) or ""}' if session_match else f'{method} {path}'
+
+        with self._lock:
+            if command == 'GET /json':
+                return command, self._list_pages()
+            if command == 'GET /json/version':
+                return command, {'Browser': 'FakeChrome/1.0', 'Protocol-Version': '1.3',
+                                 'webSocketDebuggerUrl': f'ws://127.0.0.1:{self.port}/devtools/browser/'
+                                                         f'{self._browser_target_id}'}
+            if command == 'GET /sessions':
+                return command, {'status': 0, 'value': [{'id': self._session_id, 'capabilities': self._capabilities()}]
+                                 if self._session_id else []}
+            if command == 'POST /session':
+                self._session_id = uuid.uuid4().hex
+                return command, {'status': 0, 'sessionId': self._session_id, 'value': self._capabilities()}
+            if command == 'GET /status':
+                return command, {'status': 0, 'value': {'ready': True}}
+            if not session_match:
+                return command, {'status': 9, 'value': {'message': f'Unknown command: {command}'}}
+            return command, self._respond_to_session_command(command, body)
+
+    def _respond_to_session_command(self, command: str, body: dict) -> dict:
+        if command == 'DELETE ':
+            self._session_id = None
+            return {'status': 0, 'value': None}
+        if command == 'GET /window_handles':
+            return {'status': 0, 'value': list(self._windows)}
+        if command == 'POST /window':
+            handle = body.get('name') or body.get('handle')
+            if handle not in self._windows:
+                return {'status': 23, 'value': {'message': 'no such window'}}
+            self._focused_handle = handle
+            return {'status': 0, 'value': None}
+        if command == 'POST /execute':
+            return {'status': 0, 'value': None}
+
+        if self._focused_handle not in self._windows:
+            return {'status': 23, 'value': {'message': 'no such window: target window already closed'}}
+        focused_window = self._windows[self._focused_handle]
+        if command == 'GET /window_handle':
+            return {'status': 0, 'value': self._focused_handle}
+        if command == 'GET /url':
+            return {'status': 0, 'value': focused_window['url']}
+        if command == 'GET /title':
+            return {'status': 0, 'value': focused_window['title']}
+        return {'status': 9, 'value': {'message': f'Unknown command: {command}'}}
+
+    def _capabilities(self) -> dict:
+        chrome_options = {'debuggerAddress': f'127.0.0.1:{self.port}'} if self.debugger_available else {}
+        return {'browserName': 'chrome', 'goog:chromeOptions': chrome_options}
+
+    def _list_pages(self) -> list:
+        return [{'id': window['id'], 'type': 'page', 'title': window['title'], 'url': window['url']}
+                for window in self._windows.values()]
+
+    def _respond_to_devtools_command(self, client: _DevToolsClient, command: dict) -> None:
+        method = command.get('method')
+        with self._lock:
+            self.request_counts[f'CDP {method}'] += 1
+            target_infos = [self._get_target_info(window) for window in self._windows.values()]
+            if method == 'Target.setDiscoverTargets':
+                client.is_discovering_targets = bool(command.get('params', {}).get('discover'))
+
+        if method == 'Target.getTargets':
+            client.send({'id': command['id'], 'result': {'targetInfos': target_infos}})
+        elif method == 'Target.setDiscoverTargets':
+            client.send({'id': command['id'], 'result': {}})
+            if client.is_discovering_targets:
+                # As Chromium does, announce every already-existing target right after subscribing.
+                for target_info in target_infos:
+                    client.send({'method': 'Target.targetCreated', 'params': {'targetInfo': target_info}})
+        else:
+            client.send({'id': command['id'], 'error': {'code': -32601, 'message': f"'{method}' wasn't found"}})
+
+    @staticmethod
+    def _get_target_info(window: dict) -> dict:
+        return {'targetId': window['id'], 'type': 'page', 'title': window['title'], 'url': window['url'],
+                'attached': False}
+
+
+class _DevToolsClient:
+    """
+    The server's end of a single DevTools websocket connection. Only what `CdpConnection` needs is implemented:
+    unfragmented text messages, pings, and closing.
+    """
+
+    def __init__(self, connection: socket.socket, reader: IO[bytes], writer: IO[bytes]) -> None:
+        self.is_discovering_targets: bool = False
+        self._connection: socket.socket = connection
+        self._reader: IO[bytes] = reader
+        self._writer: IO[bytes] = writer
+        self._send_lock: Lock = Lock()
+
+    def receive_messages(self) -> Iterator[str]:
+        """
+        Yield every text message the client sends, until it closes the connection.
+        """
+
+        while True:
+            try:
+                opcode, payload = self._read_frame()
+            except (OSError, struct.error):
+                return
+            if opcode == _WEBSOCKET_CLOSE_OPCODE:
+                self._send_frame(_WEBSOCKET_CLOSE_OPCODE, payload[:2])
+                return
+            if opcode == _WEBSOCKET_PING_OPCODE:
+                self._send_frame(_WEBSOCKET_PONG_OPCODE, payload)
+            elif opcode == _WEBSOCKET_TEXT_OPCODE:
+                yield payload.decode()
+
+    def send(self, message: dict) -> None:
+        self._send_frame(_WEBSOCKET_TEXT_OPCODE, json.dumps(message).encode())
+
+    def disconnect(self) -> None:
+        try:
+            self._connection.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+    def _read_frame(self) -> tuple:
+        first_byte, second_byte = struct.unpack('!BB', self._read_exactly(2))
+        length = second_byte & 0x7F
+        if length == 126:
+            length, = struct.unpack('!H', self._read_exactly(2))
+        elif length == 127:
+            length, = struct.unpack('!Q', self._read_exactly(8))
+        # Frames sent by a client are always masked.
+        mask = self._read_exactly(4) if second_byte & 0x80 else bytes(4)
+        payload = bytes(byte ^ mask[index % 4] for index, byte in enumerate(self._read_exactly(length)))
+        return first_byte & 0x0F, payload
+
+    def _read_exactly(self, size: int) -> bytes:
+        data = self._reader.read(size)
+        if len(data) < size:
+            raise OSError('The DevTools client disconnected.')
+        return data
+
+    def _send_frame(self, opcode: int, payload: bytes) -> None:
+        if len(payload) < 126:
+            header = struct.pack('!BB', 0x80 | opcode, len(payload))
+        elif len(payload) < 65536:
+            header = struct.pack('!BBH', 0x80 | opcode, 126, len(payload))
+        else:
+            header = struct.pack('!BBQ', 0x80 | opcode, 127, len(payload))
+        try:
+            with self._send_lock:
+                self._writer.write(header + payload)
+                self._writer.flush()
+        except OSError:
+            pass
@@ -0,0 +1,269 @@
+"""
+Benchmarks of the hot paths of page discovery & waiting, run against `FakeChromeDriverServer` so that they need nothing
+but Python (i.e. they can run on a plain Linux CI agent.)
+
+Each benchmark reports the latency of a single lookup, and how many HTTP requests (to ChromeDriver and the Remote
+Debugger combined) a lookup costs. Request counts are deterministic for a given window count, so they make for a
+reliable regression check; latencies are reported too, but compared against a much looser tolerance.
+
+Usage (from the root of this repo):
+    $ python -m benchmarks.run_benchmarks --window-counts 10,100,1000 --output results.json
+    $ python -m benchmarks.run_benchmarks --baseline results.json   # Exits with 1 if anything has regressed.
+"""
+
+from __future__ import annotations
+import argparse
+import json
+import statistics
+import sys
+import time
+from benchmarks.fake_chromedriver import FakeChromeDriverServer
+from selenium import webdriver
+from src.chromedriver_remote_debugger import RemoteDebugger
+from src.finsemble_component_discoverer import FinsembleComponentDiscoverer
+from src.wait import wait_until
+from threading import Timer
+from typing import Callable, Dict, List, Optional
+
+
+# The number of windows looked up by the multi-window lookup benchmark.
+_LOOKUP_COUNT: int = 10
+
+
+class BenchmarkResult:
+    """
+    The measurements of a single benchmark, at a single window count.
+    """
+
+    def __init__(self, name: str, window_count: int, latencies_in_seconds: List[float], request_count: int) -> None:
+        self.name: str = name
+        self.window_count: int = window_count
+        self.lookup_count: int = len(latencies_in_seconds)
+        self.mean_in_ms: float = statistics.mean(latencies_in_seconds) * 1000
+        self.p50_in_ms: float = _percentile(latencies_in_seconds, 0.5) * 1000
+        self.p95_in_ms: float = _percentile(latencies_in_seconds, 0.95) * 1000
+        self.requests_per_lookup: float = request_count / len(latencies_in_seconds)
+
+    @property
+    def key(self) -> str:
+        return f'{self.name}[{self.window_count}]'
+
+    def to_dict(self) -> dict:
+        return {
+            'name': self.name,
+            'window_count': self.window_count,
+            'lookup_count': self.lookup_count,
+            'mean_in_ms': self.mean_in_ms,
+            'p50_in_ms': self.p50_in_ms,
+            'p95_in_ms': self.p95_in_ms,
+            'requests_per_lookup': self.requests_per_lookup
+        }
+
+
+def run_benchmarks(window_counts: List[int], repetitions: int = 20, latency_in_seconds: float = 0.0,
+                   churn_per_second: float = 0.0) -> List[BenchmarkResult]:
+    """
+    Run every benchmark at each of the given window counts.
+
+    :param window_counts: The numbers of windows to simulate, e.g. `[10, 100, 1000]`.
+    :type window_counts: List[int]
+
+    :param repetitions: The number of lookups to measure per benchmark. (Cold fallback lookups, which visit every
+                        window, are measured a fifth as many times.)
+    :type repetitions: int
+
+    :param latency_in_seconds: The simulated latency of every ChromeDriver & Remote Debugger response.
+    :type latency_in_seconds: float
+
+    :param churn_per_second: The simulated rate at which windows are replaced in the background.
+    :type churn_per_second: float
+
+    :return: The results of every benchmark.
+    :rtype: List[BenchmarkResult]
+    """
+
+    results = []
+    for window_count in window_counts:
+        def _create_server(debugger_available: bool = True) -> FakeChromeDriverServer:
+            return FakeChromeDriverServer(window_count, latency_in_seconds, churn_per_second, debugger_available,
+                                          stable_window_count=_LOOKUP_COUNT)
+
+        with _create_server() as server:
+            driver = _create_driver(server)
+            remote_debugger = RemoteDebugger(driver)
+            discoverer = FinsembleComponentDiscoverer(driver)
+            # Look up the stable windows, which are the oldest ones, so the lookups still succeed amidst churn.
+            urls = server.window_urls[:_LOOKUP_COUNT]
+
+            results.append(_measure('remote_debugger.get_pages', window_count, server, repetitions,
+                                    lambda: remote_debugger.get_pages(use_cache=False)))
+            results.append(_measure('remote_debugger.get_pages (snapshot)', window_count, server, repetitions,
+                                    remote_debugger.get_pages))
+            results.append(_measure('discoverer.lookup (debugger)', window_count, server, repetitions,
+                                    lambda: discoverer.get_selenium_handle_of_page_containing_url(urls[-1]),
+                                    prepare=discoverer.invalidate))
+            results.append(_measure('discoverer.lookup_many (debugger)', window_count, server, repetitions,
+                                    lambda: discoverer.get_selenium_handles_of_pages_matching_urls(urls),
+                                    prepare=discoverer.invalidate))
+            def _poll_for_window(url: str) -> str:
+                discoverer.invalidate()
+                poll_pages = discoverer.create_page_poller()
+                return wait_until(lambda: next((handle for handle, page in poll_pages().items() if page['url'] == url),
+                                               None), timeout_in_seconds=10)
+
+            results.append(_measure_wait_until('wait_until (window opens after 50ms)', window_count, server,
+                                               repetitions, _poll_for_window))
+
+            # The same lookups, but discovering pages via pushed DevTools target events rather than by polling.
+            target_event_discoverer = FinsembleComponentDiscoverer(driver, use_target_events=True)
+            wait_for_window = target_event_discoverer.get_selenium_handle_of_page_containing_url
+            results.append(_measure('discoverer.lookup (target events)', window_count, server, repetitions,
+                                    lambda: wait_for_window(urls[-1])))
+            results.append(_measure_wait_until('wait (target events, opens after 50ms)', window_count, server,
+                                               repetitions, wait_for_window))
+
+            target_event_discoverer.close()
+            remote_debugger.close()
+            discoverer.close()
+            driver.quit()
+
+        with _create_server(debugger_available=False) as server:
+            driver = _create_driver(server)
+            url = server.window_urls[_LOOKUP_COUNT - 1]
+            discoverers = []
+
+            def _create_discoverer() -> None:
+                discoverers.append(FinsembleComponentDiscoverer(driver))
+
+            results.append(_measure('discoverer.lookup (fallback, cold)', window_count, server,
+                                    max(1, repetitions // 5),
+                                    lambda: discoverers[-1].get_selenium_handle_of_page_containing_url(url),
+                                    prepare=_create_discoverer))
+            results.append(_measure('discoverer.lookup (fallback, warm)', window_count, server, repetitions,
+                                    lambda: discoverers[-1].get_selenium_handle_of_page_containing_url(url)))
+            driver.quit()
+
+    return results
+
+
+def compare_to_baseline(results: List[BenchmarkResult], baseline: Dict[str, dict], latency_tolerance: float = 0.5,
+                        request_tolerance: float = 0.1) -> List[str]:
+    """
+    :return: A description of every benchmark whose p50 latency or requests per lookup regressed beyond the given
+             tolerances (as fractions of the baseline), compared to the baseline results.
+    :rtype: List[str]
+    """
+
+    regressions = []
+    for result in results:
+        baseline_result = baseline.get(result.key)
+        if not baseline_result:
+            continue
+        if result.requests_per_lookup > baseline_result['requests_per_lookup'] * (1 + request_tolerance):
+            regressions.append(f'{result.key}: {result.requests_per_lookup:.1f} requests per lookup '
+                               f'(baseline: {baseline_result["requests_per_lookup"]:.1f})')
+        if result.p50_in_ms > baseline_result['p50_in_ms'] * (1 + latency_tolerance):
+            regressions.append(f'{result.key}: p50 of {result.p50_in_ms:.2f}ms '
+                               f'(baseline: {baseline_result["p50_in_ms"]:.2f}ms)')
+    return regressions
+
+
+def summarize(results: List[BenchmarkResult]) -> str:
+    lines = [f'{"benchmark":<40} {"windows":>7} {"lookups":>7} {"mean (ms)":>10} {"p50 (ms)":>9} {"p95 (ms)":>9} '
+             f'{"requests/lookup":>15}']
+    for result in results:
+        lines.append(f'{result.name:<40} {result.window_count:>7} {result.lookup_count:>7} {result.mean_in_ms:>10.2f} '
+                     f'{result.p50_in_ms:>9.2f} {result.p95_in_ms:>9.2f} {result.requests_per_lookup:>15.1f}')
+    return '\n'.join(lines)
+
+
+def _create_driver(server: FakeChromeDriverServer) -> webdriver.Remote:
+    return webdriver.Remote(command_executor=server.url, desired_capabilities={'browserName': 'chrome'})
+
+
+def _measure(name: str, window_count: int, server: FakeChromeDriverServer, repetitions: int,
+             lookup: Callable[[], object], prepare: Optional[Callable[[], None]] = None) -> BenchmarkResult:
+    """
+    Time `repetitions` calls of `lookup` (calling `prepare` untimed before each), counting the requests they make.
+    """
+
+    latencies = []
+    request_count = 0
+    for _ in range(repetitions):
+        if prepare:
+            prepare()
+        server.reset_request_counts()
+        start_time = time.perf_counter()
+        lookup()
+        latencies.append(time.perf_counter() - start_time)
+        request_count += sum(server.request_counts.values())
+    return BenchmarkResult(name, window_count, latencies, request_count)
+
+
+def _measure_wait_until(name: str, window_count: int, server: FakeChromeDriverServer, repetitions: int,
+                        wait_for_window: Callable[[str], str], spawn_delay_in_seconds: float = 0.05) -> BenchmarkResult:
+    """
+    Measure how long `wait_for_window` (given the URL of a window, returning its handle) takes to notice a window that
+    opens part-way through the wait (i.e. the time from the window opening to the wait returning), and how many
+    requests the whole wait costs.
+    """
+
+    latencies = []
+    request_count = 0
+    for repetition in range(repetitions):
+        url = f'http://localhost:3375/components/wait-target-{repetition}/index.html'
+        spawned_at = []
+        timer = Timer(spawn_delay_in_seconds,
+                      lambda: spawned_at.append(time.perf_counter()) or server.spawn_window(url, stable=True))
+
+        server.reset_request_counts()
+        timer.start()
+        handle = wait_for_window(url)
+        latencies.append(time.perf_counter() - spawned_at[0])
+        request_count += sum(server.request_counts.values())
+        server.close_window(handle)
+    return BenchmarkResult(name, window_count, latencies, request_count)
+
+
+def _percentile(values: List[float], fraction: float) -> float:
+    ordered_values = sorted(values)
+    return ordered_values[min(len(ordered_values) - 1, int(fraction * len(ordered_values)))]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='Benchmark page discovery & waiting against a fake ChromeDriver.')
+    parser.add_argument('--window-counts', default='10,100,1000',
+                        help='Comma-separated numbers of windows to simulate. (Default: 10,100,1000)')
+    parser.add_argument('--repetitions', type=int, default=20, help='Lookups to measure per benchmark. (Default: 20)')
+    parser.add_argument('--latency-ms', type=float, default=0.0, help='Simulated latency of every response.')
+    parser.add_argument('--churn-per-second', type=float, default=0.0,
+                        help='Simulated rate at which windows are replaced in the background.')
+    parser.add_argument('--output', help='A file to write the results to, as JSON.')
+    parser.add_argument('--baseline', help='A results file from a previous run to check for regressions against.')
+    parser.add_argument('--latency-tolerance', type=float, default=0.5,
+                        help='Allowed p50 latency regression, as a fraction of the baseline. (Default: 0.5)')
+    parser.add_argument('--request-tolerance', type=float, default=0.1,
+                        help='Allowed requests-per-lookup regression, as a fraction of the baseline. (Default: 0.1)')
+    arguments = parser.parse_args()
+
+    results = run_benchmarks([int(count) for count in arguments.window_counts.split(',')], arguments.repetitions,
+                             arguments.latency_ms / 1000, arguments.churn_per_second)
+    print(summarize(results))
+
+    if arguments.output:
+        with open(arguments.output, 'w') as output_file:
+            json.dump({result.key: result.to_dict() for result in results}, output_file, indent=2)
+
+    if arguments.baseline:
+        with open(arguments.baseline) as baseline_file:
+            regressions = compare_to_baseline(results, json.load(baseline_file), arguments.latency_tolerance,
+                                              arguments.request_tolerance)
+        if regressions:
+            print('\nRegressions against the baseline:\n  ' + '\n  '.join(regressions))
+            return 1
+        print('\nNo regressions against the baseline.')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,658 @@
+from __future__ import annotations
+import base64
+import hashlib
+import json
+import os
+import requests
+import socket
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from src.cdp_connection import CdpConnection, CdpError
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Lock, Thread
+from typing import Dict, List, Optional, Set, Tuple
+from urllib.parse import urlsplit
+
+
+# How the interceptor treats each request:
+# - "record": Every request goes to the network as usual, and every successful response is stored in the cache.
+# - "replay": Every request is served from the cache, and any request that isn't cached fails. (See `AssetCacheServer`
+#   for what's needed to launch with no server running at all.)
+# - "replay_or_record": Requests are served from the cache where possible, and go to the network (and are stored in
+#   the cache) otherwise. Recording once, then replaying from then on.
+ASSET_CACHE_MODES = ('record', 'replay', 'replay_or_record')
+
+# Response headers that describe the body as it was sent over the wire, rather than as `Fetch.getResponseBody` returns
+# it (i.e. already decoded), so they aren't stored.
+_UNCACHED_HEADER_NAMES = {'content-encoding', 'content-length', 'transfer-encoding'}
+
+# The host names under which a server on this machine can be stood in for by an `AssetCacheServer`, with the address
+# to listen on for each.
+_LOOPBACK_HOSTNAMES = {'localhost': '127.0.0.1', '127.0.0.1': '127.0.0.1'}
+
+
+class CachedAsset:
+    """
+    A single response stored in an `AssetCache`. The body itself lives in the cache's object store, under its SHA-256
+    hash.
+    """
+
+    def __init__(self, method: str, url: str, status: int, headers: List[dict], sha256: str, size: int,
+                 recorded_at: float) -> None:
+        self.method: str = method
+        self.url: str = url
+        self.status: int = status
+        # As CDP's `HeaderEntry` objects, i.e. `{'name': ..., 'value': ...}`, so that repeated headers are preserved.
+        self.headers: List[dict] = headers
+        self.sha256: str = sha256
+        self.size: int = size
+        self.recorded_at: float = recorded_at
+
+    def to_dict(self) -> dict:
+        return {
+            'method': self.method,
+            'url': self.url,
+            'status': self.status,
+            'headers': self.headers,
+            'sha256': self.sha256,
+            'size': self.size,
+            'recorded_at': self.recorded_at
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> CachedAsset:
+        return cls(data['method'], data['url'], data['status'], data['headers'], data['sha256'], data['size'],
+                   data.get('recorded_at', 0))
+
+
+class AssetCache:
+    """
+    A content-addressed, on-disk cache of HTTP responses. Bodies are stored once per distinct content, as
+    `objects/<first two hex digits>/<SHA-256 hash>`, and `index.json` maps each request (method & URL) to the status,
+    headers and hash of its response. Since components tend to share scripts and stylesheets, identical bodies served
+    from different URLs are only stored once.
+
+    Every body is checked against its hash as it's read back, so an entry whose object is missing, truncated or
+    otherwise corrupted is treated as a miss (and dropped from the index) rather than served. Files are written to a
+    temporary name and then renamed into place, so a cache is never left half-written.
+
+    The index is only written back to disk by `save()`.
+    """
+
+    def __init__(self, directory: str) -> None:
+        """
+        :param directory: The directory to keep the cache in. Created if it doesn't exist; an existing cache there is
+                          loaded.
+        :type directory: str
+        """
+
+        self.directory: str = os.path.abspath(os.path.expandvars(directory))
+        # The number of entries that have been dropped since this cache was loaded, for failing validation.
+        self.invalid_entry_count: int = 0
+
+        self._lock: Lock = Lock()
+        self._entries: Dict[str, CachedAsset] = {}
+        self._is_dirty: bool = False
+
+        os.makedirs(os.path.join(self.directory, 'objects'), exist_ok=True)
+        index_path = os.path.join(self.directory, 'index.json')
+        if os.path.exists(index_path):
+            with open(index_path, encoding='utf-8') as index_file:
+                for key, data in json.load(index_file).get('entries', {}).items():
+                    self._entries[key] = CachedAsset.from_dict(data)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, method: str, url: str) -> Optional[Tuple[CachedAsset, bytes]]:
+        """
+        Look up the response to the given request, making sure its body still matches its hash.
+
+        :param method: The request's HTTP method, e.g. "GET".
+        :type method: str
+
+        :param url: The request's URL. Any fragment is ignored.
+        :type url: str
+
+        :return: The cached response and its body, or `None` if it isn't cached (or failed validation.)
+        :rtype: Optional[Tuple[CachedAsset, bytes]]
+        """
+
+        key = _get_key(method, url)
+        asset = self._entries.get(key)
+        if not asset:
+            return None
+
+        try:
+            with open(self._get_object_path(asset.sha256), 'rb') as object_file:
+                body = object_file.read()
+        except OSError:
+            body = None
+        if body is None or hashlib.sha256(body).hexdigest() != asset.sha256:
+            with self._lock:
+                if self._entries.get(key) is asset:
+                    del self._entries[key]
+                    self._is_dirty = True
+                    self.invalid_entry_count += 1
+            return None
+        return asset, body
+
+    def put(self, method: str, url: str, status: int, headers: List[dict], body: bytes) -> CachedAsset:
+        """
+        Store the response to the given request, replacing any previous one.
+
+        :param method: The request's HTTP method, e.g. "GET".
+        :type method: str
+
+        :param url: The request's URL. Any fragment is ignored.
+        :type url: str
+
+        :param status: The response's HTTP status code.
+        :type status: int
+
+        :param headers: The response's headers, as CDP `HeaderEntry` objects.
+        :type headers: List[dict]
+
+        :param body: The response's (decoded) body.
+        :type body: bytes
+
+        :return: The new cache entry.
+        :rtype: CachedAsset
+        """
+
+        sha256 = hashlib.sha256(body).hexdigest()
+        object_path = self._get_object_path(sha256)
+        if not os.path.exists(object_path):
+            os.makedirs(os.path.dirname(object_path), exist_ok=True)
+            _write_file_atomically(object_path, body)
+
+        headers = [header for header in headers if header['name'].lower() not in _UNCACHED_HEADER_NAMES]
+        asset = CachedAsset(method.upper(), _strip_fragment(url), status, headers, sha256, len(body), time.time())
+        with self._lock:
+            self._entries[_get_key(method, url)] = asset
+            self._is_dirty = True
+        return asset
+
+    def fetch(self, url: str, timeout_in_seconds: float = 10) -> CachedAsset:
+        """
+        Fetch the given URL directly (rather than through a window) and store the response. This is the way to record
+        requests that are made by Electron's main process, and so are never seen by `AssetCacheInterceptor`, e.g.
+        Finsemble's manifest.
+
+        :param url: The URL to `GET`.
+        :type url: str
+
+        :param timeout_in_seconds: The maximum time, in seconds, to wait for the response.
+        :type timeout_in_seconds: float
+
+        :return: The new cache entry.
+        :rtype: CachedAsset
+
+        :raises requests.HTTPError: If the response doesn't have a 2xx status.
+        """
+
+        response = requests.get(url, timeout=timeout_in_seconds)
+        response.raise_for_status()
+        headers = [{'name': name, 'value': value} for name, value in response.headers.items()]
+        return self.put('GET', url, response.status_code, headers, response.content)
+
+    def get_loopback_origins(self) -> Set[str]:
+        """
+        :return: The origins (e.g. "http://localhost:3375") of every cached request to this machine, i.e. those that
+                 `AssetCacheServer` can stand in for.
+        :rtype: Set[str]
+        """
+
+        origins = set()
+        for asset in list(self._entries.values()):
+            parsed_url = urlsplit(asset.url)
+            if parsed_url.scheme == 'http' and parsed_url.hostname in _LOOPBACK_HOSTNAMES and parsed_url.port:
+                origins.add(f'{parsed_url.scheme}://{parsed_url.netloc}')
+        return origins
+
+    def save(self) -> None:
+        """
+        Write the index back to disk, if anything has changed since it was loaded (or last saved.)
+        """
+
+        with self._lock:
+            if not self._is_dirty:
+                return
+            data = {'version': 1, 'entries': {key: asset.to_dict() for key, asset in sorted(self._entries.items())}}
+            self._is_dirty = False
+        _write_file_atomically(os.path.join(self.directory, 'index.json'),
+                               json.dumps(data, indent=2).encode('utf-8'))
+
+    def _get_object_path(self, sha256: str) -> str:
+        return os.path.join(self.directory, 'objects', sha256[:2], sha256)
+
+
+class AssetCacheServer:
+    """
+    Requests made by Electron's main process - most importantly, the Finsemble Electron Adapter fetching the manifest
+    before a single window exists - can't be intercepted over DevTools. When launching from src, though, that manifest
+    is served from this machine (by `yarn server`), so it can be stood in for.
+
+    This server listens on every local origin (e.g. "http://localhost:3375") that the cache holds responses for, and
+    serves `GET` requests to it from the cache, validating each body against its hash like any other cache read.
+    Anything that isn't cached gets a 404. An origin that something is already listening on (i.e. the real server is
+    running) is left to it.
+    """
+
+    def __init__(self, cache: AssetCache) -> None:
+        """
+        :param cache: The cache to serve responses from.
+        :type cache: AssetCache
+        """
+
+        self.cache: AssetCache = cache
+        # The origins actually being served.
+        self.origins: List[str] = []
+        self._http_servers: List[_ExclusiveThreadingHTTPServer] = []
+
+    def start(self) -> List[str]:
+        """
+        Start serving every local origin in the cache that nothing else is listening on.
+
+        :return: The origins now being served.
+        :rtype: List[str]
+        """
+
+        for origin in sorted(self.cache.get_loopback_origins()):
+            parsed_origin = urlsplit(origin)
+            if _is_listening(parsed_origin.hostname, parsed_origin.port):
+                # The real server is running, so leave the origin to it.
+                continue
+            try:
+                http_server = _ExclusiveThreadingHTTPServer(
+                    (_LOOPBACK_HOSTNAMES[parsed_origin.hostname], parsed_origin.port),
+                    _create_request_handler(self.cache, origin))
+            except OSError:
+                # The port is taken, presumably by the real server.
+                continue
+            Thread(target=http_server.serve_forever, name=f'AssetCacheServer({origin})', daemon=True).start()
+            self._http_servers.append(http_server)
+            self.origins.append(origin)
+        return list(self.origins)
+
+    def close(self) -> None:
+        for http_server in self._http_servers:
+            http_server.shutdown()
+            http_server.server_close()
+        self._http_servers = []
+        self.origins = []
+
+    def __enter__(self) -> AssetCacheServer:
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+class AssetCacheInterceptor:
+    """
+    Every launch of Finsemble fetches the same manifests, scripts, stylesheets & images for every component, from a
+    server that has to be running (and warmed up) for the launch to succeed at all. This makes startup both slower and
+    less deterministic than it needs to be.
+
+    This interceptor serves those requests from an `AssetCache` instead. Over a single browser-level DevTools
+    connection, it attaches to every window as soon as it's created - while it's still paused, before it has issued a
+    single request - and enables the `Fetch` domain in it, so that every request the window makes is paused until the
+    interceptor either fulfills it from the cache (`Fetch.fulfillRequest`), or lets it through to the network and
+    stores the response (`Fetch.getResponseBody`) on its way back. See `ASSET_CACHE_MODES`.
+
+    E.g. to record a cache once (including the manifest, which Electron's main process fetches itself), then launch
+    from it with no server running:
+        cache = AssetCache('asset-cache')
+        cache.fetch(MANIFEST_URL)
+        cache.save()
+        launch_finsemble_session_from_src(..., asset_cache_directory='asset-cache', asset_cache_mode='record')
+        launch_finsemble_session_from_src(..., asset_cache_directory='asset-cache', asset_cache_mode='replay')
+
+    Only `GET` requests, and responses with a 200 status, are cached. Requests made by Electron's main process (rather
+    than by a window) can't be intercepted over DevTools, and neither can requests made by a window that was already
+    loading before the interceptor attached. When those are to a server on this machine (as the manifest is, when
+    launching from src), the launcher stands in for that server with an `AssetCacheServer`; a server elsewhere (e.g.
+    the one an exe was built to point at) still needs to be reachable.
+
+    Further reading: https://chromedevtools.github.io/devtools-protocol/tot/Fetch/
+    """
+
+    def __init__(self, cache: AssetCache, mode: str = 'replay_or_record', url_patterns: Optional[List[str]] = None,
+                 max_concurrent_requests: int = 8) -> None:
+        """
+        :param cache: The cache to serve requests from, and/or record responses to.
+        :type cache: AssetCache
+
+        :param mode: One of `ASSET_CACHE_MODES`.
+        :type mode: str
+
+        :param url_patterns: `Fetch` URL patterns (where "*" matches any number of characters) of the requests to
+                             intercept. Defaults to every HTTP(S) request.
+        :type url_patterns: Optional[List[str]]
+
+        :param max_concurrent_requests: The most intercepted requests to handle at once. (Each one may need to read or
+                                        write a file, or fetch a response body, so they're handled off the connection's
+                                        reader thread.)
+        :type max_concurrent_requests: int
+        """
+
+        if mode not in ASSET_CACHE_MODES:
+            raise ValueError(f'Unknown asset cache mode "{mode}"; expected one of {ASSET_CACHE_MODES}.')
+
+        self.cache: AssetCache = cache
+        self.mode: str = mode
+        self.url_patterns: List[str] = url_patterns or ['http://*', 'https://*']
+        self.hit_count: int = 0
+        self.miss_count: int = 0
+        self.recorded_count: int = 0
+        # Requests that couldn't be handled, e.g. because their window closed part-way through.
+        self.error_count: int = 0
+
+        self._lock: Lock = Lock()
+        self._connection: Optional[CdpConnection] = None
+        self._is_closed: bool = False
+        self._is_auto_attaching: bool = False
+        self._attach_thread: Optional[Thread] = None
+        self._attach_error: Optional[Exception] = None
+        self._target_ids_by_session_id: Dict[str, str] = {}
+        self._attached_target_ids: Set[str] = set()
+        self._executor: ThreadPoolExecutor = ThreadPoolExecutor(max_workers=max_concurrent_requests,
+                                                                thread_name_prefix='AssetCacheInterceptor')
+
+    @property
+    def is_attached(self) -> bool:
+        return bool(self._connection and self._connection.is_connected)
+
+    def attach(self, browser_websocket_url: str, timeout_in_seconds: float = 10) -> None:
+        """
+        Start intercepting the requests of every window of the given browser.
+
+        :param browser_websocket_url: The `ws://` URL of the browser-level DevTools websocket. (See
+                                      `RemoteDebugger.get_browser_websocket_url()`.)
+        :type browser_websocket_url: str
+
+        :param timeout_in_seconds: The maximum time, in seconds, to wait to connect to the browser.
+        :type timeout_in_seconds: float
+        """
+
+        connection = CdpConnection(browser_websocket_url, timeout_in_seconds)
+        for method, listener in [('Target.targetCreated', self._on_target_created),
+                                 ('Target.attachedToTarget', self._on_attached_to_target),
+                                 ('Target.detachedFromTarget', self._on_detached_from_target),
+                                 ('Fetch.requestPaused', self._on_request_paused)]:
+            connection.add_event_listener(method, listener)
+        with self._lock:
+            if self._is_closed:
+                connection.close()
+                return
+            self._connection = connection
+
+        # Have every new window paused as soon as it's created, until its requests are being intercepted. Browsers that
+        # don't support auto-attaching at the browser level have new windows attached to as they're discovered instead,
+        # by which point they may have issued their first few requests.
+        try:
+            try:
+                connection.call('Target.setAutoAttach', {'autoAttach': True, 'waitForDebuggerOnStart': True,
+                                                         'flatten': True})
+                self._is_auto_attaching = True
+            except CdpError:
+                connection.call('Target.setDiscoverTargets', {'discover': True})
+            for target_info in connection.call('Target.getTargets').get('targetInfos', []):
+                self._attach_to_target(target_info)
+        except Exception:
+            with self._lock:
+                self._connection = None
+            connection.close()
+            raise
+
+    def attach_when_available(self, debugging_port: int, timeout_in_seconds: float = 60) -> Thread:
+        """
+        Attach to the browser listening on the given remote debugging port as soon as it starts listening, from a
+        background thread - so that the interceptor can be attached while the browser is still being launched.
+
+        :param debugging_port: The remote debugging port the browser is (being) launched with.
+        :type debugging_port: int
+
+        :param timeout_in_seconds: The maximum time, in seconds, to wait for the browser to start listening.
+        :type timeout_in_seconds: float
+
+        :return: The background thread, which finishes once the interceptor is attached (or gives up.) Use
+                 `wait_until_attached()` to find out which.
+        :rtype: Thread
+        """
+
+        def _attach() -> None:
+            end_time = time.monotonic() + timeout_in_seconds
+            with requests.Session() as http_session:
+                while not self._is_closed and time.monotonic() < end_time:
+                    try:
+                        version_data = http_session.get(f'http://127.0.0.1:{debugging_port}/json/version',
+                                                        timeout=1).json()
+                        self.attach(version_data['webSocketDebuggerUrl'])
+                        return
+                    except Exception as e:
+                        # Most likely the browser isn't listening yet; remembered in case it never is.
+                        self._attach_error = e
+                        time.sleep(0.01)
+
+        self._attach_error = None
+        self._attach_thread = Thread(target=_attach, name=f'AssetCacheInterceptor({debugging_port})', daemon=True)
+        self._attach_thread.start()
+        return self._attach_thread
+
+    def wait_until_attached(self, timeout_in_seconds: float = 10) -> None:
+        """
+        Wait for an attachment started by `attach_when_available()` to complete.
+
+        :param timeout_in_seconds: The maximum time, in seconds, to wait.
+        :type timeout_in_seconds: float
+
+        :raises Exception: If the interceptor isn't attached in time (or gave up attaching.)
+        """
+
+        if self._attach_thread:
+            self._attach_thread.join(timeout_in_seconds)
+        if not self.is_attached:
+            reason = f' (last error: {self._attach_error})' if self._attach_error else ''
+            raise Exception(f'The asset cache interceptor could not attach to the browser{reason}, so its requests '
+                            f'would not be served from the cache.')
+
+    def get_stats(self) -> dict:
+        return {
+            'mode': self.mode,
+            'hits': self.hit_count,
+            'misses': self.miss_count,
+            'recorded': self.recorded_count,
+            'errors': self.error_count,
+            'invalid_entries': self.cache.invalid_entry_count
+        }
+
+    def close(self) -> None:
+        """
+        Stop intercepting, and save the cache's index.
+        """
+
+        with self._lock:
+            self._is_closed = True
+            connection = self._connection
+        if connection:
+            connection.close()
+        self._executor.shutdown(wait=True)
+        self.cache.save()
+
+    def __enter__(self) -> AssetCacheInterceptor:
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def _attach_to_target(self, target_info: dict) -> None:
+        if target_info.get('type') != 'page':
+            return
+        with self._lock:
+            if target_info['targetId'] in self._attached_target_ids:
+                return
+            self._attached_target_ids.add(target_info['targetId'])
+        self._connection.send('Target.attachToTarget', {'targetId': target_info['targetId'], 'flatten': True})
+
+    def _get_fetch_patterns(self) -> List[dict]:
+        # Misses are caught a second time once their response arrives, so that it can be recorded.
+        stages = {'record': ['Response'], 'replay': ['Request'], 'replay_or_record': ['Request', 'Response']}[self.mode]
+        return [{'urlPattern': url_pattern, 'requestStage': stage}
+                for stage in stages for url_pattern in self.url_patterns]
+
+    # Event listeners; these run on the connection's reader thread, so they only ever `send()`.
+
+    def _on_target_created(self, params: dict, _session_id: Optional[str]) -> None:
+        if not self._is_auto_attaching:
+            self._attach_to_target(params['targetInfo'])
+
+    def _on_attached_to_target(self, params: dict, _session_id: Optional[str]) -> None:
+        session_id = params['sessionId']
+        target_info = params['targetInfo']
+        with self._lock:
+            is_duplicate = target_info['targetId'] in self._target_ids_by_session_id.values()
+            if not is_duplicate:
+                self._target_ids_by_session_id[session_id] = target_info['targetId']
+                self._attached_target_ids.add(target_info['targetId'])
+
+        if is_duplicate:
+            # Already intercepting this window over another session.
+            self._connection.send('Runtime.runIfWaitingForDebugger', session_id=session_id)
+            self._connection.send('Target.detachFromTarget', {'sessionId': session_id})
+            return
+        if target_info.get('type') != 'page':
+            # Auto-attaching also pauses other kinds of target (e.g. workers); let them carry on untouched.
+            self._connection.send('Runtime.runIfWaitingForDebugger', session_id=session_id)
+            return
+
+        # Commands are handled in order, so the window is only resumed once its requests are being intercepted.
+        self._connection.send('Fetch.enable', {'patterns': self._get_fetch_patterns()}, session_id=session_id)
+        self._connection.send('Runtime.runIfWaitingForDebugger', session_id=session_id)
+
+    def _on_detached_from_target(self, params: dict, _session_id: Optional[str]) -> None:
+        with self._lock:
+            target_id = self._target_ids_by_session_id.pop(params.get('sessionId'), None)
+            if target_id:
+                self._attached_target_ids.discard(target_id)
+
+    def _on_request_paused(self, params: dict, session_id: Optional[str]) -> None:
+        try:
+            self._executor.submit(self._handle_paused_request, params, session_id)
+        except RuntimeError:
+            # The interceptor has been closed.
+            pass
+
+    def _handle_paused_request(self, params: dict, session_id: Optional[str]) -> None:
+        """
+        Serve, fail, record or let through a single paused request. (Runs on a worker thread.)
+        """
+
+        request_id = params['requestId']
+        method = params['request']['method']
+        url = params['request']['url']
+        is_response_stage = 'responseStatusCode' in params or 'responseErrorReason' in params
+        try:
+            if not is_response_stage:
+                cached = self.cache.get(method, url) if method == 'GET' else None
+                if cached:
+                    asset, body = cached
+                    self._increment('hit_count')
+                    self._connection.call('Fetch.fulfillRequest', {
+                        'requestId': request_id, 'responseCode': asset.status, 'responseHeaders': asset.headers,
+                        'body': base64.b64encode(body).decode('ascii')
+                    }, session_id=session_id)
+                    return
+                self._increment('miss_count')
+                if self.mode == 'replay':
+                    self._connection.call('Fetch.failRequest', {
+                        'requestId': request_id, 'errorReason': 'InternetDisconnected'
+                    }, session_id=session_id)
+                    return
+            elif method == 'GET' and params.get('responseStatusCode') == 200:
+                response_body = self._connection.call('Fetch.getResponseBody', {'requestId': request_id},
+                                                      session_id=session_id)
+                body = base64.b64decode(response_body['body']) if response_body.get('base64Encoded') \
+                    else response_body['body'].encode('utf-8')
+                self.cache.put(method, url, 200, params.get('responseHeaders', []), body)
+                self._increment('recorded_count')
+
+            self._connection.call('Fetch.continueRequest', {'requestId': request_id}, session_id=session_id)
+        except Exception:
+            # e.g. the window closed (taking the paused request with it) while the request was being handled.
+            self._increment('error_count')
+
+    def _increment(self, counter_name: str) -> None:
+        with self._lock:
+            setattr(self, counter_name, getattr(self, counter_name) + 1)
+
+
+class _ExclusiveThreadingHTTPServer(ThreadingHTTPServer):
+    # `ThreadingHTTPServer` sets `SO_REUSEADDR`, with which Windows lets a bind succeed even on a port that another
+    # process (i.e. the real server) is already listening on.
+    allow_reuse_address = False
+    daemon_threads = True
+
+
+def _is_listening(hostname: str, port: int) -> bool:
+    """
+    :return: Whether or not anything accepts connections on the given port, at any address the host name resolves to.
+    :rtype: bool
+    """
+
+    try:
+        with socket.create_connection((hostname, port), timeout=1):
+            return True
+    except OSError:
+        return False
+
+
+def _create_request_handler(cache: AssetCache, origin: str) -> type:
+    class _RequestHandler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:
+            self._respond(include_body=True)
+
+        def do_HEAD(self) -> None:
+            self._respond(include_body=False)
+
+        def log_message(self, *args) -> None:
+            pass
+
+        def _respond(self, include_body: bool) -> None:
+            cached = cache.get('GET', f'{origin}{self.path}')
+            if not cached:
+                self.send_error(404, 'Not in the asset cache')
+                return
+            asset, body = cached
+            self.send_response(asset.status)
+            for header in asset.headers:
+                self.send_header(header['name'], header['value'])
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            if include_body:
+                self.wfile.write(body)
+
+    return _RequestHandler
+
+
+def _strip_fragment(url: str) -> str:
+    return url.split('#', 1)[0]
+
+
+def _get_key(method: str, url: str) -> str:
+    return f'{method.upper()} {_strip_fragment(url)}'
+
+
+def _write_file_atomically(path: str, data: bytes) -> None:
+    file_descriptor, temporary_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+    try:
+        with os.fdopen(file_descriptor, 'wb') as output_file:
+            output_file.write(data)
+        os.replace(temporary_path, path)
+    except BaseException:
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path)
+        raise
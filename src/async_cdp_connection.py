@@ -0,0 +1,212 @@
+from __future__ import annotations
+import asyncio
+import aiohttp
+import json
+from collections import defaultdict
+from src.cdp_connection import CdpError, CdpEvaluationError
+from typing import Any, Callable, Dict, List, Optional
+
+
+class AsyncCdpConnection:
+    """
+    The asyncio counterpart of `CdpConnection`: a persistent connection to a single Chrome DevTools Protocol websocket,
+    over which any number of commands can be in-flight at once.
+
+    Use `await AsyncCdpConnection.connect(...)` to create one. Commands are awaited directly, and can be cancelled or
+    wrapped in `asyncio.wait_for()` like any other coroutine. Events pushed by the browser are dispatched to listeners
+    registered with `add_event_listener()`, from a single reader task that runs for the lifetime of the connection.
+    """
+
+    def __init__(self, websocket_url: str, http_session: aiohttp.ClientSession,
+                 websocket: aiohttp.ClientWebSocketResponse, owns_http_session: bool,
+                 timeout_in_seconds: float) -> None:
+        # Use `connect()` rather than constructing directly.
+        self.websocket_url: str = websocket_url
+        self.timeout_in_seconds: float = timeout_in_seconds
+
+        self._http_session: aiohttp.ClientSession = http_session
+        self._owns_http_session: bool = owns_http_session
+        self._websocket: aiohttp.ClientWebSocketResponse = websocket
+        self._next_command_id: int = 0
+        self._pending_commands: Dict[int, asyncio.Future] = {}
+        self._event_listeners: Dict[str, List[Callable]] = defaultdict(list)
+        self._is_closed: bool = False
+        self._reader_task: asyncio.Task = asyncio.get_event_loop().create_task(self._read_messages())
+
+    @classmethod
+    async def connect(cls, websocket_url: str, http_session: Optional[aiohttp.ClientSession] = None,
+                      timeout_in_seconds: float = 10) -> AsyncCdpConnection:
+        """
+        Open a connection to the given DevTools websocket.
+
+        :param websocket_url: The `ws://` URL of the CDP endpoint to connect to.
+        :type websocket_url: str
+
+        :param http_session: The `aiohttp` session to open the websocket from. If not provided, one is created (and
+                             closed again along with the connection.)
+        :type http_session: Optional[aiohttp.ClientSession]
+
+        :param timeout_in_seconds: The default time, in seconds, to wait for a command issued via `call()` to be
+                                   answered. Also used as the timeout for establishing the connection.
+        :type timeout_in_seconds: float
+
+        :return: The open connection.
+        :rtype: AsyncCdpConnection
+        """
+
+        owns_http_session = http_session is None
+        http_session = http_session or aiohttp.ClientSession()
+        try:
+            websocket = await asyncio.wait_for(http_session.ws_connect(websocket_url, max_msg_size=0),
+                                               timeout_in_seconds)
+        except Exception:
+            if owns_http_session:
+                await http_session.close()
+            raise
+        return cls(websocket_url, http_session, websocket, owns_http_session, timeout_in_seconds)
+
+    @property
+    def is_connected(self) -> bool:
+        return not self._is_closed
+
+    async def call(self, method: str, params: Optional[dict] = None, session_id: Optional[str] = None,
+                   timeout_in_seconds: Optional[float] = None) -> dict:
+        """
+        Issue a CDP command and wait for it to be answered.
+
+        :param method: The fully-qualified CDP method name, e.g. "Runtime.evaluate".
+        :type method: str
+
+        :param params: The parameters of the command, if any.
+        :type params: Optional[dict]
+
+        :param session_id: The id of a target session to route the command to, if any.
+        :type session_id: Optional[str]
+
+        :param timeout_in_seconds: The maximum time, in seconds, to wait for an answer. Defaults to the connection's
+                                   `timeout_in_seconds`.
+        :type timeout_in_seconds: Optional[float]
+
+        :return: The command's `result` object.
+        :rtype: dict
+
+        :raises CdpError: If the command fails, or the connection is lost before it is answered.
+        :raises TimeoutError: If the command is not answered before the timeout elapses.
+        """
+
+        if self._is_closed:
+            raise CdpError(f'Connection to {self.websocket_url} is closed.')
+
+        self._next_command_id += 1
+        command_id = self._next_command_id
+        future = asyncio.get_event_loop().create_future()
+        self._pending_commands[command_id] = future
+
+        message = {'id': command_id, 'method': method, 'params': params or {}}
+        if session_id:
+            message['sessionId'] = session_id
+
+        timeout = self.timeout_in_seconds if timeout_in_seconds is None else timeout_in_seconds
+        try:
+            await self._websocket.send_str(json.dumps(message))
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            raise TimeoutError(f'No response to "{method}" from {self.websocket_url} within {timeout} seconds.')
+        finally:
+            # Whether answered, timed out, or cancelled, the command is no longer pending.
+            self._pending_commands.pop(command_id, None)
+
+    async def evaluate(self, expression: str, await_promise: bool = True, session_id: Optional[str] = None,
+                       timeout_in_seconds: Optional[float] = None) -> Any:
+        """
+        Evaluate a JavaScript expression within the page via `Runtime.evaluate`.
+
+        :param expression: The JavaScript expression to evaluate.
+        :type expression: str
+
+        :param await_promise: If the expression evaluates to a Promise, whether or not to wait for it to settle and
+                              return its result, rather than the Promise itself.
+        :type await_promise: bool
+
+        :param session_id: The id of a target session to evaluate the expression in, if any.
+        :type session_id: Optional[str]
+
+        :param timeout_in_seconds: The maximum time, in seconds, to wait for the result.
+        :type timeout_in_seconds: Optional[float]
+
+        :return: The (JSON-serializable) value the expression evaluated to.
+
+        :raises CdpEvaluationError: If the expression threw or rejected.
+        """
+
+        result = await self.call('Runtime.evaluate', {'expression': expression, 'awaitPromise': await_promise,
+                                                      'returnByValue': True}, session_id, timeout_in_seconds)
+        if 'exceptionDetails' in result:
+            details = result['exceptionDetails']
+            raise CdpEvaluationError(details.get('exception', {}).get('description') or details.get('text'))
+        return result.get('result', {}).get('value')
+
+    def add_event_listener(self, method: str, callback: Callable[[dict, Optional[str]], None]) -> None:
+        """
+        Register a (plain, non-async) callback to be invoked every time the browser pushes the given event.
+
+        :param method: The fully-qualified CDP event name, e.g. "Target.targetCreated".
+        :type method: str
+
+        :param callback: A callable accepting the event's `params` object and the id of the target session the event
+                         was raised for (`None` for the connection's own target.)
+        :type callback: Callable[[dict, Optional[str]], None]
+        """
+
+        self._event_listeners[method].append(callback)
+
+    def remove_event_listener(self, method: str, callback: Callable[[dict, Optional[str]], None]) -> None:
+        if callback in self._event_listeners[method]:
+            self._event_listeners[method].remove(callback)
+
+    async def close(self) -> None:
+        """
+        Close the websocket. Any commands still awaiting an answer will fail with `CdpError`.
+        """
+
+        if not self._is_closed:
+            self._is_closed = True
+            await self._websocket.close()
+        self._reader_task.cancel()
+        self._fail_pending_commands(f'Connection to {self.websocket_url} was closed.')
+        if self._owns_http_session:
+            await self._http_session.close()
+
+    async def _read_messages(self) -> None:
+        try:
+            async for websocket_message in self._websocket:
+                if websocket_message.type != aiohttp.WSMsgType.TEXT:
+                    break
+                message = json.loads(websocket_message.data)
+
+                if 'id' in message:
+                    future = self._pending_commands.get(message['id'])
+                    if future is None or future.done():
+                        continue
+                    if 'error' in message:
+                        error = message['error']
+                        future.set_exception(CdpError(f'{error.get("message")} ({error.get("code")})'))
+                    else:
+                        future.set_result(message.get('result', {}))
+
+                elif 'method' in message:
+                    for listener in list(self._event_listeners.get(message['method'], [])):
+                        try:
+                            listener(message.get('params', {}), message.get('sessionId'))
+                        except Exception:
+                            # A misbehaving listener must not take the whole connection down with it.
+                            continue
+        finally:
+            self._is_closed = True
+            self._fail_pending_commands(f'Connection to {self.websocket_url} was lost.')
+
+    def _fail_pending_commands(self, reason: str) -> None:
+        for future in self._pending_commands.values():
+            if not future.done():
+                future.set_exception(CdpError(reason))
+        self._pending_commands.clear()
@@ -0,0 +1,123 @@
+from __future__ import annotations
+import asyncio
+from src.async_finsemble_component_discoverer import AsyncFinsembleComponentDiscoverer
+from src.cdp_fsbl_client import _build_api_call_expression
+from typing import TYPE_CHECKING, Any, Optional
+if TYPE_CHECKING:
+    from selenium.webdriver.remote.webdriver import WebDriver
+    from src.async_cdp_connection import AsyncCdpConnection
+
+
+class AsyncCdpFsblClient:
+    """
+    The asyncio counterpart of `CdpFsblClient`: calls the Finsemble API over a DevTools connection made directly to a
+    component (e.g. the Toolbar), without going through ChromeDriver or changing Selenium's focused window.
+
+    Use `await AsyncCdpFsblClient.create(driver)` to create one. Any number of calls can be awaited concurrently, e.g.
+    with `asyncio.gather()`.
+    """
+
+    def __init__(self, discoverer: AsyncFinsembleComponentDiscoverer, component_url: str,
+                 timeout_in_seconds: float) -> None:
+        # Use `create()` rather than constructing directly.
+        self.component_url: str = component_url
+        self.timeout_in_seconds: float = timeout_in_seconds
+        self._discoverer: AsyncFinsembleComponentDiscoverer = discoverer
+        self._connection: Optional[AsyncCdpConnection] = None
+        self._connection_lock: asyncio.Lock = asyncio.Lock()
+
+    @classmethod
+    async def create(cls, driver: WebDriver, component_url: str = 'Toolbar/index.html',
+                     timeout_in_seconds: float = 30) -> AsyncCdpFsblClient:
+        """
+        :param driver: A Selenium `WebDriver` object that is hooked into Finsemble, with Remote Debugging available.
+        :type driver: WebDriver
+
+        :param component_url: The URL of the component to evaluate JavaScript within, matched on a "partial" basis.
+        :type component_url: str
+
+        :param timeout_in_seconds: The default time, in seconds, to wait for a call to complete.
+        :type timeout_in_seconds: float
+
+        :return: A new `AsyncCdpFsblClient`.
+        :rtype: AsyncCdpFsblClient
+
+        :raises Exception: If Remote Debugging is not available for the given driver.
+        """
+
+        discoverer = await AsyncFinsembleComponentDiscoverer.create(driver)
+        if not discoverer.remote_debugger.is_available:
+            await discoverer.close()
+            raise Exception('An AsyncCdpFsblClient requires ChromeDriver Remote Debugging to be available.')
+        return cls(discoverer, component_url, timeout_in_seconds)
+
+    async def get_connection(self) -> AsyncCdpConnection:
+        """
+        :return: The DevTools connection to the component, (re)connecting to it first if needed.
+        :rtype: AsyncCdpConnection
+        """
+
+        async with self._connection_lock:
+            if self._connection is None or not self._connection.is_connected:
+                component_handle = await self._discoverer.get_selenium_handle_of_page_containing_url(self.component_url)
+                self._connection = await self._discoverer.remote_debugger.connect_to_page(component_handle,
+                                                                                          self.timeout_in_seconds)
+            return self._connection
+
+    async def evaluate(self, expression: str, timeout_in_seconds: Optional[float] = None) -> Any:
+        """
+        Evaluate a JavaScript expression within the component. If it evaluates to a Promise, the result that the
+        Promise resolves to is returned.
+
+        :param expression: The JavaScript expression to evaluate. E.g.: `FSBL.Clients.WorkspaceClient.getWorkspaces()`
+        :type expression: str
+
+        :param timeout_in_seconds: The maximum time, in seconds, to wait. Defaults to the client's timeout.
+        :type timeout_in_seconds: Optional[float]
+
+        :return: The (JSON-serializable) value of the expression.
+
+        :raises CdpEvaluationError: If the expression threw or rejected.
+        :raises TimeoutError: If the expression does not complete before the timeout elapses.
+        """
+
+        timeout = self.timeout_in_seconds if timeout_in_seconds is None else timeout_in_seconds
+        connection = await self.get_connection()
+        return await connection.evaluate(expression, timeout_in_seconds=timeout)
+
+    async def call(self, api_path: str, *args, timeout_in_seconds: Optional[float] = None) -> Any:
+        """
+        Call a Finsemble API method.
+
+        :param api_path: The path of the method to call, relative to `FSBL`. E.g.: "Clients.WorkspaceClient.switchTo"
+        :type api_path: str
+
+        :param args: The arguments to call the method with. Each must be JSON-serializable.
+
+        :param timeout_in_seconds: The maximum time, in seconds, to wait. Defaults to the client's timeout.
+        :type timeout_in_seconds: Optional[float]
+
+        :return: The (JSON-serializable) value the method returned (or, if it returned a Promise, resolved to.)
+
+        :raises CdpEvaluationError: If the method threw or rejected.
+        :raises TimeoutError: If the method does not complete before the timeout elapses.
+        """
+
+        return await self.evaluate(_build_api_call_expression(api_path, args), timeout_in_seconds)
+
+    async def close(self) -> None:
+        """
+        Close the DevTools connection to the component.
+        """
+
+        async with self._connection_lock:
+            if self._connection:
+                await self._connection.close()
+                self._connection = None
+        await self._discoverer.close()
+
+    async def __aenter__(self) -> AsyncCdpFsblClient:
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
@@ -0,0 +1,215 @@
+from __future__ import annotations
+import asyncio
+import functools
+from src.async_remote_debugger import AsyncRemoteDebugger
+from src.async_wait import wait_until
+from src.url_matcher import UrlMatcher
+from src.window_handle_cache import WindowHandleMetadataCache
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Dict, Iterable, List, Optional, Pattern, Union
+if TYPE_CHECKING:
+    from selenium.webdriver.remote.webdriver import WebDriver
+    from src.url_matcher import UrlPattern
+
+
+class AsyncFinsembleComponentDiscoverer:
+    """
+    The asyncio counterpart of `FinsembleComponentDiscoverer`, for orchestrators that drive many sessions (or wait on
+    many components) from a single event loop.
+
+    Use `await AsyncFinsembleComponentDiscoverer.create(driver)` to create one. Pages are discovered through an
+    `AsyncRemoteDebugger`, so lookups never block the event loop. If Remote Debugging is not available, discovery falls
+    back to visiting windows with Selenium (see `WindowHandleMetadataCache`); since Selenium itself is blocking, those
+    calls - like `execute_script()` - are run on the loop's default executor, one at a time per driver.
+    """
+
+    def __init__(self, driver: WebDriver, remote_debugger: AsyncRemoteDebugger,
+                 window_metadata_ttl_in_seconds: Optional[float] = 5) -> None:
+        # Use `create()` rather than constructing directly.
+        self._driver: WebDriver = driver
+        self._remote_debugger: AsyncRemoteDebugger = remote_debugger
+        self._window_handle_cache: WindowHandleMetadataCache = \
+            WindowHandleMetadataCache(driver, window_metadata_ttl_in_seconds)
+        # A WebDriver can only handle one command at a time, so blocking driver calls are serialized.
+        self._driver_lock: asyncio.Lock = asyncio.Lock()
+
+    @classmethod
+    async def create(cls, driver: WebDriver,
+                     window_metadata_ttl_in_seconds: Optional[float] = 5) -> AsyncFinsembleComponentDiscoverer:
+        """
+        :param driver: A Selenium `WebDriver` object that is hooked into Finsemble.
+        :type driver: WebDriver
+
+        :param window_metadata_ttl_in_seconds: If Remote Debugging is not available, how long, in seconds, the URL &
+                                               title learned about each window may be reused before that window is
+                                               visited again. (See `WindowHandleMetadataCache`.)
+        :type window_metadata_ttl_in_seconds: Optional[float]
+
+        :return: A new `AsyncFinsembleComponentDiscoverer`.
+        :rtype: AsyncFinsembleComponentDiscoverer
+        """
+
+        return cls(driver, await AsyncRemoteDebugger.create(driver), window_metadata_ttl_in_seconds)
+
+    @property
+    def remote_debugger(self) -> AsyncRemoteDebugger:
+        """
+        :return: The Remote Debugger used to discover pages. (Check `is_available` before relying on it.)
+        :rtype: AsyncRemoteDebugger
+        """
+
+        return self._remote_debugger
+
+    def invalidate(self) -> None:
+        """
+        Discard any cached snapshot of the available pages, so that the next lookup reflects the very latest state.
+        """
+
+        self._remote_debugger.invalidate()
+        self._window_handle_cache.invalidate()
+
+    async def close(self) -> None:
+        """
+        Release any connections held open to the Remote Debugger.
+        """
+
+        await self._remote_debugger.close()
+
+    async def __aenter__(self) -> AsyncFinsembleComponentDiscoverer:
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    async def run_in_executor(self, function: Callable, *args, **kwargs) -> Any:
+        """
+        Run a blocking call against the driver on the event loop's default executor, without overlapping any other
+        driver call made through this discoverer.
+
+        :param function: The blocking callable to run, e.g. `driver.switch_to.window`.
+        :type function: Callable
+
+        :return: The callable's return value.
+        """
+
+        async with self._driver_lock:
+            return await asyncio.get_event_loop().run_in_executor(None, functools.partial(function, *args, **kwargs))
+
+    async def execute_script(self, script: str, *args) -> Any:
+        """
+        Equivalent to `driver.execute_script(script, *args)`, without blocking the event loop.
+        """
+
+        return await self.run_in_executor(self._driver.execute_script, script, *args)
+
+    async def discover_all_available_pages(self, use_cache: bool = True) -> dict:
+        """
+        Return every single window handle that is currently "visible" to Selenium, along with the page URL & title for
+        each one. (See `FinsembleComponentDiscoverer.discover_all_available_pages()`.)
+
+        :param use_cache: Whether or not a snapshot of the Remote Debugger's page table taken within the same instant
+                          may be reused.
+        :type use_cache: bool
+
+        :return: A dictionary keyed on every window handle, each containing the attributes "title" and "url".
+        :rtype: dict
+        """
+
+        if self._remote_debugger.is_available:
+            return await self._remote_debugger.get_pages(use_cache)
+
+        return await self.run_in_executor(self._window_handle_cache.get_pages)
+
+    def create_page_poller(self) -> Callable[[], Awaitable[dict]]:
+        """
+        :return: An async callable for polling loops to read the available pages with. Only its first call may reuse a
+                 recent snapshot of the page table. (See `FinsembleComponentDiscoverer.create_page_poller()`.)
+        :rtype: Callable[[], Awaitable[dict]]
+        """
+
+        is_first_poll = True
+
+        async def _poll() -> dict:
+            nonlocal is_first_poll
+            use_cache, is_first_poll = is_first_poll, False
+            return await self.discover_all_available_pages(use_cache)
+
+        return _poll
+
+    async def get_selenium_handle_of_page_containing_url(self, desired_url: str,
+                                                         timeout_in_seconds: float = 10) -> str:
+        """
+        Locate the window handle of the component whose URL contains the given URL, waiting for it to appear if
+        needed. (See `FinsembleComponentDiscoverer.get_selenium_handle_of_page_containing_url()`.)
+
+        :param desired_url: The URL of the component to search for, matched on a "partial" basis.
+        :type desired_url: str
+
+        :param timeout_in_seconds: The maximum time, in seconds, to wait for the component to appear.
+        :type timeout_in_seconds: float
+
+        :return: The Selenium window handle of the matching component.
+        :rtype: str
+
+        :raises Exception: If no matching Finsemble component can be found.
+        """
+
+        poll_pages = self.create_page_poller()
+
+        async def _locate_page():
+            all_pages = await poll_pages()
+            return next((handle for handle, page_data in all_pages.items()
+                         if desired_url.lower() in page_data['url'].lower()), None)
+
+        try:
+            return await wait_until(_locate_page, timeout_in_seconds=timeout_in_seconds)
+        except TimeoutError:
+            raise Exception(f'No component whose URL contains "{desired_url}" can be found.')
+
+    async def get_selenium_handles_of_all_pages_containing_url(self, desired_url: str) -> List[str]:
+        """
+        :return: The window handles of every component whose URL contains the given URL (matched on a "partial"
+                 basis), or an empty list if there are none.
+        :rtype: List[str]
+        """
+
+        all_pages = await self.discover_all_available_pages()
+        return [handle for handle, page_data in all_pages.items() if desired_url.lower() in page_data['url'].lower()]
+
+    async def get_selenium_handles_of_pages_matching_urls(
+            self, desired_urls: Iterable[Union[str, Pattern, UrlPattern]],
+            optional_urls: Iterable[Union[str, Pattern, UrlPattern]] = (),
+            timeout_in_seconds: float = 10) -> Dict[Union[str, Pattern, UrlPattern], Optional[str]]:
+        """
+        Locate many components at once, resolving every URL pattern against the same snapshot of the available pages.
+        (See `FinsembleComponentDiscoverer.get_selenium_handles_of_pages_matching_urls()`.)
+
+        :return: A dictionary keyed on each of the given URL patterns, with the window handle of the first page found to
+                 match it. Patterns from `optional_urls` that matched no page are mapped to `None`.
+        :rtype: Dict[Union[str, Pattern, UrlPattern], Optional[str]]
+
+        :raises Exception: If any of `desired_urls` cannot be found before the timeout elapses.
+        """
+
+        desired_urls = list(desired_urls)
+        all_urls = desired_urls + [url for url in optional_urls if url not in desired_urls]
+        matcher = UrlMatcher(all_urls)
+        required_indices = set(range(len(desired_urls)))
+        last_resolved_handles = {}
+        poll_pages = self.create_page_poller()
+
+        async def _locate_pages() -> bool:
+            nonlocal last_resolved_handles
+            resolved_handles = {}
+            for handle, page_data in (await poll_pages()).items():
+                for index in matcher.match(page_data['url']):
+                    resolved_handles.setdefault(index, handle)
+            last_resolved_handles = resolved_handles
+            return required_indices.issubset(last_resolved_handles)
+
+        try:
+            await wait_until(_locate_pages, timeout_in_seconds=timeout_in_seconds)
+        except TimeoutError:
+            missing_urls = [str(desired_urls[index]) for index in sorted(required_indices - set(last_resolved_handles))]
+            raise Exception(f'No components whose URLs match {missing_urls} can be found.')
+
+        return {url: last_resolved_handles.get(index) for index, url in enumerate(all_urls)}
@@ -0,0 +1,218 @@
+from __future__ import annotations
+import aiohttp
+import asyncio
+import time
+from json import JSONDecodeError
+from src.async_cdp_connection import AsyncCdpConnection
+from typing import TYPE_CHECKING, Optional
+from urllib.parse import urlparse
+if TYPE_CHECKING:
+    from selenium.webdriver.remote.webdriver import WebDriver
+
+
+class AsyncRemoteDebugger:
+    """
+    The asyncio counterpart of `RemoteDebugger`. Every query is issued through a pooled, keep-alive `aiohttp` session,
+    so a single event loop can keep an eye on the page tables of dozens of sessions at once without a thread apiece.
+
+    Use `await AsyncRemoteDebugger.create(driver)` to create one, since locating the debugger requires querying the
+    Selenium server. As with `RemoteDebugger`, the most recent page table is kept as a short-lived snapshot. Lookups
+    that arrive while a query is already in-flight simply wait for that query's result, rather than issuing their own.
+
+    Page websockets (see `connect_to_page()`) are opened from a session of their own, without a connection limit, so
+    that however many windows are attached to, the pooled HTTP connections stay free for page table queries.
+    """
+
+    def __init__(self, debugger_address: Optional[str], http_session: aiohttp.ClientSession,
+                 page_cache_ttl_in_seconds: float = 0.01) -> None:
+        # Use `create()` rather than constructing directly.
+        self.debugger_address: Optional[str] = debugger_address
+        self.page_cache_ttl_in_seconds: float = page_cache_ttl_in_seconds
+        self._http_session: aiohttp.ClientSession = http_session
+        # Created on first use by `connect_to_page()`.
+        self._websocket_session: Optional[aiohttp.ClientSession] = None
+        self._page_cache: Optional[dict] = None
+        self._page_cache_timestamp: float = 0.0
+        self._page_cache_lock: asyncio.Lock = asyncio.Lock()
+
+    @classmethod
+    async def create(cls, driver: WebDriver, page_cache_ttl_in_seconds: float = 0.01,
+                     timeout_in_seconds: float = 10) -> AsyncRemoteDebugger:
+        """
+        :param driver: A Selenium `WebDriver` object that is hooked into a Chromium-based application.
+        :type driver: WebDriver
+
+        :param page_cache_ttl_in_seconds: How long, in seconds, a snapshot of the debugger's page table may be reused
+                                          before it is considered stale and queried again. Use `0` to disable
+                                          snapshot caching entirely and always query the debugger.
+        :type page_cache_ttl_in_seconds: float
+
+        :param timeout_in_seconds: The maximum time, in seconds, that any single HTTP request may take.
+        :type timeout_in_seconds: float
+
+        :return: A new `AsyncRemoteDebugger`. (Check `is_available` before relying on it.)
+        :rtype: AsyncRemoteDebugger
+        """
+
+        http_session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit_per_host=8),
+                                             timeout=aiohttp.ClientTimeout(total=timeout_in_seconds))
+        debugger_address = await cls._get_remote_debugger_address_from_selenium_driver_instance(driver, http_session)
+        return cls(debugger_address, http_session, page_cache_ttl_in_seconds)
+
+    @property
+    def is_available(self) -> bool:
+        """
+        :return: True if Remote Debugging is available for the Selenium WebDriver object that this object was created
+                 with; False otherwise.
+        :rtype: bool
+        """
+
+        return bool(self.debugger_address)
+
+    def invalidate(self) -> None:
+        """
+        Discard the cached snapshot of the debugger's page table, so that the next call to `get_pages()` is guaranteed
+        to query the debugger again.
+        """
+
+        self._page_cache = None
+        self._page_cache_timestamp = 0.0
+
+    async def close(self) -> None:
+        """
+        Release the pooled HTTP connections held open to the Selenium server and the Remote Debugger.
+        """
+
+        self.invalidate()
+        await self._http_session.close()
+        if self._websocket_session:
+            await self._websocket_session.close()
+
+    async def __aenter__(self) -> AsyncRemoteDebugger:
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    @staticmethod
+    async def _get_remote_debugger_address_from_selenium_driver_instance(
+            driver: WebDriver, http_session: aiohttp.ClientSession) -> Optional[str]:
+        """
+        Query Selenium directly to determine the ChromeDriver Remote Debugger URL for the given WebDriver instance,
+        if one is available. (See `RemoteDebugger._get_remote_debugger_address_from_selenium_driver_instance()`.)
+        """
+
+        try:
+            # noinspection PyProtectedMember
+            selenium_command_executor_url = driver.command_executor._url
+
+            async with http_session.get(f'{selenium_command_executor_url}/sessions') as response:
+                sessions_data = await response.json(content_type=None)
+            debugger_address = sessions_data['value'][0]['capabilities']['goog:chromeOptions']['debuggerAddress']
+            if not debugger_address.startswith('http'):
+                debugger_address = f'http://{debugger_address}'
+
+            # Verify that the reported remote debugger address is actually valid.
+            async with http_session.get(f'{debugger_address}/json') as response:
+                response.raise_for_status()
+
+            return debugger_address
+        except (aiohttp.ClientError, asyncio.TimeoutError, JSONDecodeError, ConnectionRefusedError, KeyError,
+                IndexError):
+            return None
+
+    async def get_pages(self, use_cache: bool = True) -> Optional[dict]:
+        """
+        Query for all available Chromium instances that can be hooked into with Selenium, along with the page URL &
+        title of each. (See `RemoteDebugger.get_pages()`.)
+
+        :param use_cache: Whether or not a recent-enough snapshot of the page table may be reused. If False, the
+                          debugger is always queried (and the snapshot is refreshed with the result.)
+        :type use_cache: bool
+
+        :return: A dictionary keyed on Selenium window handles, with each key containing the values "title" and "url"
+                 corresponding to that page; or `None` if Remote Debugging is not available.
+        :rtype: Optional[dict]
+        """
+
+        if not self.is_available:
+            return None
+
+        requested_at = time.monotonic()
+        async with self._page_cache_lock:
+            # A query that was started after this lookup was requested is as fresh as a new one would be, so lookups
+            # that queued up behind it can share its result even if caching is otherwise disabled.
+            snapshot_age = time.monotonic() - self._page_cache_timestamp
+            is_fresh_enough = snapshot_age < self.page_cache_ttl_in_seconds if use_cache \
+                else self._page_cache_timestamp >= requested_at
+            if self._page_cache is not None and is_fresh_enough:
+                return {handle: dict(page) for handle, page in self._page_cache.items()}
+
+            query_started_at = time.monotonic()
+            pages = await self._query_pages()
+            self._page_cache = pages
+            self._page_cache_timestamp = query_started_at
+            return {handle: dict(page) for handle, page in pages.items()}
+
+    async def get_browser_websocket_url(self) -> Optional[str]:
+        """
+        :return: The `ws://` URL of the browser-level DevTools websocket, if Remote Debugging is available; `None`
+                 otherwise. (See `RemoteDebugger.get_browser_websocket_url()`.)
+        :rtype: Optional[str]
+        """
+
+        if not self.is_available:
+            return None
+
+        async with self._http_session.get(f'{self.debugger_address}/json/version') as response:
+            version_data = await response.json(content_type=None)
+        return version_data.get('webSocketDebuggerUrl')
+
+    def get_page_websocket_url(self, window_handle: str) -> Optional[str]:
+        """
+        :return: The `ws://` URL of the given window's DevTools websocket, if Remote Debugging is available; `None`
+                 otherwise. (See `RemoteDebugger.get_page_websocket_url()`.)
+        :rtype: Optional[str]
+        """
+
+        if not self.is_available:
+            return None
+
+        target_id = window_handle[len('CDwindow-'):] if window_handle.startswith('CDwindow-') else window_handle
+        return f'ws://{urlparse(self.debugger_address).netloc}/devtools/page/{target_id}'
+
+    async def connect_to_page(self, window_handle: str,
+                              timeout_in_seconds: float = 10) -> Optional[AsyncCdpConnection]:
+        """
+        Open a DevTools connection directly to the given window.
+
+        :param window_handle: A Selenium window handle, as returned by `get_pages()`.
+        :type window_handle: str
+
+        :param timeout_in_seconds: The default timeout of commands issued over the connection.
+        :type timeout_in_seconds: float
+
+        :return: A new `AsyncCdpConnection` to the page, if Remote Debugging is available; `None` otherwise. The caller
+                 is responsible for closing it.
+        :rtype: Optional[AsyncCdpConnection]
+        """
+
+        websocket_url = self.get_page_websocket_url(window_handle)
+        if not websocket_url:
+            return None
+        if self._websocket_session is None:
+            # Websockets hold their connection for as long as they're open, so they mustn't count against (or be timed
+            # out by) the limits of the pooled HTTP session.
+            self._websocket_session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=0))
+        return await AsyncCdpConnection.connect(websocket_url, self._websocket_session, timeout_in_seconds)
+
+    async def _query_pages(self) -> dict:
+        """
+        Query the Remote Debugger's `/json` endpoint for the current page table, bypassing the snapshot cache.
+        """
+
+        async with self._http_session.get(f'{self.debugger_address}/json') as response:
+            debugger_data = await response.json(content_type=None)
+
+        return {f'CDwindow-{page_data["id"]}': {'title': page_data['title'], 'url': page_data['url']}
+                for page_data in debugger_data if page_data['type'] == 'page'}
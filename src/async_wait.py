@@ -0,0 +1,211 @@
+from __future__ import annotations
+import asyncio
+import inspect
+import time
+from src.wait import DEFAULT_BACKOFF_POLICY, BackoffPolicy, Deadline, _get_predicate_name, wait_statistics
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+
+
+async def wait_for(predicate: Callable[[], Any], timeout_in_seconds: Optional[float] = None,
+                   deadline: Optional[Deadline] = None, backoff: Optional[BackoffPolicy] = None,
+                   name: Optional[str] = None) -> Any:
+    """
+    The asyncio counterpart of `src.wait.wait_for()`: repeatedly call and wait for the specified predicate to return a
+    "truth-y" value, sleeping between polls (without blocking the event loop) according to the given backoff policy.
+
+    The predicate may be a plain callable or a coroutine function. Deadlines, backoff policies and wait statistics are
+    shared with the synchronous waits, so both kinds of wait can draw down the same `Deadline`. Cancelling the awaiting
+    task stops the wait straight away (and nothing is recorded for it.)
+
+    :param predicate: A callable, accepting no arguments, that you wish to wait on. If it returns an awaitable, that is
+                      awaited. This will be called repeatedly until it returns a "truth-y" value, which is then
+                      immediately returned.
+    :type predicate: Callable[[], Any]
+
+    :param timeout_in_seconds: The maximum time, in seconds, to wait. If a `deadline` is also given, whichever expires
+                               first applies.
+    :type timeout_in_seconds: Optional[float]
+
+    :param deadline: A shared deadline to draw this wait down from.
+    :type deadline: Optional[Deadline]
+
+    :param backoff: The policy determining how long to sleep between polls. Defaults to `DEFAULT_BACKOFF_POLICY`.
+    :type backoff: Optional[BackoffPolicy]
+
+    :param name: The name to record this wait's statistics under. Defaults to the predicate's qualified name.
+    :type name: Optional[str]
+
+    :return: The return value of the given predicate once it resolves to a "truth-y" value.
+
+    :raises TimeoutError: If the given predicate does not resolve to a "truth-y" value before the timeout or deadline
+                          elapses.
+    """
+
+    index_and_result = await wait_any([predicate], timeout_in_seconds, deadline, backoff,
+                                      name or _get_predicate_name(predicate))
+    return index_and_result[1]
+
+
+async def wait_any(predicates: Sequence[Callable[[], Any]], timeout_in_seconds: Optional[float] = None,
+                   deadline: Optional[Deadline] = None, backoff: Optional[BackoffPolicy] = None,
+                   name: Optional[str] = None) -> Tuple[int, Any]:
+    """
+    The asyncio counterpart of `src.wait.wait_any()`: poll several predicates within a single loop, and wait for any one
+    of them to return a "truth-y" value.
+
+    :param predicates: The callables (or coroutine functions), each accepting no arguments, to wait on. They're called
+                       in order on every poll.
+    :type predicates: Sequence[Callable[[], Any]]
+
+    :param timeout_in_seconds: The maximum time, in seconds, to wait. If a `deadline` is also given, whichever expires
+                               first applies.
+    :type timeout_in_seconds: Optional[float]
+
+    :param deadline: A shared deadline to draw this wait down from.
+    :type deadline: Optional[Deadline]
+
+    :param backoff: The policy determining how long to sleep between polls. Defaults to `DEFAULT_BACKOFF_POLICY`.
+    :type backoff: Optional[BackoffPolicy]
+
+    :param name: The name to record this wait's statistics under. Defaults to the predicates' qualified names.
+    :type name: Optional[str]
+
+    :return: The index (within `predicates`) of the first predicate found to return a "truth-y" value, along with
+             that value.
+    :rtype: Tuple[int, Any]
+
+    :raises TimeoutError: If none of the predicates resolve to a "truth-y" value before the timeout or deadline
+                          elapses.
+    """
+
+    name = name or ' | '.join(_get_predicate_name(predicate) for predicate in predicates)
+    found = {}
+
+    async def _poll() -> bool:
+        for index, predicate in enumerate(predicates):
+            result = await _call(predicate)
+            if bool(result):
+                found['result'] = (index, result)
+                return True
+        return False
+
+    await _poll_until(_poll, timeout_in_seconds, deadline, backoff, name)
+    return found['result']
+
+
+async def wait_all(predicates: Sequence[Callable[[], Any]], timeout_in_seconds: Optional[float] = None,
+                   deadline: Optional[Deadline] = None, backoff: Optional[BackoffPolicy] = None,
+                   name: Optional[str] = None) -> List[Any]:
+    """
+    The asyncio counterpart of `src.wait.wait_all()`: poll several predicates within a single loop, and wait for every
+    one of them to return a "truth-y" value. Once a predicate has returned a "truth-y" value, it is not called again.
+
+    :param predicates: The callables (or coroutine functions), each accepting no arguments, to wait on.
+    :type predicates: Sequence[Callable[[], Any]]
+
+    :param timeout_in_seconds: The maximum time, in seconds, to wait. If a `deadline` is also given, whichever expires
+                               first applies.
+    :type timeout_in_seconds: Optional[float]
+
+    :param deadline: A shared deadline to draw this wait down from.
+    :type deadline: Optional[Deadline]
+
+    :param backoff: The policy determining how long to sleep between polls. Defaults to `DEFAULT_BACKOFF_POLICY`.
+    :type backoff: Optional[BackoffPolicy]
+
+    :param name: The name to record this wait's statistics under. Defaults to the predicates' qualified names.
+    :type name: Optional[str]
+
+    :return: The "truth-y" value returned by each predicate, in the same order as `predicates`.
+    :rtype: List[Any]
+
+    :raises TimeoutError: If any of the predicates have not resolved to a "truth-y" value before the timeout or
+                          deadline elapses.
+    """
+
+    name = name or ' & '.join(_get_predicate_name(predicate) for predicate in predicates)
+    results = {}
+
+    async def _poll() -> bool:
+        for index, predicate in enumerate(predicates):
+            if index in results:
+                continue
+            result = await _call(predicate)
+            if bool(result):
+                results[index] = result
+        return len(results) == len(predicates)
+
+    await _poll_until(_poll, timeout_in_seconds, deadline, backoff, name)
+    return [results[index] for index in range(len(predicates))]
+
+
+async def wait_until(predicate: Callable, timeout_in_seconds: float, *args, **kwargs):
+    """
+    The asyncio counterpart of `src.wait.wait_until()`: repeatedly call and wait for the specified predicate to return
+    a "truth-y" value.
+
+    :param predicate: A callable or coroutine function that you wish to wait on. This will be called repeatedly.
+                      If the result resolves to a "false-y" value, then the predicate will continue to be called.
+                      If the result resolves to a "truth-y" value, then the result of the predicate will be
+                      immediately returned.
+    :type predicate: Callable
+
+    :param timeout_in_seconds: The maximum time, in seconds, to wait for the specified predicate to eventually
+                               return a "truth-y" value.
+    :type timeout_in_seconds: float
+
+    :param args: Arbitrary non-keyworded args to pass into the predicate when it is invoked.
+
+    :param kwargs: Arbitrary keyworded args to pass into the predicate when it is invoked.
+
+    :return: The return value of the given predicate once it resolves to a "truth-y" value.
+
+    :raises TimeoutError: If the given predicate does not resolve to a "truth-y" value before the given timeout
+                          elapses.
+    """
+
+    return await wait_for(lambda: predicate(*args, **kwargs), timeout_in_seconds=timeout_in_seconds,
+                          name=_get_predicate_name(predicate))
+
+
+async def _call(predicate: Callable[[], Any]) -> Any:
+    result = predicate()
+    if inspect.isawaitable(result):
+        result = await result
+    return result
+
+
+async def _poll_until(poll: Callable[[], Any], timeout_in_seconds: Optional[float], deadline: Optional[Deadline],
+                      backoff: Optional[BackoffPolicy], name: str) -> None:
+    """
+    The polling loop shared by every type of async wait. (See `src.wait._poll_until()`, which this mirrors exactly,
+    except for sleeping with `asyncio.sleep()`.)
+    """
+
+    start_time = time.monotonic()
+    poll_count = 0
+
+    def _record(succeeded: bool) -> None:
+        wait_statistics.record(name, poll_count, time.monotonic() - start_time, succeeded)
+
+    # Invoke the poll once first before starting any countdown, to guarantee that we can call it at least twice before
+    # timing out with an error.
+    poll_count += 1
+    if await poll():
+        _record(True)
+        return
+
+    deadline = (deadline or Deadline()).child(timeout_in_seconds)
+    for delay in (backoff or DEFAULT_BACKOFF_POLICY).delays():
+        if deadline.expired:
+            break
+        # Always yield to the event loop between polls, even when the backoff policy says to retry immediately, so
+        # that a predicate that never awaits anything can't starve every other task.
+        await asyncio.sleep(min(delay, deadline.remaining))
+        poll_count += 1
+        if await poll():
+            _record(True)
+            return
+
+    _record(False)
+    raise TimeoutError()
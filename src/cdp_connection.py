@@ -0,0 +1,324 @@
+from __future__ import annotations
+import json
+import websocket
+from collections import defaultdict
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from threading import Lock, Thread
+from typing import Callable, Dict, List, Optional
+
+
+class CdpError(Exception):
+    """
+    Raised when a Chrome DevTools Protocol command is answered with an error, or when the connection that a command
+    was issued over is lost before an answer arrives.
+    """
+
+
+class CdpEvaluationError(CdpError):
+    """
+    Raised when JavaScript evaluated via `Runtime.evaluate` throws (or, if it returns a Promise, rejects.)
+    """
+
+
+class CdpConnection:
+    """
+    A persistent connection to a single Chrome DevTools Protocol (CDP) websocket, e.g. the browser-level websocket
+    reported by the Remote Debugger's `/json/version` endpoint, or the per-page `webSocketDebuggerUrl` reported by its
+    `/json` endpoint.
+
+    Further reading: https://chromedevtools.github.io/devtools-protocol/
+
+    Commands are sent with an incrementing id and answered asynchronously, so any number of commands can be in-flight
+    over the same connection at once - `send()` returns a `Future` immediately, and `call()` simply blocks on one.
+    Events pushed by the browser (e.g. `Target.targetCreated`) are dispatched to listeners registered with
+    `add_event_listener()`, and the loss of the connection to listeners registered with `add_close_listener()`. A single
+    background thread reads from the websocket for the lifetime of the connection.
+    """
+
+    def __init__(self, websocket_url: str, timeout_in_seconds: float = 10) -> None:
+        """
+        :param websocket_url: The `ws://` URL of the CDP endpoint to connect to.
+        :type websocket_url: str
+
+        :param timeout_in_seconds: The default time, in seconds, to wait for a command issued via `call()` to be
+                                   answered. Also used as the timeout for establishing the connection.
+        :type timeout_in_seconds: float
+        """
+
+        self.websocket_url: str = websocket_url
+        self.timeout_in_seconds: float = timeout_in_seconds
+
+        self._next_command_id: int = 0
+        self._pending_commands: Dict[int, Future] = {}
+        self._event_listeners: Dict[str, List[Callable]] = defaultdict(list)
+        self._close_listeners: List[Callable[[], None]] = []
+        self._lock: Lock = Lock()
+        self._send_lock: Lock = Lock()
+        self._is_closed: bool = False
+
+        # `suppress_origin` is needed because Chromium rejects websocket connections from unknown origins by default.
+        self._websocket = websocket.create_connection(
+            websocket_url, timeout=timeout_in_seconds, suppress_origin=True, enable_multithread=True)
+        # Reads happen on the background thread below, which should block until the next message arrives.
+        self._websocket.settimeout(None)
+
+        self._reader_thread: Thread = Thread(target=self._read_messages, name=f'CdpConnection({websocket_url})',
+                                             daemon=True)
+        self._reader_thread.start()
+
+    @property
+    def is_connected(self) -> bool:
+        """
+        :return: True if the connection is still open and able to send commands; False otherwise.
+        :rtype: bool
+        """
+
+        return not self._is_closed
+
+    def send(self, method: str, params: Optional[dict] = None, session_id: Optional[str] = None) -> Future:
+        """
+        Issue a CDP command without waiting for it to be answered.
+
+        :param method: The fully-qualified CDP method name, e.g. "Runtime.evaluate".
+        :type method: str
+
+        :param params: The parameters of the command, if any.
+        :type params: Optional[dict]
+
+        :param session_id: The id of a target session (as attached to via `Target.attachToTarget` with
+                           `flatten: true`) to route the command to, if not issuing it to the connection's own target.
+        :type session_id: Optional[str]
+
+        :return: A `Future` that resolves to the command's `result` object, or raises `CdpError` if the command fails.
+        :rtype: Future
+        """
+
+        future = Future()
+        with self._lock:
+            if self._is_closed:
+                future.set_exception(CdpError(f'Connection to {self.websocket_url} is closed.'))
+                return future
+            self._next_command_id += 1
+            command_id = self._next_command_id
+            self._pending_commands[command_id] = future
+
+        message = {'id': command_id, 'method': method, 'params': params or {}}
+        if session_id:
+            message['sessionId'] = session_id
+
+        try:
+            with self._send_lock:
+                self._websocket.send(json.dumps(message))
+        except (websocket.WebSocketException, OSError) as e:
+            with self._lock:
+                self._pending_commands.pop(command_id, None)
+            future.set_exception(CdpError(f'Unable to send "{method}" to {self.websocket_url}: {e}'))
+
+        return future
+
+    def call(self, method: str, params: Optional[dict] = None, session_id: Optional[str] = None,
+             timeout_in_seconds: Optional[float] = None) -> dict:
+        """
+        Issue a CDP command and wait for it to be answered.
+
+        :param method: The fully-qualified CDP method name, e.g. "Runtime.evaluate".
+        :type method: str
+
+        :param params: The parameters of the command, if any.
+        :type params: Optional[dict]
+
+        :param session_id: The id of a target session to route the command to, if any. (See `send()`.)
+        :type session_id: Optional[str]
+
+        :param timeout_in_seconds: The maximum time, in seconds, to wait for an answer. Defaults to the connection's
+                                   `timeout_in_seconds`.
+        :type timeout_in_seconds: Optional[float]
+
+        :return: The command's `result` object.
+        :rtype: dict
+
+        :raises CdpError: If the command fails, or the connection is lost before it is answered.
+        :raises TimeoutError: If the command is not answered before the timeout elapses.
+        """
+
+        timeout = self.timeout_in_seconds if timeout_in_seconds is None else timeout_in_seconds
+        future = self.send(method, params, session_id)
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeoutError:
+            raise TimeoutError(f'No response to "{method}" from {self.websocket_url} within {timeout} seconds.')
+
+    def evaluate(self, expression: str, await_promise: bool = True, session_id: Optional[str] = None) -> Future:
+        """
+        Evaluate a JavaScript expression within the page via `Runtime.evaluate`, without waiting for the result.
+
+        :param expression: The JavaScript expression to evaluate.
+        :type expression: str
+
+        :param await_promise: If the expression evaluates to a Promise, whether or not to wait for it to settle and
+                              resolve to its result, rather than to the Promise itself.
+        :type await_promise: bool
+
+        :param session_id: The id of a target session to evaluate the expression in, if any. (See `send()`.)
+        :type session_id: Optional[str]
+
+        :return: A `Future` that resolves to the (JSON-serializable) value the expression evaluated to, or raises
+                 `CdpEvaluationError` if the expression threw.
+        :rtype: Future
+        """
+
+        value_future = Future()
+
+        def _unwrap(result_future: Future) -> None:
+            try:
+                result = result_future.result()
+            except Exception as e:
+                value_future.set_exception(e)
+                return
+            if 'exceptionDetails' in result:
+                details = result['exceptionDetails']
+                description = details.get('exception', {}).get('description') or details.get('text')
+                value_future.set_exception(CdpEvaluationError(description))
+            else:
+                value_future.set_result(result.get('result', {}).get('value'))
+
+        self.send('Runtime.evaluate', {'expression': expression, 'awaitPromise': await_promise,
+                                       'returnByValue': True}, session_id).add_done_callback(_unwrap)
+        return value_future
+
+    def add_event_listener(self, method: str, callback: Callable[[dict, Optional[str]], None]) -> None:
+        """
+        Register a callback to be invoked every time the browser pushes the given event.
+
+        Callbacks are invoked on the connection's background reader thread, so they should return quickly and must not
+        block on `call()` over this same connection. (Use `send()` instead if a callback needs to issue commands.)
+
+        :param method: The fully-qualified CDP event name, e.g. "Target.targetCreated".
+        :type method: str
+
+        :param callback: A callable accepting the event's `params` object and the id of the target session the event
+                         was raised for (`None` for the connection's own target.)
+        :type callback: Callable[[dict, Optional[str]], None]
+        """
+
+        with self._lock:
+            self._event_listeners[method].append(callback)
+
+    def remove_event_listener(self, method: str, callback: Callable[[dict, Optional[str]], None]) -> None:
+        """
+        Unregister a callback previously registered with `add_event_listener()`.
+
+        :param method: The fully-qualified CDP event name the callback was registered for.
+        :type method: str
+
+        :param callback: The callback to unregister.
+        :type callback: Callable[[dict, Optional[str]], None]
+        """
+
+        with self._lock:
+            if callback in self._event_listeners[method]:
+                self._event_listeners[method].remove(callback)
+
+    def add_close_listener(self, callback: Callable[[], None]) -> None:
+        """
+        Register a callback to be invoked once the connection is closed, whether by `close()` or because the browser
+        went away. If the connection is already closed, the callback is invoked immediately.
+
+        As with event listeners, callbacks may be invoked on the connection's background reader thread.
+
+        :param callback: The callable to invoke.
+        :type callback: Callable[[], None]
+        """
+
+        with self._lock:
+            if not self._is_closed:
+                self._close_listeners.append(callback)
+                return
+        callback()
+
+    def close(self) -> None:
+        """
+        Close the websocket. Any commands still awaiting an answer will fail with `CdpError`.
+        """
+
+        with self._lock:
+            if self._is_closed:
+                return
+            self._is_closed = True
+        try:
+            self._websocket.close()
+        finally:
+            self._fail_pending_commands(f'Connection to {self.websocket_url} was closed.')
+            self._notify_close_listeners()
+
+    def _read_messages(self) -> None:
+        """
+        Background thread loop: read every message off of the websocket and route it to either the pending command
+        it answers, or the listeners of the event it announces.
+        """
+
+        try:
+            while True:
+                raw_message = self._websocket.recv()
+                if not raw_message:
+                    break
+                message = json.loads(raw_message)
+
+                if 'id' in message:
+                    with self._lock:
+                        future = self._pending_commands.pop(message['id'], None)
+                    if future is None:
+                        continue
+                    if 'error' in message:
+                        error = message['error']
+                        future.set_exception(CdpError(f'{error.get("message")} ({error.get("code")})'))
+                    else:
+                        future.set_result(message.get('result', {}))
+
+                elif 'method' in message:
+                    with self._lock:
+                        listeners = list(self._event_listeners.get(message['method'], []))
+                    for listener in listeners:
+                        try:
+                            listener(message.get('params', {}), message.get('sessionId'))
+                        except Exception:
+                            # A misbehaving listener must not take the whole connection down with it.
+                            continue
+        except (websocket.WebSocketException, OSError, ValueError):
+            # The browser went away, or the connection was closed out from under the reader - either way, there is
+            # nothing more to read.
+            pass
+        finally:
+            with self._lock:
+                self._is_closed = True
+            self._fail_pending_commands(f'Connection to {self.websocket_url} was lost.')
+            self._notify_close_listeners()
+
+    def _fail_pending_commands(self, reason: str) -> None:
+        """
+        Fail every command that is still awaiting an answer.
+
+        :param reason: The message of the `CdpError` to fail each command with.
+        :type reason: str
+        """
+
+        with self._lock:
+            pending_commands = list(self._pending_commands.values())
+            self._pending_commands.clear()
+        for future in pending_commands:
+            if not future.done():
+                future.set_exception(CdpError(reason))
+
+    def _notify_close_listeners(self) -> None:
+        """
+        Invoke every close listener, exactly once. (Both `close()` and the reader thread end up here.)
+        """
+
+        with self._lock:
+            close_listeners = self._close_listeners
+            self._close_listeners = []
+        for listener in close_listeners:
+            try:
+                listener()
+            except Exception:
+                continue
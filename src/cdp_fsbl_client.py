@@ -0,0 +1,174 @@
+from __future__ import annotations
+import json
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from src.cdp_connection import CdpConnection
+from src.finsemble_component_discoverer import FinsembleComponentDiscoverer
+from threading import Lock
+from typing import TYPE_CHECKING, Any, Optional
+if TYPE_CHECKING:
+    from selenium.webdriver.remote.webdriver import WebDriver
+    from src.chromedriver_remote_debugger import RemoteDebugger
+
+
+class CdpFsblClient:
+    """
+    Calling the Finsemble API through Selenium (`driver.execute_script("await FSBL.Clients....")`) means first
+    switching Selenium's focus to a component that has access to `FSBL` (e.g. the Toolbar), and then paying for a full
+    round trip through ChromeDriver on every call.
+
+    This class skips ChromeDriver altogether. It opens a DevTools connection directly to the chosen component (via the
+    Remote Debugger), and evaluates JavaScript there with `Runtime.evaluate`. Selenium's focused window is never
+    changed, the connection is kept open between calls, and any number of calls can be in-flight at once.
+
+    E.g.:
+        fsbl = CdpFsblClient(driver)
+        fsbl.call('Clients.WorkspaceClient.createWorkspace', 'Automated Workspace', {})
+        fsbl.evaluate('FSBL.Clients.LauncherClient.spawn("ChartIQ Example App", {addToWorkspace: true})')
+    """
+
+    def __init__(self, driver: WebDriver, component_url: str = 'Toolbar/index.html',
+                 timeout_in_seconds: float = 30) -> None:
+        """
+        :param driver: A Selenium `WebDriver` object that is hooked into Finsemble, with Remote Debugging available.
+        :type driver: WebDriver
+
+        :param component_url: The URL of the component to evaluate JavaScript within. This is matched on a "partial"
+                              basis, like `FinsembleComponentDiscoverer.get_selenium_handle_of_page_containing_url()`.
+        :type component_url: str
+
+        :param timeout_in_seconds: The default time, in seconds, to wait for a call to complete.
+        :type timeout_in_seconds: float
+
+        :raises Exception: If Remote Debugging is not available for the given driver.
+        """
+
+        self.component_url: str = component_url
+        self.timeout_in_seconds: float = timeout_in_seconds
+
+        self._discoverer: FinsembleComponentDiscoverer = FinsembleComponentDiscoverer(driver)
+        self._remote_debugger: RemoteDebugger = self._discoverer.remote_debugger
+        if not self._remote_debugger.is_available:
+            self._discoverer.close()
+            raise Exception('A CdpFsblClient requires ChromeDriver Remote Debugging to be available.')
+
+        self._connection: Optional[CdpConnection] = None
+        self._connection_lock: Lock = Lock()
+
+    @property
+    def connection(self) -> CdpConnection:
+        """
+        :return: The DevTools connection to the component, (re)connecting to it first if needed - e.g. if the
+                 component has been reloaded since the last call.
+        :rtype: CdpConnection
+        """
+
+        with self._connection_lock:
+            if self._connection is None or not self._connection.is_connected:
+                component_handle = self._discoverer.get_selenium_handle_of_page_containing_url(self.component_url)
+                self._connection = self._remote_debugger.connect_to_page(component_handle, self.timeout_in_seconds)
+            return self._connection
+
+    def evaluate_async(self, expression: str) -> Future:
+        """
+        Evaluate a JavaScript expression within the component without waiting for it to complete. If it evaluates to a
+        Promise, the returned `Future` resolves once the Promise does.
+
+        :param expression: The JavaScript expression to evaluate. E.g.: `FSBL.Clients.WorkspaceClient.getWorkspaces()`
+        :type expression: str
+
+        :return: A `Future` that resolves to the (JSON-serializable) value of the expression, or raises
+                 `CdpEvaluationError` if it threw or rejected.
+        :rtype: Future
+        """
+
+        return self.connection.evaluate(expression)
+
+    def evaluate(self, expression: str, timeout_in_seconds: Optional[float] = None) -> Any:
+        """
+        Evaluate a JavaScript expression within the component and wait for the result. If it evaluates to a Promise,
+        the result that the Promise resolves to is returned.
+
+        :param expression: The JavaScript expression to evaluate. E.g.: `FSBL.Clients.WorkspaceClient.getWorkspaces()`
+        :type expression: str
+
+        :param timeout_in_seconds: The maximum time, in seconds, to wait. Defaults to the client's timeout.
+        :type timeout_in_seconds: Optional[float]
+
+        :return: The (JSON-serializable) value of the expression.
+
+        :raises CdpEvaluationError: If the expression threw or rejected.
+        :raises TimeoutError: If the expression does not complete before the timeout elapses.
+        """
+
+        return self._wait_for(self.evaluate_async(expression), expression, timeout_in_seconds)
+
+    def call_async(self, api_path: str, *args) -> Future:
+        """
+        Call a Finsemble API method without waiting for it to complete.
+
+        :param api_path: The path of the method to call, relative to `FSBL`.
+                         E.g.: "Clients.LauncherClient.spawn"
+        :type api_path: str
+
+        :param args: The arguments to call the method with. Each must be JSON-serializable.
+
+        :return: A `Future` that resolves to the (JSON-serializable) value the method returned (or, if it returned a
+                 Promise, resolved to.)
+        :rtype: Future
+        """
+
+        return self.evaluate_async(_build_api_call_expression(api_path, args))
+
+    def call(self, api_path: str, *args, timeout_in_seconds: Optional[float] = None) -> Any:
+        """
+        Call a Finsemble API method and wait for it to complete.
+
+        :param api_path: The path of the method to call, relative to `FSBL`.
+                         E.g.: "Clients.WorkspaceClient.switchTo"
+        :type api_path: str
+
+        :param args: The arguments to call the method with. Each must be JSON-serializable.
+
+        :param timeout_in_seconds: The maximum time, in seconds, to wait. Defaults to the client's timeout.
+        :type timeout_in_seconds: Optional[float]
+
+        :return: The (JSON-serializable) value the method returned (or, if it returned a Promise, resolved to.)
+
+        :raises CdpEvaluationError: If the method threw or rejected.
+        :raises TimeoutError: If the method does not complete before the timeout elapses.
+        """
+
+        return self._wait_for(self.call_async(api_path, *args), f'FSBL.{api_path}', timeout_in_seconds)
+
+    def close(self) -> None:
+        """
+        Close the DevTools connection to the component.
+        """
+
+        with self._connection_lock:
+            if self._connection:
+                self._connection.close()
+                self._connection = None
+        self._discoverer.close()
+
+    def __enter__(self) -> CdpFsblClient:
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def _wait_for(self, future: Future, description: str, timeout_in_seconds: Optional[float]) -> Any:
+        timeout = self.timeout_in_seconds if timeout_in_seconds is None else timeout_in_seconds
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeoutError:
+            raise TimeoutError(f'"{description}" did not complete within {timeout} seconds.')
+
+
+def _build_api_call_expression(api_path: str, args: tuple) -> str:
+    """
+    Build the JavaScript expression that calls the given Finsemble API method with the given arguments. JSON is valid
+    JavaScript, so the arguments are simply serialized in-line and spread into the call.
+    """
+
+    return f'(async () => await FSBL.{api_path}(...{json.dumps(list(args))}))()'
@@ -0,0 +1,188 @@
+from __future__ import annotations
+import time
+from src.cdp_connection import CdpConnection
+from threading import Condition
+from typing import TYPE_CHECKING, Any, Callable, Dict, Optional
+if TYPE_CHECKING:
+    from src.chromedriver_remote_debugger import RemoteDebugger
+
+
+class CdpTargetWatcher:
+    """
+    Polling the Remote Debugger's `/json` endpoint is a "pull" approach to discovering pages: a newly-spawned window
+    is only noticed on the next poll, and every poll costs a full HTTP request even when nothing has changed.
+
+    This class takes the "push" approach instead. It subscribes once to `Target.setDiscoverTargets` over the
+    browser-level DevTools websocket, and keeps a live, in-memory table of every page target up to date from the
+    `Target.targetCreated` / `Target.targetInfoChanged` / `Target.targetDestroyed` events that the browser sends from
+    then on. Anything waiting on a page to appear is woken up the moment the matching event arrives.
+
+    Further reading: https://chromedevtools.github.io/devtools-protocol/tot/Target/
+    """
+
+    def __init__(self, browser_websocket_url: str, timeout_in_seconds: float = 10) -> None:
+        """
+        :param browser_websocket_url: The `ws://` URL of the browser-level DevTools websocket. (See
+                                      `RemoteDebugger.get_browser_websocket_url()`, or use `from_remote_debugger()`.)
+        :type browser_websocket_url: str
+
+        :param timeout_in_seconds: The maximum time, in seconds, to wait for the initial subscription to complete.
+        :type timeout_in_seconds: float
+        """
+
+        self._pages: Dict[str, dict] = {}
+        self._condition: Condition = Condition()
+
+        self._connection: CdpConnection = CdpConnection(browser_websocket_url, timeout_in_seconds)
+        self._connection.add_event_listener('Target.targetCreated', self._on_target_created_or_changed)
+        self._connection.add_event_listener('Target.targetInfoChanged', self._on_target_created_or_changed)
+        self._connection.add_event_listener('Target.targetDestroyed', self._on_target_destroyed)
+        # Wake up anything waiting on the page table if the browser goes away, rather than letting it sleep until its
+        # timeout elapses.
+        self._connection.add_close_listener(self._on_connection_closed)
+
+        # Subscribe to target events. Chromium immediately announces every already-existing target with a
+        # `targetCreated` event, but seed the table from `Target.getTargets` as well so that it's guaranteed to be
+        # complete by the time the constructor returns.
+        try:
+            self._connection.call('Target.setDiscoverTargets', {'discover': True})
+            for target_info in self._connection.call('Target.getTargets').get('targetInfos', []):
+                self._on_target_created_or_changed({'targetInfo': target_info}, None)
+        except Exception:
+            # Don't leak the connection (and its reader thread) opened above.
+            self._connection.close()
+            raise
+
+    @classmethod
+    def from_remote_debugger(cls, remote_debugger: RemoteDebugger, timeout_in_seconds: float = 10
+                             ) -> Optional[CdpTargetWatcher]:
+        """
+        Create a target watcher over the browser-level DevTools websocket of the given Remote Debugger.
+
+        :param remote_debugger: The Remote Debugger of the application to watch.
+        :type remote_debugger: RemoteDebugger
+
+        :param timeout_in_seconds: The maximum time, in seconds, to wait for the initial subscription to complete.
+        :type timeout_in_seconds: float
+
+        :return: A new `CdpTargetWatcher`, or `None` if the Remote Debugger is not available or does not expose a
+                 browser-level websocket.
+        :rtype: Optional[CdpTargetWatcher]
+        """
+
+        browser_websocket_url = remote_debugger.get_browser_websocket_url()
+        if not browser_websocket_url:
+            return None
+        return cls(browser_websocket_url, timeout_in_seconds)
+
+    @property
+    def is_connected(self) -> bool:
+        """
+        :return: True if the watcher is still receiving target events; False if the connection has been lost, in which
+                 case its page table is no longer being kept up to date.
+        :rtype: bool
+        """
+
+        return self._connection.is_connected
+
+    def get_pages(self) -> dict:
+        """
+        Return the current contents of the live page table, in the same format as `RemoteDebugger.get_pages()`.
+        No request is made - this is a plain in-memory read.
+
+        :return: A dictionary keyed on Selenium window handles, with each key containing the values "title" and "url"
+                 corresponding to that page.
+        :rtype: dict
+        """
+
+        with self._condition:
+            return {handle: dict(page) for handle, page in self._pages.items()}
+
+    def wait_for_page(self, predicate: Callable[[str, dict], bool], timeout_in_seconds: float) -> str:
+        """
+        Wait for a page matching the given predicate to appear in the page table, and return its handle. Returns
+        immediately if such a page is already present; otherwise, the calling thread sleeps until the next target
+        event arrives, rather than on a fixed polling interval.
+
+        :param predicate: A callable accepting a Selenium window handle and its page data (with "title" and "url"
+                          attributes), which returns whether or not that page is the one being waited on.
+        :type predicate: Callable[[str, dict], bool]
+
+        :param timeout_in_seconds: The maximum time, in seconds, to wait for a matching page to appear.
+        :type timeout_in_seconds: float
+
+        :return: The Selenium window handle of the first page found to match the predicate.
+        :rtype: str
+
+        :raises TimeoutError: If no matching page appears before the timeout elapses, or if the connection to the
+                              browser is lost while waiting.
+        """
+
+        return self.wait_for_pages(
+            lambda pages: next((handle for handle, page_data in pages.items() if predicate(handle, page_data)), None),
+            timeout_in_seconds)
+
+    def wait_for_pages(self, predicate: Callable[[dict], Any], timeout_in_seconds: float) -> Any:
+        """
+        Wait for the page table as a whole to satisfy the given predicate. The predicate is evaluated once
+        immediately, and then again each time a target event changes the page table.
+
+        :param predicate: A callable accepting the current page table (in the same format as `get_pages()`), which
+                          returns a "truth-y" value once the page table is in the desired state. The page table must
+                          not be modified by the predicate.
+        :type predicate: Callable[[dict], Any]
+
+        :param timeout_in_seconds: The maximum time, in seconds, to wait for the predicate to be satisfied.
+        :type timeout_in_seconds: float
+
+        :return: The "truth-y" return value of the predicate.
+
+        :raises TimeoutError: If the predicate is not satisfied before the timeout elapses, or if the connection to
+                              the browser is lost while waiting.
+        """
+
+        end_time = time.monotonic() + timeout_in_seconds
+        with self._condition:
+            while True:
+                result = predicate(self._pages)
+                if bool(result):
+                    return result
+
+                if not self.is_connected:
+                    raise TimeoutError('The connection to the browser was lost while waiting for target events.')
+                remaining_time = end_time - time.monotonic()
+                if remaining_time <= 0:
+                    raise TimeoutError()
+                self._condition.wait(remaining_time)
+
+    def close(self) -> None:
+        """
+        Stop watching for target events and close the underlying DevTools connection.
+        """
+
+        self._connection.close()
+
+    def _on_target_created_or_changed(self, params: dict, _session_id: Optional[str]) -> None:
+        target_info = params['targetInfo']
+        handle = f'CDwindow-{target_info["targetId"]}'
+
+        with self._condition:
+            if target_info.get('type') != 'page':
+                # A target can change type (e.g. a page being converted into a background target), so make sure
+                # that anything that's no longer a page also leaves the table.
+                self._pages.pop(handle, None)
+                return
+            self._pages[handle] = {
+                'title': target_info.get('title', ''),
+                'url': target_info.get('url', '')
+            }
+            self._condition.notify_all()
+
+    def _on_connection_closed(self) -> None:
+        with self._condition:
+            self._condition.notify_all()
+
+    def _on_target_destroyed(self, params: dict, _session_id: Optional[str]) -> None:
+        with self._condition:
+            self._pages.pop(f'CDwindow-{params["targetId"]}', None)
+            self._condition.notify_all()
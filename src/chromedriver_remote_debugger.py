@@ -1,8 +1,14 @@
 from __future__ import annotations
 import requests
+import time
 from json import JSONDecodeError
+from requests.adapters import HTTPAdapter
 from requests.exceptions import HTTPError, ConnectionError
+from src.cdp_connection import CdpConnection
+from src.command_metrics import get_command_metrics
+from threading import Lock
 from typing import TYPE_CHECKING, Optional
+from urllib.parse import urlparse
 if TYPE_CHECKING:
     from selenium.webdriver.remote.webdriver import WebDriver
 
@@ -21,11 +27,36 @@ class RemoteDebugger:
     available Chromium handles visible to the Selenium ChromeDriver, along with their associated page URLs & titles,
     in a single query - something that is not possible with the native Selenium API.
     (We'd have to naively iterate one-by-one over all Selenium handles and query for URLs & titles, otherwise.)
+
+    All queries are issued through a single pooled, keep-alive HTTP session, so repeated lookups reuse the same TCP
+    connection to the debugger instead of opening a new one each time. The result of the most recent `/json` query is
+    also kept as a short-lived "snapshot", so that many lookups issued within the same instant (e.g. several components
+    being located back-to-back) can share a single request. Polling loops should only reuse the snapshot on their first
+    poll - see `FinsembleComponentDiscoverer.create_page_poller()`.
     """
 
-    def __init__(self, driver: WebDriver) -> None:
+    def __init__(self, driver: WebDriver, page_cache_ttl_in_seconds: float = 0.01) -> None:
+        """
+        :param driver: A Selenium `WebDriver` object that is hooked into a Chromium-based application.
+        :type driver: WebDriver
+
+        :param page_cache_ttl_in_seconds: How long, in seconds, a snapshot of the debugger's page table may be reused
+                                          before it is considered stale and queried again. Use `0` to disable
+                                          snapshot caching entirely and always query the debugger.
+        :type page_cache_ttl_in_seconds: float
+        """
+
+        self.page_cache_ttl_in_seconds: float = page_cache_ttl_in_seconds
+        self._http_session: requests.Session = RemoteDebugger._create_http_session()
+        command_metrics = get_command_metrics(driver)
+        if command_metrics:
+            # Record the debugger's HTTP requests alongside the driver's own commands.
+            command_metrics.instrument_http_session(self._http_session, 'remote_debugger: ')
+        self._page_cache: Optional[dict] = None
+        self._page_cache_timestamp: float = 0.0
+        self._page_cache_lock: Lock = Lock()
         self.debugger_address: Optional[str] = \
-            RemoteDebugger._get_remote_debugger_address_from_selenium_driver_instance(driver)
+            RemoteDebugger._get_remote_debugger_address_from_selenium_driver_instance(driver, self._http_session)
 
     @property
     def is_available(self) -> bool:
@@ -40,8 +71,45 @@ class RemoteDebugger:
 
         return bool(self.debugger_address)
 
+    def invalidate(self) -> None:
+        """
+        Discard the cached snapshot of the debugger's page table, so that the next call to `get_pages()` is guaranteed
+        to query the debugger again. Call this right after spawning or closing a window, when a snapshot taken only
+        a moment ago may no longer be accurate.
+        """
+
+        with self._page_cache_lock:
+            self._page_cache = None
+            self._page_cache_timestamp = 0.0
+
+    def close(self) -> None:
+        """
+        Release the pooled HTTP connections held open to the Selenium server and the Remote Debugger.
+        """
+
+        self.invalidate()
+        self._http_session.close()
+
     @staticmethod
-    def _get_remote_debugger_address_from_selenium_driver_instance(driver: WebDriver) -> Optional[str]:
+    def _create_http_session() -> requests.Session:
+        """
+        Create the persistent HTTP session used for every query made by this class. Keep-alive is on by default for
+        a `requests.Session`, so mounting a small connection pool is all that's needed for repeated queries to reuse
+        an already-open TCP connection.
+
+        :return: A `requests.Session` with a pooled, keep-alive HTTP adapter mounted.
+        :rtype: requests.Session
+        """
+
+        http_session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=8)
+        http_session.mount('http://', adapter)
+        http_session.mount('https://', adapter)
+        return http_session
+
+    @staticmethod
+    def _get_remote_debugger_address_from_selenium_driver_instance(
+            driver: WebDriver, http_session: Optional[requests.Session] = None) -> Optional[str]:
         """
         Query Selenium directly to determine the ChromeDriver Remote Debugger URL for the given WebDriver instance,
         if one is available.
@@ -49,24 +117,30 @@ class RemoteDebugger:
         :param driver: A Selenium `WebDriver` object that is hooked into a Chromium-based application.
         :type driver: WebDriver
 
+        :param http_session: The HTTP session to issue the queries through. If not provided, a one-off
+                             (non-pooled) request is made instead.
+        :type http_session: Optional[requests.Session]
+
         :return: The URL of the Remote Debugger associated with Chromium instance that the given Selenium Driver is
                  hooked into, if one is available. If not (e.g. the application associated with the given Selenium
                  WebDriver instance does not support ChromeDriver Remote Debugging), then `None` is returned.
         :rtype: Optional[str]
         """
 
+        http = http_session or requests
+
         try:
             # noinspection PyProtectedMember
             selenium_command_executor_url = driver.command_executor._url
 
             # Query the underlying Selenium server to get details about the remote debugger address.
-            sessions_data = requests.get(f'{selenium_command_executor_url}/sessions').json()
+            sessions_data = http.get(f'{selenium_command_executor_url}/sessions').json()
             debugger_address = sessions_data['value'][0]['capabilities']['goog:chromeOptions']['debuggerAddress']
             if not debugger_address.startswith('http'):
                 debugger_address = f'http://{debugger_address}'
 
             # Verify that the reported remote debugger address is actually valid.
-            test_request = requests.get(f'{debugger_address}/json')
+            test_request = http.get(f'{debugger_address}/json')
             test_request.raise_for_status()
 
             # There is a valid Remote Debugger address associated with this Selenium ChromeDriver instance that we
@@ -77,7 +151,7 @@ class RemoteDebugger:
             # a ChromeDriver Remote Debugger means that there is no valid Remote Debugger that we can use.
             return None
 
-    def get_pages(self) -> Optional[dict]:
+    def get_pages(self, use_cache: bool = True) -> Optional[dict]:
         """
         Use the Remote Debugger to query for all available Chromium instances that can be hooked into with Selenium.
         This is similar to using Selenium's built-in `driver.window_handles`, but this method will also return the
@@ -85,6 +159,13 @@ class RemoteDebugger:
         without using the Remote Debugger (i.e. with native Selenium), you'd have to naively iterate over
         `driver.window_handles` to query for each page URL & title, one-by-one.
 
+        Lookups issued within `page_cache_ttl_in_seconds` of each other share the same snapshot of the debugger's page
+        table. Use `invalidate()` (or `use_cache=False`) when the very latest state is required.
+
+        :param use_cache: Whether or not a recent-enough snapshot of the page table may be reused. If False, the
+                          debugger is always queried (and the snapshot is refreshed with the result.)
+        :type use_cache: bool
+
         :return: If Remote Debugging is available for the associated Selenium WebDriver instance, this will return a
                  dictionary keyed on Selenium window handles, with each key containing the values "title" and "url"
                  corresponding to that page.
@@ -96,9 +177,88 @@ class RemoteDebugger:
         if not self.is_available:
             return None
 
+        with self._page_cache_lock:
+            snapshot_age = time.monotonic() - self._page_cache_timestamp
+            if use_cache and self._page_cache is not None and snapshot_age < self.page_cache_ttl_in_seconds:
+                # Hand out a copy so that callers can't mutate the shared snapshot out from under each other.
+                return {handle: dict(page) for handle, page in self._page_cache.items()}
+
+            pages = self._query_pages()
+            self._page_cache = pages
+            self._page_cache_timestamp = time.monotonic()
+            return {handle: dict(page) for handle, page in pages.items()}
+
+    def get_browser_websocket_url(self) -> Optional[str]:
+        """
+        Use the Remote Debugger to look up the browser-level Chrome DevTools Protocol websocket, which can be used to
+        observe and control every target (page) of the application at once, e.g. to subscribe to target events.
+
+        :return: The `ws://` URL of the browser-level DevTools websocket, if Remote Debugging is available for the
+                 associated Selenium WebDriver instance; `None` otherwise.
+        :rtype: Optional[str]
+        """
+
+        if not self.is_available:
+            return None
+
+        version_data = self._http_session.get(f'{self.debugger_address}/json/version').json()
+        return version_data.get('webSocketDebuggerUrl')
+
+    def get_page_websocket_url(self, window_handle: str) -> Optional[str]:
+        """
+        Determine the per-page Chrome DevTools Protocol websocket of the given window, which can be used to inspect
+        and control that page directly (e.g. evaluate JavaScript within it) without going through Selenium at all, and
+        without changing which window Selenium is focused on.
+
+        :param window_handle: A Selenium window handle, as returned by `get_pages()`.
+        :type window_handle: str
+
+        :return: The `ws://` URL of the page's DevTools websocket, if Remote Debugging is available for the associated
+                 Selenium WebDriver instance; `None` otherwise.
+        :rtype: Optional[str]
+        """
+
+        if not self.is_available:
+            return None
+
+        # The websocket of every page lives at a well-known path on the debugger, based on its target id. (This is
+        # also what `/json` reports as the page's `webSocketDebuggerUrl`, except that Chromium omits that field for
+        # pages that another client is already attached to - such as ChromeDriver itself.)
+        target_id = window_handle[len('CDwindow-'):] if window_handle.startswith('CDwindow-') else window_handle
+        return f'ws://{urlparse(self.debugger_address).netloc}/devtools/page/{target_id}'
+
+    def connect_to_page(self, window_handle: str, timeout_in_seconds: float = 10) -> Optional[CdpConnection]:
+        """
+        Open a DevTools connection directly to the given window. (See `get_page_websocket_url()`.)
+
+        :param window_handle: A Selenium window handle, as returned by `get_pages()`.
+        :type window_handle: str
+
+        :param timeout_in_seconds: The default timeout of commands issued over the connection.
+        :type timeout_in_seconds: float
+
+        :return: A new `CdpConnection` to the page, if Remote Debugging is available for the associated Selenium
+                 WebDriver instance; `None` otherwise. The caller is responsible for closing it.
+        :rtype: Optional[CdpConnection]
+        """
+
+        websocket_url = self.get_page_websocket_url(window_handle)
+        if not websocket_url:
+            return None
+        return CdpConnection(websocket_url, timeout_in_seconds)
+
+    def _query_pages(self) -> dict:
+        """
+        Query the Remote Debugger's `/json` endpoint for the current page table, bypassing the snapshot cache.
+
+        :return: A dictionary keyed on Selenium window handles, with each key containing the values "title" and "url"
+                 corresponding to that page.
+        :rtype: dict
+        """
+
         pages = {}
 
-        debugger_data = requests.get(f'{self.debugger_address}/json').json()
+        debugger_data = self._http_session.get(f'{self.debugger_address}/json').json()
         pages_data = [obj for obj in debugger_data if obj['type'] == 'page']
 
         for page_data in pages_data:
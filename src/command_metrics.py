@@ -0,0 +1,361 @@
+from __future__ import annotations
+import json
+import math
+import os
+import sys
+import time
+from collections import deque
+from threading import Lock
+from typing import IO, TYPE_CHECKING, Any, Callable, Deque, Dict, List, Optional, Tuple
+if TYPE_CHECKING:
+    import requests
+    from selenium.webdriver.remote.webdriver import WebDriver
+
+
+class LatencyHistogram:
+    """
+    A fixed-size histogram of latencies. Buckets are spaced logarithmically (four per doubling, from 100µs up to ~10
+    minutes, plus an overflow bucket), so the histogram never grows no matter how many samples it records, while any
+    percentile read from it is accurate to within ~19%.
+    """
+
+    MIN_BOUND_IN_SECONDS = 0.0001
+    BUCKETS_PER_DOUBLING = 4
+    BUCKET_COUNT = 92
+
+    def __init__(self) -> None:
+        self.count: int = 0
+        self.total_in_seconds: float = 0.0
+        self.min_in_seconds: float = float('inf')
+        self.max_in_seconds: float = 0.0
+        self.buckets: List[int] = [0] * (LatencyHistogram.BUCKET_COUNT + 1)
+
+    @staticmethod
+    def upper_bound(bucket_index: int) -> float:
+        """
+        :return: The (inclusive) upper bound, in seconds, of the given bucket. The last bucket is unbounded.
+        :rtype: float
+        """
+
+        if bucket_index >= LatencyHistogram.BUCKET_COUNT:
+            return float('inf')
+        return LatencyHistogram.MIN_BOUND_IN_SECONDS * 2 ** (bucket_index / LatencyHistogram.BUCKETS_PER_DOUBLING)
+
+    def record(self, latency_in_seconds: float) -> None:
+        if latency_in_seconds <= LatencyHistogram.MIN_BOUND_IN_SECONDS:
+            bucket_index = 0
+        else:
+            bucket_index = min(LatencyHistogram.BUCKET_COUNT, math.ceil(
+                math.log2(latency_in_seconds / LatencyHistogram.MIN_BOUND_IN_SECONDS)
+                * LatencyHistogram.BUCKETS_PER_DOUBLING - 1e-9))
+        self.buckets[bucket_index] += 1
+        self.count += 1
+        self.total_in_seconds += latency_in_seconds
+        self.min_in_seconds = min(self.min_in_seconds, latency_in_seconds)
+        self.max_in_seconds = max(self.max_in_seconds, latency_in_seconds)
+
+    @property
+    def mean_in_seconds(self) -> float:
+        return self.total_in_seconds / self.count if self.count else 0.0
+
+    def percentile(self, fraction: float) -> float:
+        """
+        :param fraction: The percentile to estimate, as a fraction, e.g. `0.99`.
+        :type fraction: float
+
+        :return: The upper bound of the bucket that the given percentile falls into (capped at the largest latency
+                 recorded.)
+        :rtype: float
+        """
+
+        if not self.count:
+            return 0.0
+        rank = max(1, math.ceil(fraction * self.count))
+        cumulative_count = 0
+        for bucket_index, bucket_count in enumerate(self.buckets):
+            cumulative_count += bucket_count
+            if cumulative_count >= rank:
+                return min(LatencyHistogram.upper_bound(bucket_index), self.max_in_seconds)
+        return self.max_in_seconds
+
+    def to_dict(self) -> dict:
+        return {
+            'count': self.count,
+            'total_in_seconds': self.total_in_seconds,
+            'mean_in_seconds': self.mean_in_seconds,
+            'min_in_seconds': self.min_in_seconds if self.count else 0.0,
+            'max_in_seconds': self.max_in_seconds,
+            'p50_in_seconds': self.percentile(0.5),
+            'p90_in_seconds': self.percentile(0.9),
+            'p99_in_seconds': self.percentile(0.99)
+        }
+
+
+class MetricsSink:
+    """
+    Receives every latency sample recorded by a `CommandMetrics`, and is closed (e.g. to write out a report) once the
+    driver quits. Subclass this to ship samples elsewhere.
+    """
+
+    def on_sample(self, command: str, latency_in_seconds: float, succeeded: bool) -> None:
+        pass
+
+    def close(self, metrics: CommandMetrics) -> None:
+        pass
+
+
+class InMemorySink(MetricsSink):
+    """
+    Keeps the most recent samples in memory, e.g. to inspect the slowest commands issued during a single test.
+    """
+
+    def __init__(self, max_samples: int = 10000) -> None:
+        self.samples: Deque[Tuple[float, str, float, bool]] = deque(maxlen=max_samples)
+
+    def on_sample(self, command: str, latency_in_seconds: float, succeeded: bool) -> None:
+        self.samples.append((time.time(), command, latency_in_seconds, succeeded))
+
+
+class JsonLinesSink(MetricsSink):
+    """
+    Appends every sample to a file as a line of JSON, e.g. to load into a notebook or a log pipeline later.
+    """
+
+    def __init__(self, path_to_jsonl: str) -> None:
+        self.path_to_jsonl: str = path_to_jsonl
+        self._file: Optional[IO] = None
+        self._lock: Lock = Lock()
+
+    def on_sample(self, command: str, latency_in_seconds: float, succeeded: bool) -> None:
+        line = json.dumps({'timestamp': time.time(), 'command': command, 'latency_in_seconds': latency_in_seconds,
+                           'succeeded': succeeded})
+        with self._lock:
+            if self._file is None:
+                self._file = open(self.path_to_jsonl, 'a')
+            self._file.write(line + '\n')
+
+    def close(self, metrics: CommandMetrics) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+class PrometheusTextSink(MetricsSink):
+    """
+    Writes the histograms out in the Prometheus text exposition format once the driver quits, e.g. for the node
+    exporter's textfile collector to pick up.
+    """
+
+    def __init__(self, path_to_prom: str, metric_name: str = 'webdriver_command_duration_seconds',
+                 labels: Optional[Dict[str, str]] = None) -> None:
+        """
+        :param path_to_prom: The file to write to. It's replaced atomically, so a collector never reads it half-written.
+        :type path_to_prom: str
+
+        :param metric_name: The name of the exported histogram.
+        :type metric_name: str
+
+        :param labels: Additional labels to attach to every series, e.g. `{'suite': 'smoke'}`.
+        :type labels: Optional[Dict[str, str]]
+        """
+
+        self.path_to_prom: str = path_to_prom
+        self.metric_name: str = metric_name
+        self.labels: Dict[str, str] = labels or {}
+
+    def close(self, metrics: CommandMetrics) -> None:
+        temporary_path = f'{self.path_to_prom}.tmp'
+        with open(temporary_path, 'w') as prom_file:
+            prom_file.write(self.render(metrics))
+        os.replace(temporary_path, self.path_to_prom)
+
+    def render(self, metrics: CommandMetrics) -> str:
+        """
+        :return: The histograms of the given metrics, in the Prometheus text exposition format.
+        :rtype: str
+        """
+
+        lines = [f'# HELP {self.metric_name} Latency of WebDriver & Remote Debugger commands.',
+                 f'# TYPE {self.metric_name} histogram']
+        for command, histogram in sorted(metrics.get_histograms().items()):
+            labels = ''.join(f'{key}="{_escape_label_value(value)}",' for key, value in self.labels.items())
+            labels += f'command="{_escape_label_value(command)}"'
+            # Only every power-of-two bound is exported, to keep the number of series down.
+            cumulative_count = 0
+            for bucket_index, bucket_count in enumerate(histogram.buckets):
+                cumulative_count += bucket_count
+                if bucket_index % LatencyHistogram.BUCKETS_PER_DOUBLING == 0 \
+                        and bucket_index < LatencyHistogram.BUCKET_COUNT:
+                    upper_bound = LatencyHistogram.upper_bound(bucket_index)
+                    lines.append(f'{self.metric_name}_bucket{{{labels},le="{upper_bound:g}"}} {cumulative_count}')
+            lines.append(f'{self.metric_name}_bucket{{{labels},le="+Inf"}} {histogram.count}')
+            lines.append(f'{self.metric_name}_sum{{{labels}}} {histogram.total_in_seconds}')
+            lines.append(f'{self.metric_name}_count{{{labels}}} {histogram.count}')
+        return '\n'.join(lines) + '\n'
+
+
+class SummaryReportSink(MetricsSink):
+    """
+    Prints `CommandMetrics.summary()` once the driver quits.
+    """
+
+    def __init__(self, stream: Optional[IO] = None, limit: int = 15) -> None:
+        self.stream: Optional[IO] = stream
+        self.limit: int = limit
+
+    def close(self, metrics: CommandMetrics) -> None:
+        if metrics.get_histograms():
+            print(metrics.summary(self.limit), file=self.stream or sys.stdout)
+
+
+class CommandMetrics:
+    """
+    Latency histograms of every type of command issued to ChromeDriver (e.g. "switchToWindow", "executeScript",
+    "findElement") and to the Remote Debugger (e.g. "GET /json"), so that the commands that dominate a suite's wall time
+    can be found.
+
+    Each type of command has a fixed-size `LatencyHistogram`, so recording a sample costs a few arithmetic operations
+    and memory use stays flat however long the suite runs. Every sample is also passed on to each of the `sinks`.
+    """
+
+    def __init__(self, sinks: Optional[List[MetricsSink]] = None) -> None:
+        """
+        :param sinks: The sinks to pass every sample on to, and to close once the driver quits.
+        :type sinks: Optional[List[MetricsSink]]
+        """
+
+        self.sinks: List[MetricsSink] = list(sinks or [])
+        self._histograms: Dict[str, LatencyHistogram] = {}
+        self._failure_counts: Dict[str, int] = {}
+        self._lock: Lock = Lock()
+
+    def record(self, command: str, latency_in_seconds: float, succeeded: bool = True) -> None:
+        with self._lock:
+            histogram = self._histograms.get(command)
+            if histogram is None:
+                histogram = self._histograms[command] = LatencyHistogram()
+            histogram.record(latency_in_seconds)
+            if not succeeded:
+                self._failure_counts[command] = self._failure_counts.get(command, 0) + 1
+        for sink in self.sinks:
+            sink.on_sample(command, latency_in_seconds, succeeded)
+
+    def get_histograms(self) -> Dict[str, LatencyHistogram]:
+        with self._lock:
+            return dict(self._histograms)
+
+    def get_failure_count(self, command: str) -> int:
+        return self._failure_counts.get(command, 0)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._histograms.clear()
+            self._failure_counts.clear()
+
+    def timed(self, command: str, function: Callable, *args, **kwargs) -> Any:
+        """
+        Call the given function, recording how long it took under the given command name.
+        """
+
+        start_time = time.perf_counter()
+        succeeded = False
+        try:
+            result = function(*args, **kwargs)
+            succeeded = True
+            return result
+        finally:
+            self.record(command, time.perf_counter() - start_time, succeeded)
+
+    def instrument_http_session(self, http_session: requests.Session, prefix: str = '') -> None:
+        """
+        Record the latency of every request made through the given `requests` session, by method & path (e.g.
+        "GET /json"). Latency is as reported by `requests` itself: the time until the response's headers arrived.
+
+        :param http_session: The session to instrument.
+        :type http_session: requests.Session
+
+        :param prefix: A prefix for the recorded command names, to tell different HTTP clients apart.
+        :type prefix: str
+        """
+
+        def _record_response(response: requests.Response, *args, **kwargs) -> None:
+            path = response.request.path_url.split('?', 1)[0]
+            self.record(f'{prefix}{response.request.method} {path}', response.elapsed.total_seconds(), response.ok)
+
+        http_session.hooks['response'].append(_record_response)
+
+    def close(self) -> None:
+        """
+        Close every sink, e.g. to write out its report.
+        """
+
+        for sink in self.sinks:
+            sink.close(self)
+
+    def to_dict(self) -> dict:
+        return {command: {**histogram.to_dict(), 'failure_count': self.get_failure_count(command)}
+                for command, histogram in self.get_histograms().items()}
+
+    def summary(self, limit: int = 15) -> str:
+        """
+        :return: A human-readable table of the command types that took the most time in total.
+        :rtype: str
+        """
+
+        histograms = sorted(self.get_histograms().items(), key=lambda item: item[1].total_in_seconds, reverse=True)
+        lines = [f'{"command":<40} {"count":>7} {"total (s)":>10} {"mean (ms)":>10} {"p50 (ms)":>9} '
+                 f'{"p99 (ms)":>9} {"max (ms)":>9}']
+        for command, histogram in histograms[:limit]:
+            lines.append(f'{command[:40]:<40} {histogram.count:>7} {histogram.total_in_seconds:>10.3f} '
+                         f'{histogram.mean_in_seconds * 1000:>10.1f} {histogram.percentile(0.5) * 1000:>9.1f} '
+                         f'{histogram.percentile(0.99) * 1000:>9.1f} {histogram.max_in_seconds * 1000:>9.1f}')
+        return '\n'.join(lines)
+
+
+def instrument_driver(driver: WebDriver, metrics: Optional[CommandMetrics] = None) -> CommandMetrics:
+    """
+    Record the latency of every command the given driver sends to ChromeDriver, by command type. The metrics are also
+    attached to the driver as `driver.command_metrics`, which lets a `RemoteDebugger` created for the driver record its
+    own HTTP requests alongside. (Drivers launched by `src.selenium_finsemble_launcher` are instrumented already.)
+
+    :param driver: A Selenium `WebDriver` object.
+    :type driver: WebDriver
+
+    :param metrics: The metrics to record into. If not provided, new metrics are created.
+    :type metrics: Optional[CommandMetrics]
+
+    :return: The metrics being recorded into.
+    :rtype: CommandMetrics
+    """
+
+    metrics = metrics or CommandMetrics()
+    instrument_command_executor(driver.command_executor, metrics)
+    driver.command_metrics = metrics
+    return metrics
+
+
+def instrument_command_executor(command_executor: Any, metrics: CommandMetrics) -> None:
+    """
+    Wrap the `execute()` method of a Selenium `RemoteConnection`, so that every command is timed by type.
+    """
+
+    execute = command_executor.execute
+
+    def _timed_execute(command: str, params: dict) -> dict:
+        return metrics.timed(command, execute, command, params)
+
+    command_executor.execute = _timed_execute
+
+
+def get_command_metrics(driver: Any) -> Optional[CommandMetrics]:
+    """
+    :return: The metrics that the given driver has been instrumented with, if any.
+    :rtype: Optional[CommandMetrics]
+    """
+
+    return getattr(driver, 'command_metrics', None)
+
+
+def _escape_label_value(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
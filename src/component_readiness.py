@@ -0,0 +1,325 @@
+from __future__ import annotations
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from src.cdp_connection import CdpError
+from src.finsemble_component_discoverer import FinsembleComponentDiscoverer
+from src.wait import BackoffPolicy, Deadline, wait_for
+from typing import TYPE_CHECKING, Any, Iterable, List, Optional, Union
+if TYPE_CHECKING:
+    from selenium.webdriver.remote.webdriver import WebDriver
+
+
+# Resolves to `true` once Finsemble has finished initializing the window it's evaluated in, or to `null` once the
+# timeout elapses. (`FSBL.addEventListener('onReady')` calls back immediately if Finsemble is already ready; windows
+# where `FSBL` hasn't been injected yet announce it with a `FSBLReady` window event instead.)
+_FSBL_READY_EXPRESSION_TEMPLATE = """
+new Promise(resolve => {
+    const timeout = setTimeout(() => resolve(null), %(timeout_in_ms)d);
+    const onReady = () => {
+        clearTimeout(timeout);
+        resolve(true);
+    };
+    if (window.FSBL && FSBL.addEventListener) {
+        FSBL.addEventListener('onReady', onReady);
+    } else {
+        window.addEventListener('FSBLReady', onReady, { once: true });
+    }
+})
+"""
+
+# Resolves to the first "truth-y" value of `condition`, which is re-checked within the page itself every time the DOM
+# changes (and on a short interval, for state that lives outside the DOM) - or to `null` once the timeout elapses.
+_CONDITION_EXPRESSION_TEMPLATE = """
+new Promise(resolve => {
+    const check = () => {
+        try {
+            return (%(condition)s);
+        } catch (e) {
+            return undefined;
+        }
+    };
+    const initialResult = check();
+    if (initialResult) {
+        resolve(initialResult);
+        return;
+    }
+    const finish = result => {
+        observer.disconnect();
+        clearInterval(interval);
+        clearTimeout(timeout);
+        resolve(result);
+    };
+    const recheck = () => {
+        const result = check();
+        if (result) {
+            finish(result);
+        }
+    };
+    const observer = new MutationObserver(recheck);
+    observer.observe(document, { subtree: true, childList: true, attributes: true, characterData: true });
+    const interval = setInterval(recheck, 100);
+    const timeout = setTimeout(() => finish(null), %(timeout_in_ms)d);
+})
+"""
+
+# Starts settling the given Promise-returning expression in the background, for when Remote Debugging isn't available.
+# Its outcome is stored on `window` under the given key, to be collected with `_COLLECT_SETTLED_SCRIPT`. (Using
+# `execute_script()` twice, rather than `execute_async_script()`, leaves the driver's script timeout untouched.)
+_START_SETTLING_SCRIPT_TEMPLATE = """
+const key = arguments[0];
+window[key] = { settled: false };
+Promise.resolve(%(expression)s).then(
+    value => { window[key] = { settled: true, value: value === undefined ? null : value }; },
+    () => { window[key] = { settled: true, value: null }; });
+"""
+
+# Returns the outcome stored by `_START_SETTLING_SCRIPT_TEMPLATE` (removing it once settled), or `null` if there is
+# none, i.e. if the page has reloaded since.
+_COLLECT_SETTLED_SCRIPT = """
+const key = arguments[0];
+const outcome = window[key] || null;
+if (outcome && outcome.settled) {
+    delete window[key];
+}
+return outcome;
+"""
+
+
+class ReadinessCondition:
+    """
+    What it means for a component to be "ready": by default, Finsemble's `onReady` event having fired in its window.
+    A JavaScript `expression` can be given instead (e.g. "document.querySelector('.chart-loaded')"), in which case the
+    component is ready once the expression evaluates to a "truth-y" value within its window.
+    """
+
+    def __init__(self, url: str, expression: Optional[str] = None) -> None:
+        """
+        :param url: The URL of the component, matched on a "partial" basis. (See
+                    `FinsembleComponentDiscoverer.get_selenium_handle_of_page_containing_url()`.)
+        :type url: str
+
+        :param expression: A JavaScript expression that evaluates to a "truth-y" value once the component is ready.
+                           If not provided, the component is ready once Finsemble is.
+        :type expression: Optional[str]
+        """
+
+        self.url: str = url
+        self.expression: Optional[str] = expression
+
+    def get_javascript(self, timeout_in_seconds: float) -> str:
+        """
+        :return: A JavaScript expression that evaluates to a Promise, which resolves to a "truth-y" value once the
+                 component is ready, or to `null` if it isn't ready within the given time.
+        :rtype: str
+        """
+
+        timeout_in_ms = int(timeout_in_seconds * 1000)
+        if self.expression is None:
+            return _FSBL_READY_EXPRESSION_TEMPLATE % {'timeout_in_ms': timeout_in_ms}
+        return _CONDITION_EXPRESSION_TEMPLATE % {'condition': self.expression, 'timeout_in_ms': timeout_in_ms}
+
+    def __repr__(self) -> str:
+        return f'ReadinessCondition({self.url!r})' if self.expression is None \
+            else f'ReadinessCondition({self.url!r}, {self.expression!r})'
+
+
+class ReadyComponent:
+    """
+    A component that has become ready, as returned by `ComponentReadinessWaiter`.
+    """
+
+    def __init__(self, condition: ReadinessCondition, handle: str, value: Any) -> None:
+        self.condition: ReadinessCondition = condition
+        self.handle: str = handle
+        # The "truth-y" value the readiness expression evaluated to (`True` for Finsemble's `onReady`.)
+        self.value: Any = value
+
+    def __repr__(self) -> str:
+        return f'ReadyComponent({self.condition.url!r}, {self.handle!r})'
+
+
+class ComponentReadinessWaiter:
+    """
+    A component's URL appearing in the page table only means that its window exists, not that it has finished
+    loading - so tests that locate a component by URL then usually go on to poll its DOM until it's usable, paying for
+    two rounds of polling per step.
+
+    This class waits for components to be *ready* instead. Once a component's window appears, a one-time listener for
+    Finsemble's `onReady` event (or a custom JavaScript condition, which is re-checked inside the page whenever its DOM
+    changes) is installed in it over a DevTools connection, and the wait resolves as soon as the page signals it - with
+    no further round trips while waiting. Any number of components can be waited on at once, concurrently, under a
+    single deadline.
+
+    E.g.:
+        readiness = ComponentReadinessWaiter(driver)
+        chart = readiness.wait_for_ready('technical-analysis-chart.html')
+        toolbar, chart = readiness.wait_for_all_ready([
+            'Toolbar/index.html',
+            ReadinessCondition('technical-analysis-chart.html', "document.querySelector('cq-chart-title')")
+        ])
+
+    If Remote Debugging is not available, each condition is instead started within its window with Selenium, and its
+    outcome polled for until it settles.
+    """
+
+    def __init__(self, driver: WebDriver, discoverer: Optional[FinsembleComponentDiscoverer] = None) -> None:
+        """
+        :param driver: A Selenium `WebDriver` object that is hooked into Finsemble.
+        :type driver: WebDriver
+
+        :param discoverer: The discoverer to locate components with. If not provided, one is created.
+        :type discoverer: Optional[FinsembleComponentDiscoverer]
+        """
+
+        self._driver: WebDriver = driver
+        self._owns_discoverer: bool = discoverer is None
+        self._discoverer: FinsembleComponentDiscoverer = discoverer or FinsembleComponentDiscoverer(driver)
+
+    def wait_for_ready(self, condition: Union[str, ReadinessCondition], timeout_in_seconds: float = 10,
+                       deadline: Optional[Deadline] = None) -> ReadyComponent:
+        """
+        Wait for a single component to appear and become ready.
+
+        :param condition: The URL of the component (to wait for Finsemble's `onReady` in), or a `ReadinessCondition`.
+        :type condition: Union[str, ReadinessCondition]
+
+        :param timeout_in_seconds: The maximum time, in seconds, to wait.
+        :type timeout_in_seconds: float
+
+        :param deadline: A shared deadline to draw this wait down from.
+        :type deadline: Optional[Deadline]
+
+        :return: The ready component.
+        :rtype: ReadyComponent
+
+        :raises TimeoutError: If the component doesn't appear, or isn't ready, in time.
+        """
+
+        return self.wait_for_all_ready([condition], timeout_in_seconds, deadline)[0]
+
+    def wait_for_all_ready(self, conditions: Iterable[Union[str, ReadinessCondition]], timeout_in_seconds: float = 30,
+                           deadline: Optional[Deadline] = None) -> List[ReadyComponent]:
+        """
+        Wait for every one of the given components to appear and become ready, concurrently.
+
+        :param conditions: The URLs of the components (to wait for Finsemble's `onReady` in), or `ReadinessCondition`s.
+        :type conditions: Iterable[Union[str, ReadinessCondition]]
+
+        :param timeout_in_seconds: The maximum time, in seconds, to wait for all of the components.
+        :type timeout_in_seconds: float
+
+        :param deadline: A shared deadline to draw this wait down from.
+        :type deadline: Optional[Deadline]
+
+        :return: The ready components, in the same order as the given conditions.
+        :rtype: List[ReadyComponent]
+
+        :raises TimeoutError: If any component doesn't appear, or isn't ready, in time.
+        """
+
+        conditions = [condition if isinstance(condition, ReadinessCondition) else ReadinessCondition(condition)
+                      for condition in conditions]
+        deadline = (deadline or Deadline()).child(timeout_in_seconds)
+
+        if not self._discoverer.remote_debugger.is_available:
+            return [self._wait_with_selenium(condition, deadline) for condition in conditions]
+
+        with ThreadPoolExecutor(max_workers=max(1, len(conditions))) as executor:
+            futures = [executor.submit(self._wait_over_cdp, condition, deadline) for condition in conditions]
+            results = [future.exception() or future.result() for future in futures]
+
+        failures = [str(result) for result in results if isinstance(result, Exception)]
+        if failures:
+            raise TimeoutError('Not every component became ready in time:\n  ' + '\n  '.join(failures))
+        return results
+
+    def close(self) -> None:
+        if self._owns_discoverer:
+            self._discoverer.close()
+
+    def __enter__(self) -> ComponentReadinessWaiter:
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def _locate(self, condition: ReadinessCondition, deadline: Deadline) -> str:
+        poll_pages = self._discoverer.create_page_poller()
+
+        def _locate_page() -> Optional[str]:
+            return next((handle for handle, page in poll_pages().items()
+                         if condition.url.lower() in page['url'].lower()), None)
+
+        try:
+            return wait_for(_locate_page, deadline=deadline, name=f'{type(self).__name__}._locate({condition.url})')
+        except TimeoutError:
+            raise TimeoutError(f'No component whose URL contains "{condition.url}" can be found.')
+
+    def _wait_over_cdp(self, condition: ReadinessCondition, deadline: Deadline) -> ReadyComponent:
+        """
+        Locate the component, then evaluate its readiness condition over a DevTools connection. (Runs on a worker
+        thread.) The evaluation is retried if the page reloads (destroying the Promise being awaited) part-way through,
+        backing off between retries so that a page that keeps failing isn't hammered with new connections.
+        """
+
+        handle = self._locate(condition, deadline)
+        last_error = None
+        retry_delays = BackoffPolicy(initial_delay_in_seconds=0.01).delays()
+        while not deadline.expired:
+            connection = None
+            try:
+                connection = self._discoverer.remote_debugger.connect_to_page(handle, deadline.remaining)
+                value = connection.evaluate(condition.get_javascript(deadline.remaining)).result(
+                    timeout=deadline.remaining + 1)
+                if value:
+                    return ReadyComponent(condition, handle, value)
+                break
+            except (CdpError, FutureTimeoutError) as e:
+                last_error = e
+                time.sleep(min(next(retry_delays), deadline.remaining))
+            except Exception as e:
+                # The window closed (or never accepted a connection); it may be replaced by a new one.
+                last_error = e
+                time.sleep(min(next(retry_delays), deadline.remaining))
+                handle = self._locate(condition, deadline)
+            finally:
+                if connection:
+                    connection.close()
+
+        reason = f' (last error: {last_error})' if last_error else ''
+        raise TimeoutError(f'The component whose URL contains "{condition.url}" did not become ready{reason}.')
+
+    def _wait_with_selenium(self, condition: ReadinessCondition, deadline: Deadline) -> ReadyComponent:
+        """
+        Locate the component, then start evaluating its readiness condition within its window and poll for the outcome.
+        Focus is only held for each individual poll, so waits on other components can interleave. The evaluation is
+        restarted if the page reloads part-way through.
+        """
+
+        handle = self._locate(condition, deadline)
+        key = f'__componentReadiness_{uuid.uuid4().hex}'
+        focus_manager = self._discoverer.focus_manager
+
+        def _start() -> None:
+            script = _START_SETTLING_SCRIPT_TEMPLATE % {'expression': condition.get_javascript(deadline.remaining)}
+            with focus_manager.in_window(handle):
+                self._driver.execute_script(script, key)
+
+        def _collect() -> Optional[dict]:
+            with focus_manager.in_window(handle):
+                outcome = self._driver.execute_script(_COLLECT_SETTLED_SCRIPT, key)
+            if outcome is None:
+                _start()
+                return None
+            return outcome if outcome['settled'] else None
+
+        _start()
+        try:
+            outcome = wait_for(_collect, deadline=deadline,
+                               name=f'{type(self).__name__}._wait_with_selenium({condition.url})')
+        except TimeoutError:
+            outcome = None
+        if not outcome or not outcome['value']:
+            raise TimeoutError(f'The component whose URL contains "{condition.url}" did not become ready.')
+        return ReadyComponent(condition, handle, outcome['value'])
@@ -0,0 +1,344 @@
+from __future__ import annotations
+import json
+import logging
+import time
+import uuid
+from collections import Counter, deque
+from concurrent.futures import Future
+from logging.handlers import RotatingFileHandler
+from src.cdp_connection import CdpConnection
+from src.finsemble_component_discoverer import FinsembleComponentDiscoverer
+from threading import Lock
+from typing import TYPE_CHECKING, Deque, Dict, List, Optional, Set
+if TYPE_CHECKING:
+    from selenium.webdriver.remote.webdriver import WebDriver
+
+
+# Log levels, from least to most severe. Every console call, exception and browser log entry is mapped onto one.
+LOG_LEVELS = ['debug', 'info', 'warning', 'error']
+
+_CONSOLE_API_LEVELS = {'debug': 'debug', 'warning': 'warning', 'error': 'error', 'assert': 'error'}
+_LOG_DOMAIN_LEVELS = {'verbose': 'debug', 'info': 'info', 'warning': 'warning', 'error': 'error'}
+
+
+class ConsoleLogEntry:
+    """
+    A single console message, uncaught exception, or browser log entry (e.g. a failed network request), from any
+    window. `timestamp` is the wall-clock time (in seconds since the epoch) reported by the window itself.
+    """
+
+    __slots__ = ('sequence_number', 'timestamp', 'level', 'source', 'url', 'text')
+
+    def __init__(self, sequence_number: int, timestamp: float, level: str, source: str, url: str, text: str) -> None:
+        self.sequence_number: int = sequence_number
+        self.timestamp: float = timestamp
+        self.level: str = level
+        self.source: str = source
+        self.url: str = url
+        self.text: str = text
+
+    def __str__(self) -> str:
+        return f'[{self.level}] {self.url}: {self.text}'
+
+    def to_dict(self) -> dict:
+        # Keys are kept short, since they're repeated on every line of the log stream.
+        return {'seq': self.sequence_number, 'ts': self.timestamp, 'level': self.level, 'source': self.source,
+                'url': self.url, 'text': self.text}
+
+
+class ConsoleLogMark:
+    """
+    A point in the log stream (e.g. the start of a test step), as returned by `ConsoleLogCollector.mark()`.
+    """
+
+    def __init__(self, name: str, sequence_number: int, counts_by_level: Dict[str, int]) -> None:
+        self.name: str = name
+        self.sequence_number: int = sequence_number
+        self.counts_by_level: Dict[str, int] = counts_by_level
+
+
+class ConsoleLogCollector:
+    """
+    Errors logged by background components (services, hidden windows, or any window other than the one Selenium
+    happens to be focused on) are easily missed, since Selenium only ever sees the logs of the focused window.
+
+    This collector subscribes to the console messages (`Runtime.consoleAPICalled`), uncaught exceptions
+    (`Runtime.exceptionThrown`) and browser log entries (`Log.entryAdded`) of every window at once, over a single
+    browser-level DevTools connection: it attaches to every existing page target, and to every new one the moment the
+    browser announces it. Each entry is tagged with the URL of the window it came from, and appended to a compact,
+    rotating JSON lines log.
+
+    Tests can mark a point in the stream (e.g. the start of a step) and later ask how many errors have been logged
+    since, which takes constant time no matter how many entries have been logged, since only running counts per level
+    are compared.
+
+    E.g.:
+        with ConsoleLogCollector(driver, 'logs/console.jsonl') as console_logs:
+            step_start = console_logs.mark('open_chart')
+            open_chart()
+            console_logs.assert_no_errors_since(step_start)
+
+    Remote Debugging must be available for the driver.
+    """
+
+    def __init__(self, driver: WebDriver, log_path: Optional[str] = None,
+                 discoverer: Optional[FinsembleComponentDiscoverer] = None, max_log_size_in_bytes: int = 10 * 1024 ** 2,
+                 log_backup_count: int = 5, recent_entry_count: int = 1000, timeout_in_seconds: float = 10) -> None:
+        """
+        :param driver: A Selenium `WebDriver` object that is hooked into Finsemble.
+        :type driver: WebDriver
+
+        :param log_path: The file to write the log stream to, as JSON lines. If not provided, entries are only counted
+                         (and the most recent ones kept in memory.)
+        :type log_path: Optional[str]
+
+        :param discoverer: The discoverer whose Remote Debugger to connect through. If not provided, one is created (and
+                           closed again along with the collector.)
+        :type discoverer: Optional[FinsembleComponentDiscoverer]
+
+        :param max_log_size_in_bytes: The size at which the log file is rotated.
+        :type max_log_size_in_bytes: int
+
+        :param log_backup_count: How many rotated log files to keep, e.g. "console.jsonl.1" to "console.jsonl.5".
+        :type log_backup_count: int
+
+        :param recent_entry_count: How many of the most recent entries to keep in memory, to describe them when an
+                                   assertion fails.
+        :type recent_entry_count: int
+
+        :param timeout_in_seconds: The maximum time, in seconds, to wait to connect to the browser.
+        :type timeout_in_seconds: float
+
+        :raises Exception: If Remote Debugging is not available for the driver.
+        """
+
+        self.log_path: Optional[str] = log_path
+
+        self._owns_discoverer: bool = discoverer is None
+        self._discoverer: FinsembleComponentDiscoverer = discoverer or FinsembleComponentDiscoverer(driver)
+        browser_websocket_url = self._discoverer.remote_debugger.get_browser_websocket_url()
+        if not browser_websocket_url:
+            self.close()
+            raise Exception('Remote Debugging is not available, so console logs cannot be collected.')
+
+        self._lock: Lock = Lock()
+        self._sequence_number: int = 0
+        self._counts_by_level: Counter = Counter()
+        self._counts_by_url: Counter = Counter()
+        self._recent_entries: Deque[ConsoleLogEntry] = deque(maxlen=recent_entry_count)
+        self._urls_by_target_id: Dict[str, str] = {}
+        self._target_ids_by_session_id: Dict[str, str] = {}
+        self._attached_target_ids: Set[str] = set()
+
+        self._logger: Optional[logging.Logger] = None
+        try:
+            if log_path:
+                # A dedicated logger, so that entries are neither formatted nor propagated anywhere else.
+                self._logger = logging.getLogger(f'{__name__}.{uuid.uuid4().hex}')
+                self._logger.propagate = False
+                self._logger.setLevel(logging.INFO)
+                handler = RotatingFileHandler(log_path, maxBytes=max_log_size_in_bytes, backupCount=log_backup_count,
+                                              encoding='utf-8')
+                handler.setFormatter(logging.Formatter('%(message)s'))
+                self._logger.addHandler(handler)
+
+            self._connection: CdpConnection = CdpConnection(browser_websocket_url, timeout_in_seconds)
+            for method, listener in [('Target.targetCreated', self._on_target_created_or_changed),
+                                     ('Target.targetInfoChanged', self._on_target_created_or_changed),
+                                     ('Target.targetDestroyed', self._on_target_destroyed),
+                                     ('Target.attachedToTarget', self._on_attached_to_target),
+                                     ('Target.detachedFromTarget', self._on_detached_from_target),
+                                     ('Runtime.consoleAPICalled', self._on_console_api_called),
+                                     ('Runtime.exceptionThrown', self._on_exception_thrown),
+                                     ('Log.entryAdded', self._on_log_entry_added)]:
+                self._connection.add_event_listener(method, listener)
+
+            self._connection.call('Target.setDiscoverTargets', {'discover': True})
+            for target_info in self._connection.call('Target.getTargets').get('targetInfos', []):
+                self._on_target_created_or_changed({'targetInfo': target_info}, None)
+        except Exception:
+            # Don't leak the log file, the connection, or the discoverer created above.
+            self.close()
+            raise
+
+    @property
+    def is_connected(self) -> bool:
+        return self._connection.is_connected
+
+    @property
+    def attached_target_count(self) -> int:
+        with self._lock:
+            return len(self._target_ids_by_session_id)
+
+    def mark(self, name: str = '') -> ConsoleLogMark:
+        """
+        Mark the current point in the log stream, e.g. the start of a test step.
+
+        :param name: A name for the mark, e.g. the name of the step.
+        :type name: str
+
+        :return: The mark, to pass into `count_since()`, `get_entries_since()`, or `assert_no_errors_since()`.
+        :rtype: ConsoleLogMark
+        """
+
+        with self._lock:
+            return ConsoleLogMark(name, self._sequence_number, dict(self._counts_by_level))
+
+    def count_since(self, mark: Optional[ConsoleLogMark] = None, min_level: str = 'error') -> int:
+        """
+        :param mark: The point in the log stream to count from. If not provided, every entry is counted.
+        :type mark: Optional[ConsoleLogMark]
+
+        :param min_level: The least severe level to count. (See `LOG_LEVELS`.)
+        :type min_level: str
+
+        :return: How many entries of at least the given level have been logged since the mark.
+        :rtype: int
+        """
+
+        levels = LOG_LEVELS[LOG_LEVELS.index(min_level):]
+        with self._lock:
+            count = sum(self._counts_by_level[level] for level in levels)
+        if mark:
+            count -= sum(mark.counts_by_level.get(level, 0) for level in levels)
+        return count
+
+    def count_by_url(self) -> Dict[str, int]:
+        """
+        :return: How many errors each window URL has logged in total.
+        :rtype: Dict[str, int]
+        """
+
+        with self._lock:
+            return dict(self._counts_by_url)
+
+    def get_entries_since(self, mark: Optional[ConsoleLogMark] = None, min_level: str = 'error'
+                          ) -> List[ConsoleLogEntry]:
+        """
+        :return: The entries of at least the given level that have been logged since the mark, as far as they're still
+                 held in memory. (Only the most recent `recent_entry_count` entries are; see the log file for the rest.)
+        :rtype: List[ConsoleLogEntry]
+        """
+
+        min_level_index = LOG_LEVELS.index(min_level)
+        sequence_number = mark.sequence_number if mark else 0
+        with self._lock:
+            return [entry for entry in self._recent_entries if entry.sequence_number > sequence_number
+                    and LOG_LEVELS.index(entry.level) >= min_level_index]
+
+    def assert_no_errors_since(self, mark: Optional[ConsoleLogMark] = None, min_level: str = 'error') -> None:
+        """
+        :raises AssertionError: If any entry of at least the given level has been logged since the mark.
+        """
+
+        count = self.count_since(mark, min_level)
+        if count:
+            since = f' since "{mark.name}"' if mark and mark.name else ''
+            entries = self.get_entries_since(mark, min_level)
+            raise AssertionError(f'{count} console {min_level}(s) logged{since}:\n  '
+                                 + '\n  '.join(str(entry) for entry in entries[-20:]))
+
+    def close(self) -> None:
+        """
+        Stop collecting, and close the log file and the connection to the browser.
+        """
+
+        if getattr(self, '_connection', None):
+            self._connection.close()
+        if getattr(self, '_logger', None):
+            for handler in list(self._logger.handlers):
+                self._logger.removeHandler(handler)
+                handler.close()
+        if self._owns_discoverer:
+            self._discoverer.close()
+
+    def __enter__(self) -> ConsoleLogCollector:
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def _record(self, session_id: Optional[str], timestamp_in_ms: Optional[float], level: str, source: str,
+                text: str) -> None:
+        with self._lock:
+            url = self._urls_by_target_id.get(self._target_ids_by_session_id.get(session_id, ''), '')
+            self._sequence_number += 1
+            timestamp = timestamp_in_ms / 1000 if timestamp_in_ms else time.time()
+            entry = ConsoleLogEntry(self._sequence_number, timestamp, level, source, url, text)
+            self._counts_by_level[level] += 1
+            if level == 'error':
+                self._counts_by_url[url] += 1
+            self._recent_entries.append(entry)
+            if self._logger:
+                # Written under the lock, so that the log stream is in sequence order.
+                self._logger.info(json.dumps(entry.to_dict(), separators=(',', ':')))
+
+    # Event listeners; these run on the connection's reader thread, so they only ever `send()`.
+
+    def _on_target_created_or_changed(self, params: dict, _session_id: Optional[str]) -> None:
+        target_info = params['targetInfo']
+        if target_info.get('type') != 'page':
+            return
+        target_id = target_info['targetId']
+        with self._lock:
+            self._urls_by_target_id[target_id] = target_info.get('url', '')
+            if target_id in self._attached_target_ids:
+                return
+            self._attached_target_ids.add(target_id)
+        self._connection.send('Target.attachToTarget', {'targetId': target_id, 'flatten': True}).add_done_callback(
+            lambda future: self._on_attach_to_target_done(target_id, future))
+
+    def _on_attach_to_target_done(self, target_id: str, future: Future) -> None:
+        if future.exception() is not None:
+            # Forget the target, so that attaching to it is tried again the next time it's announced.
+            with self._lock:
+                self._attached_target_ids.discard(target_id)
+
+    def _on_target_destroyed(self, params: dict, _session_id: Optional[str]) -> None:
+        with self._lock:
+            self._attached_target_ids.discard(params['targetId'])
+
+    def _on_attached_to_target(self, params: dict, _session_id: Optional[str]) -> None:
+        session_id = params['sessionId']
+        with self._lock:
+            self._target_ids_by_session_id[session_id] = params['targetInfo']['targetId']
+        # Enabling the `Runtime` domain also replays any console messages logged before the window was attached to.
+        self._connection.send('Runtime.enable', session_id=session_id)
+        self._connection.send('Log.enable', session_id=session_id)
+
+    def _on_detached_from_target(self, params: dict, _session_id: Optional[str]) -> None:
+        with self._lock:
+            target_id = self._target_ids_by_session_id.pop(params.get('sessionId'), None)
+            if target_id:
+                self._attached_target_ids.discard(target_id)
+
+    def _on_console_api_called(self, params: dict, session_id: Optional[str]) -> None:
+        text = ' '.join(_describe_remote_object(arg) for arg in params.get('args', []))
+        self._record(session_id, params.get('timestamp'), _CONSOLE_API_LEVELS.get(params.get('type'), 'info'),
+                     'console', text)
+
+    def _on_exception_thrown(self, params: dict, session_id: Optional[str]) -> None:
+        details = params.get('exceptionDetails', {})
+        text = details.get('exception', {}).get('description') or details.get('text', '')
+        self._record(session_id, params.get('timestamp'), 'error', 'exception', text)
+
+    def _on_log_entry_added(self, params: dict, session_id: Optional[str]) -> None:
+        entry = params.get('entry', {})
+        text = entry.get('text', '')
+        if entry.get('url'):
+            text = f'{text} ({entry["url"]})'
+        self._record(session_id, entry.get('timestamp'), _LOG_DOMAIN_LEVELS.get(entry.get('level'), 'info'),
+                     entry.get('source', 'log'), text)
+
+
+def _describe_remote_object(remote_object: dict) -> str:
+    """
+    :return: A short, human-readable rendering of a `Runtime.RemoteObject`, e.g. an argument passed to `console.log()`.
+    :rtype: str
+    """
+
+    if 'value' in remote_object:
+        value = remote_object['value']
+        return value if isinstance(value, str) else json.dumps(value)
+    return str(remote_object.get('unserializableValue') or remote_object.get('description')
+               or remote_object.get('type', ''))
@@ -1,7 +1,12 @@
 from __future__ import annotations
+from contextlib import contextmanager
+from src.cdp_target_watcher import CdpTargetWatcher
 from src.chromedriver_remote_debugger import RemoteDebugger
+from src.url_matcher import UrlMatcher, UrlPattern
 from src.wait import wait_until
-from typing import TYPE_CHECKING, List
+from src.window_focus_manager import WindowFocusManager
+from src.window_handle_cache import WindowHandleMetadataCache
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, Iterator, List, Optional, Pattern, Union
 if TYPE_CHECKING:
     from selenium.webdriver.remote.webdriver import WebDriver
 
@@ -14,17 +19,103 @@ class FinsembleComponentDiscoverer:
 
     This class provides a few mechanisms to make it easier to search across all of the Chromium instances visible to
     Selenium for a specific component.
+
+    By default, new components are discovered by polling the Remote Debugger. If `use_target_events` is set (and
+    Remote Debugging is available), a `CdpTargetWatcher` is used instead, which keeps a live page table up to date from
+    DevTools target events and wakes up anything waiting on a component the moment it appears.
     """
 
-    def __init__(self, driver: WebDriver) -> None:
+    def __init__(self, driver: WebDriver, use_target_events: bool = False,
+                 window_metadata_ttl_in_seconds: Optional[float] = 5) -> None:
+        """
+        :param driver: A Selenium `WebDriver` object that is hooked into Finsemble.
+        :type driver: WebDriver
+
+        :param use_target_events: Whether or not to discover pages via pushed DevTools target events, rather than by
+                                  polling the Remote Debugger. Ignored if Remote Debugging is not available.
+        :type use_target_events: bool
+
+        :param window_metadata_ttl_in_seconds: If Remote Debugging is not available, how long, in seconds, the URL &
+                                               title learned about each window may be reused before that window is
+                                               visited again. (See `WindowHandleMetadataCache`.)
+        :type window_metadata_ttl_in_seconds: Optional[float]
+        """
+
         self._driver: WebDriver = driver
+        self._focus_manager: WindowFocusManager = WindowFocusManager.for_driver(driver)
         self._remote_debugger: RemoteDebugger = RemoteDebugger(driver)
+        self._window_handle_cache: WindowHandleMetadataCache = \
+            WindowHandleMetadataCache(driver, window_metadata_ttl_in_seconds)
+        self._target_watcher: Optional[CdpTargetWatcher] = None
+        if use_target_events and self._remote_debugger.is_available:
+            self._target_watcher = CdpTargetWatcher.from_remote_debugger(self._remote_debugger)
 
-    def discover_all_available_pages(self) -> dict:
+    def close(self) -> None:
+        """
+        Release any connections held open to the Remote Debugger.
+        """
+
+        if self._target_watcher:
+            self._target_watcher.close()
+        self._remote_debugger.close()
+
+    @property
+    def remote_debugger(self) -> RemoteDebugger:
+        """
+        :return: The Remote Debugger used to discover pages. (Check `is_available` before relying on it.)
+        :rtype: RemoteDebugger
+        """
+
+        return self._remote_debugger
+
+    @property
+    def focus_manager(self) -> WindowFocusManager:
+        """
+        :return: The manager tracking which window the driver is focused on. Switch windows through it (rather than
+                 through `driver.switch_to.window()`) to skip switches into the window that's already focused.
+        :rtype: WindowFocusManager
+        """
+
+        return self._focus_manager
+
+    @contextmanager
+    def in_page_containing_url(self, desired_url: str) -> Iterator[str]:
+        """
+        Focus the component matching the given URL for the duration of a `with` block, then focus whichever window was
+        focused beforehand.
+
+        E.g.:
+            with component_discoverer.in_page_containing_url('Toolbar/index.html'):
+                driver.execute_script("await FSBL.Clients.LauncherClient.spawn(arguments[0], {});", "Welcome Component")
+
+        :param desired_url: The URL of the component to focus, matched on a "partial" basis. (See
+                            `get_selenium_handle_of_page_containing_url()`.)
+        :type desired_url: str
+
+        :raises Exception: If no matching Finsemble component can be found.
+        """
+
+        with self._focus_manager.in_window(self.get_selenium_handle_of_page_containing_url(desired_url)) as handle:
+            yield handle
+
+    def invalidate(self) -> None:
+        """
+        Discard any cached snapshot of the available pages, so that the next lookup reflects the very latest state.
+        Call this right after spawning or closing a window.
+        """
+
+        self._remote_debugger.invalidate()
+        self._window_handle_cache.invalidate()
+
+    def discover_all_available_pages(self, use_cache: bool = True) -> dict:
         """
         Return every single window handle (each one corresponding to a separate Chromium instance) that is currently
         "visible" to Selenium, along with the page URL & title for each one.
 
+        :param use_cache: Whether or not a snapshot of the Remote Debugger's page table taken within the same instant
+                          may be reused. (See `RemoteDebugger.get_pages()`.)
+        :type use_cache: bool
+
         :return: A dictionary keyed on every "window handle" (that can be used with the `driver.window.switch_to()`
                  method) representing all of the Chromium instances currently visible to the Selenium WebDriver object.
                  Each entry in this dictionary will contain the following attributes:
@@ -33,21 +124,35 @@ class FinsembleComponentDiscoverer:
         :rtype: dict
         """
 
+        # If we're subscribed to target events, the live page table is already up to date.
+        if self._target_watcher and self._target_watcher.is_connected:
+            return self._target_watcher.get_pages()
+
         # Use Remote Debugging to discover all pages available to Selenium.
         if self._remote_debugger.is_available:
-            return self._remote_debugger.get_pages()
+            return self._remote_debugger.get_pages(use_cache)
 
         # Remote Debugging is not available for some reason...
-        # Naively iterate over all available window handles with Selenium to generate the requested data structure.
-        pages = {}
-        for window_handle in self._driver.window_handles:
-            self._driver.switch_to.window(window_handle)
-            pages[window_handle] = {
-                'title': self._driver.title,
-                'url': self._driver.current_url
-            }
+        # Fall back to iterating over the window handles with Selenium to generate the requested data structure. (Only
+        # windows we haven't seen before are actually visited, and the focused window is restored afterwards.)
+        return self._window_handle_cache.get_pages()
+
+    def create_page_poller(self) -> Callable[[], dict]:
+        """
+        :return: A callable for polling loops to read the available pages with. Only its first call may reuse a recent
+                 snapshot of the page table; every later call queries afresh, so that the loop notices a new window as
+                 soon as its backoff allows, rather than once the snapshot has expired.
+        :rtype: Callable[[], dict]
+        """
 
-        return pages
+        is_first_poll = True
+
+        def _poll() -> dict:
+            nonlocal is_first_poll
+            use_cache, is_first_poll = is_first_poll, False
+            return self.discover_all_available_pages(use_cache)
+
+        return _poll
 
     def get_selenium_handle_of_page_containing_url(self, desired_url: str) -> str:
         """
@@ -67,11 +172,21 @@ class FinsembleComponentDiscoverer:
         :raises Exception: If no matching Finsemble component can be found.
         """
 
+        # If we're subscribed to target events, there's no need to poll - simply wait to be told about the page.
+        if self._target_watcher and self._target_watcher.is_connected:
+            try:
+                return self._target_watcher.wait_for_page(
+                    lambda handle, page_data: desired_url.lower() in page_data['url'].lower(), timeout_in_seconds=10)
+            except TimeoutError:
+                raise Exception(f'No component whose URL contains "{desired_url}" can be found.')
+
         # Define an inline method that will search for the desired page so that we can pass it in as a callable
         # predicate in order to wait for the page to become visible.
         # (Components may still be loading when this method is called - wait for them to become visible.)
+        poll_pages = self.create_page_poller()
+
         def _locate_page():
-            all_pages = self.discover_all_available_pages()
+            all_pages = poll_pages()
             matching_page_handle = next((handle for handle, page_data in all_pages.items()
                                          if desired_url.lower() in page_data['url'].lower()), None)
             return matching_page_handle
@@ -103,3 +218,65 @@ class FinsembleComponentDiscoverer:
         matching_page_handles = [handle for handle, page_data in all_pages.items()
                                  if desired_url.lower() in page_data['url'].lower()]
         return matching_page_handles
+
+    def get_selenium_handles_of_pages_matching_urls(
+            self, desired_urls: Iterable[Union[str, Pattern, UrlPattern]],
+            optional_urls: Iterable[Union[str, Pattern, UrlPattern]] = (),
+            timeout_in_seconds: float = 10) -> Dict[Union[str, Pattern, UrlPattern], Optional[str]]:
+        """
+        Locate many windows / web pages / Finsemble components at once. This is equivalent to calling
+        `get_selenium_handle_of_page_containing_url()` once per URL, except that every URL is resolved against the same
+        snapshot of the available pages in a single pass, and all of them share one timeout.
+
+        :param desired_urls: The URL patterns of the components that must be found. Each pattern may be a plain string
+                             (matched on a "partial" basis, like `get_selenium_handle_of_page_containing_url()`), a
+                             compiled regular expression, or a `UrlPattern` (e.g. `UrlPattern.glob("*/toolbar/*")`.)
+        :type desired_urls: Iterable[Union[str, Pattern, UrlPattern]]
+
+        :param optional_urls: Additional URL patterns of components to locate if present, but which are not waited on.
+        :type optional_urls: Iterable[Union[str, Pattern, UrlPattern]]
+
+        :param timeout_in_seconds: The maximum time, in seconds, to wait for every one of `desired_urls` to be found.
+        :type timeout_in_seconds: float
+
+        :return: A dictionary keyed on each of the given URL patterns (exactly as they were passed in), with the
+                 Selenium window handle of the first page found to match it. Patterns from `optional_urls` that matched
+                 no page are mapped to `None`.
+        :rtype: Dict[Union[str, Pattern, UrlPattern], Optional[str]]
+
+        :raises Exception: If any of `desired_urls` cannot be found before the timeout elapses.
+        """
+
+        desired_urls = list(desired_urls)
+        all_urls = desired_urls + [url for url in optional_urls if url not in desired_urls]
+
+        # Compile every pattern into a single matcher up-front, so that each page's URL only needs to be scanned once
+        # per snapshot, regardless of how many patterns there are.
+        matcher = UrlMatcher(all_urls)
+        required_indices = set(range(len(desired_urls)))
+
+        def _resolve_all(all_pages: dict) -> Dict[int, str]:
+            resolved_handles = {}
+            for handle, page_data in all_pages.items():
+                for index in matcher.match(page_data['url']):
+                    resolved_handles.setdefault(index, handle)
+            return resolved_handles
+
+        last_resolved_handles = {}
+
+        def _locate_pages(all_pages: dict) -> bool:
+            nonlocal last_resolved_handles
+            last_resolved_handles = _resolve_all(all_pages)
+            return required_indices.issubset(last_resolved_handles)
+
+        try:
+            if self._target_watcher and self._target_watcher.is_connected:
+                self._target_watcher.wait_for_pages(_locate_pages, timeout_in_seconds)
+            else:
+                poll_pages = self.create_page_poller()
+                wait_until(lambda: _locate_pages(poll_pages()), timeout_in_seconds=timeout_in_seconds)
+        except TimeoutError:
+            missing_urls = [str(desired_urls[index]) for index in sorted(required_indices - set(last_resolved_handles))]
+            raise Exception(f'No components whose URLs match {missing_urls} can be found.')
+
+        return {url: last_resolved_handles.get(index) for index, url in enumerate(all_urls)}
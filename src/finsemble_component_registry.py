@@ -0,0 +1,416 @@
+from __future__ import annotations
+import time
+from collections import defaultdict
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from src.cdp_connection import CdpError
+from src.cdp_fsbl_client import CdpFsblClient
+from src.finsemble_component_discoverer import FinsembleComponentDiscoverer
+from src.wait import wait_until
+from threading import RLock
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Tuple
+if TYPE_CHECKING:
+    from selenium.webdriver.remote.webdriver import WebDriver
+
+
+# Reports Finsemble's own view of every window it has launched, along with the active workspace, in a single call.
+# Descriptors are reduced to plain data up-front, since they aren't guaranteed to be JSON-serializable as-is.
+_QUERY_ACTIVE_COMPONENTS_EXPRESSION = """
+(async () => {
+    const { LauncherClient, WorkspaceClient } = FSBL.Clients;
+    const descriptorsResponse = await LauncherClient.getActiveDescriptors();
+    const descriptors = (descriptorsResponse && descriptorsResponse.data) || descriptorsResponse || {};
+    let workspace = WorkspaceClient.activeWorkspace;
+    if (!workspace && WorkspaceClient.getActiveWorkspace) {
+        const workspaceResponse = await WorkspaceClient.getActiveWorkspace();
+        workspace = (workspaceResponse && workspaceResponse.data) || workspaceResponse;
+    }
+    return {
+        workspaceName: (workspace && workspace.name) || null,
+        workspaceWindowNames: ((workspace && workspace.windows) || []).map(w => typeof w === 'string' ? w : w.name),
+        descriptors: Object.keys(descriptors).map(name => {
+            const descriptor = descriptors[name] || {};
+            const component = (descriptor.customData && descriptor.customData.component) || {};
+            return { name: descriptor.name || name, componentType: descriptor.componentType || component.type || null,
+                     url: descriptor.url || null };
+        })
+    };
+})()
+"""
+
+# Reports the Finsemble window name of the window it is evaluated in. (Finsemble also sets this as `window.name`, which
+# is all that non-Finsemble windows have.)
+_QUERY_WINDOW_NAME_EXPRESSION = """
+(() => {
+    try {
+        return FSBL.Clients.WindowClient.getWindowIdentifier().windowName || window.name;
+    } catch (e) {
+        return window.name;
+    }
+})()
+"""
+
+
+class FinsembleComponent:
+    """
+    A single window, as both Selenium and Finsemble see it.
+
+    `spawned_at` is the (wall-clock) time at which the registry first saw the window, which is within one `refresh()`
+    of when Finsemble actually spawned it. Windows that Finsemble doesn't know about (e.g. hidden service windows) have
+    no `component_type`, and are indexed by URL only.
+    """
+
+    def __init__(self, handle: str, url: str, title: str, name: Optional[str] = None,
+                 component_type: Optional[str] = None, workspace: Optional[str] = None,
+                 spawned_at: Optional[float] = None) -> None:
+        self.handle: str = handle
+        self.url: str = url
+        self.title: str = title
+        self.name: Optional[str] = name
+        self.component_type: Optional[str] = component_type
+        self.workspace: Optional[str] = workspace
+        self.spawned_at: float = spawned_at if spawned_at is not None else time.time()
+
+    @property
+    def target_id(self) -> str:
+        """
+        :return: The DevTools target id of the window, i.e. its Selenium handle without the "CDwindow-" prefix.
+        :rtype: str
+        """
+
+        return self.handle[len('CDwindow-'):] if self.handle.startswith('CDwindow-') else self.handle
+
+    def to_dict(self) -> dict:
+        return {
+            'handle': self.handle,
+            'target_id': self.target_id,
+            'url': self.url,
+            'title': self.title,
+            'name': self.name,
+            'component_type': self.component_type,
+            'workspace': self.workspace,
+            'spawned_at': self.spawned_at
+        }
+
+    def __repr__(self) -> str:
+        return f'FinsembleComponent({self.name!r}, type={self.component_type!r}, handle={self.handle!r})'
+
+
+class FinsembleComponentRegistry:
+    """
+    Locating components by URL substring stops being enough once several instances of the same app are open - they
+    all share a URL - and every lookup has to rescan the whole page table.
+
+    This registry instead maps every window (by Selenium handle, or DevTools target id) to Finsemble's own view of it:
+    its component type, its window name, and the workspace it belongs to. Windows are indexed by handle, name, type and
+    URL, so every lookup is a dictionary access.
+
+    The index is kept up to date incrementally by `refresh()`: closed windows are dropped, and only windows that are
+    new (or have navigated) since the last refresh are identified. Identifying them costs one bulk Finsemble API query
+    (`LauncherClient.getActiveDescriptors()`, plus the active workspace), issued from the Toolbar. A window whose URL is
+    shared with another is told apart by its window name, which is read from the window itself (over a DevTools
+    connection if Remote Debugging is available, or by briefly switching Selenium into it otherwise.)
+    """
+
+    def __init__(self, driver: WebDriver, discoverer: Optional[FinsembleComponentDiscoverer] = None,
+                 toolbar_url: str = 'Toolbar/index.html', timeout_in_seconds: float = 10) -> None:
+        """
+        :param driver: A Selenium `WebDriver` object that is hooked into Finsemble.
+        :type driver: WebDriver
+
+        :param discoverer: The discoverer to list the available pages with. If not provided, one is created (and closed
+                           again along with the registry.)
+        :type discoverer: Optional[FinsembleComponentDiscoverer]
+
+        :param toolbar_url: The URL of the component to issue Finsemble API queries from.
+        :type toolbar_url: str
+
+        :param timeout_in_seconds: The maximum time, in seconds, to wait for any single query.
+        :type timeout_in_seconds: float
+        """
+
+        self.toolbar_url: str = toolbar_url
+        self.timeout_in_seconds: float = timeout_in_seconds
+
+        self._driver: WebDriver = driver
+        self._owns_discoverer: bool = discoverer is None
+        self._discoverer: FinsembleComponentDiscoverer = discoverer or FinsembleComponentDiscoverer(driver)
+        self._fsbl_client: Optional[CdpFsblClient] = None
+        self._lock: RLock = RLock()
+
+        self._components_by_handle: Dict[str, FinsembleComponent] = {}
+        self._components_by_name: Dict[str, FinsembleComponent] = {}
+        self._components_by_type: Dict[str, Dict[str, FinsembleComponent]] = defaultdict(dict)
+        self._components_by_url: Dict[str, Dict[str, FinsembleComponent]] = defaultdict(dict)
+
+    @property
+    def components(self) -> List[FinsembleComponent]:
+        with self._lock:
+            return list(self._components_by_handle.values())
+
+    def __len__(self) -> int:
+        return len(self._components_by_handle)
+
+    def __contains__(self, handle: str) -> bool:
+        return handle in self._components_by_handle
+
+    def get_by_handle(self, handle: str) -> Optional[FinsembleComponent]:
+        """
+        :param handle: A Selenium window handle, or a DevTools target id.
+        :type handle: str
+        """
+
+        return self._components_by_handle.get(handle) or self._components_by_handle.get(f'CDwindow-{handle}')
+
+    def get_by_name(self, name: str) -> Optional[FinsembleComponent]:
+        """
+        :param name: A Finsemble window name, e.g. "Welcome Component-13-2882-Finsemble".
+        :type name: str
+        """
+
+        return self._components_by_name.get(name)
+
+    def get_by_type(self, component_type: str) -> List[FinsembleComponent]:
+        """
+        :param component_type: A Finsemble component type, e.g. "Welcome Component".
+        :type component_type: str
+
+        :return: Every open window of the given type, oldest first.
+        :rtype: List[FinsembleComponent]
+        """
+
+        with self._lock:
+            return sorted(self._components_by_type.get(component_type, {}).values(),
+                          key=lambda component: component.spawned_at)
+
+    def get_by_url(self, url: str) -> List[FinsembleComponent]:
+        """
+        :param url: The full URL of a window (compared case-insensitively.) For "partial" matches, use
+                    `FinsembleComponentDiscoverer` instead.
+        :type url: str
+
+        :return: Every open window at the given URL, oldest first.
+        :rtype: List[FinsembleComponent]
+        """
+
+        with self._lock:
+            return sorted(self._components_by_url.get(url.lower(), {}).values(),
+                          key=lambda component: component.spawned_at)
+
+    def refresh(self, full: bool = False) -> Tuple[List[FinsembleComponent], List[FinsembleComponent]]:
+        """
+        Bring the registry up to date with the windows that are currently open.
+
+        :param full: Whether or not to re-identify every window, rather than only those that are new or have navigated
+                     since the last refresh. (E.g. after switching workspaces, since that changes which workspace the
+                     windows that stay open belong to.)
+        :type full: bool
+
+        :return: The components that were added, and the components that were removed, by this refresh. (A window that
+                 has navigated is reported as both removed and re-added.)
+        :rtype: Tuple[List[FinsembleComponent], List[FinsembleComponent]]
+        """
+
+        with self._lock:
+            all_pages = self._discoverer.discover_all_available_pages()
+
+            removed_components = [component for handle, component in list(self._components_by_handle.items())
+                                  if full or handle not in all_pages or all_pages[handle]['url'] != component.url]
+            for component in removed_components:
+                self._remove(component)
+
+            new_handles = [handle for handle in all_pages if handle not in self._components_by_handle]
+            if not new_handles:
+                return [], removed_components
+
+            active_components = self._query_active_components()
+            added_components = self._identify(new_handles, all_pages, active_components)
+            for component in added_components:
+                self._add(component)
+
+            # A window that was removed & re-added keeps its original spawn time.
+            spawn_times = {component.handle: component.spawned_at for component in removed_components}
+            for component in added_components:
+                component.spawned_at = spawn_times.get(component.handle, component.spawned_at)
+
+            return added_components, removed_components
+
+    def wait_for_component(self, name: Optional[str] = None, component_type: Optional[str] = None,
+                           timeout_in_seconds: float = 10) -> FinsembleComponent:
+        """
+        Wait for a window with the given name, or of the given type, to open. If a type is given, the most recently
+        spawned window of that type is returned.
+
+        :param name: The Finsemble window name to wait for.
+        :type name: Optional[str]
+
+        :param component_type: The Finsemble component type to wait for.
+        :type component_type: Optional[str]
+
+        :param timeout_in_seconds: The maximum time, in seconds, to wait.
+        :type timeout_in_seconds: float
+
+        :return: The matching component.
+        :rtype: FinsembleComponent
+
+        :raises Exception: If no matching component opens before the timeout elapses.
+        """
+
+        if name is None and component_type is None:
+            raise ValueError('Either a name or a component type is required.')
+
+        def _locate_component() -> Optional[FinsembleComponent]:
+            self.refresh()
+            if name is not None:
+                return self.get_by_name(name)
+            components = self.get_by_type(component_type)
+            return components[-1] if components else None
+
+        try:
+            return wait_until(_locate_component, timeout_in_seconds=timeout_in_seconds)
+        except TimeoutError:
+            raise Exception(f'No component named "{name}" can be found.' if name is not None
+                            else f'No component of type "{component_type}" can be found.')
+
+    def close(self) -> None:
+        """
+        Release any connections held open by the registry.
+        """
+
+        if self._fsbl_client:
+            self._fsbl_client.close()
+            self._fsbl_client = None
+        if self._owns_discoverer:
+            self._discoverer.close()
+
+    def __enter__(self) -> FinsembleComponentRegistry:
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def _add(self, component: FinsembleComponent) -> None:
+        self._components_by_handle[component.handle] = component
+        self._components_by_url[component.url.lower()][component.handle] = component
+        if component.name:
+            self._components_by_name[component.name] = component
+        if component.component_type:
+            self._components_by_type[component.component_type][component.handle] = component
+
+    def _remove(self, component: FinsembleComponent) -> None:
+        self._components_by_handle.pop(component.handle, None)
+        self._discard_from_index(self._components_by_url, component.url.lower(), component.handle)
+        if component.name and self._components_by_name.get(component.name) is component:
+            del self._components_by_name[component.name]
+        if component.component_type:
+            self._discard_from_index(self._components_by_type, component.component_type, component.handle)
+
+    @staticmethod
+    def _discard_from_index(index: Dict[str, Dict[str, FinsembleComponent]], key: str, handle: str) -> None:
+        components = index.get(key)
+        if components is not None:
+            components.pop(handle, None)
+            if not components:
+                del index[key]
+
+    def _identify(self, handles: List[str], all_pages: dict, active_components: dict) -> List[FinsembleComponent]:
+        """
+        Match each of the given windows up with the Finsemble descriptor it belongs to.
+        """
+
+        descriptors_by_name = {descriptor['name']: descriptor for descriptor in active_components['descriptors']}
+        workspace_window_names = set(active_components['workspaceWindowNames'])
+
+        def _build(handle: str, descriptor: Optional[dict], name: Optional[str]) -> FinsembleComponent:
+            name = descriptor['name'] if descriptor else name
+            return FinsembleComponent(
+                handle, all_pages[handle]['url'], all_pages[handle]['title'], name,
+                descriptor['componentType'] if descriptor else None,
+                active_components['workspaceName'] if name in workspace_window_names else None)
+
+        # A URL that only one descriptor and only one window share identifies the window outright.
+        descriptors_by_url = defaultdict(list)
+        for descriptor in active_components['descriptors']:
+            if descriptor['url']:
+                descriptors_by_url[descriptor['url'].lower()].append(descriptor)
+        handles_by_url = defaultdict(list)
+        for handle, page_data in all_pages.items():
+            handles_by_url[page_data['url'].lower()].append(handle)
+
+        components = []
+        ambiguous_handles = []
+        for handle in handles:
+            url = all_pages[handle]['url'].lower()
+            if len(descriptors_by_url.get(url, ())) == 1 and len(handles_by_url[url]) == 1:
+                components.append(_build(handle, descriptors_by_url[url][0], None))
+            else:
+                ambiguous_handles.append(handle)
+
+        # Every other window has to be asked for its name.
+        window_names = self._query_window_names(ambiguous_handles)
+        for handle in ambiguous_handles:
+            if handle not in window_names:
+                # The window closed while being identified.
+                continue
+            name = window_names[handle] or None
+            components.append(_build(handle, descriptors_by_name.get(name), name))
+
+        return components
+
+    def _query_active_components(self) -> dict:
+        """
+        Issue the bulk Finsemble API query for every active descriptor & the active workspace.
+        """
+
+        if self._discoverer.remote_debugger.is_available:
+            if self._fsbl_client is None:
+                self._fsbl_client = CdpFsblClient(self._driver, self.toolbar_url, self.timeout_in_seconds)
+            return self._fsbl_client.evaluate(_QUERY_ACTIVE_COMPONENTS_EXPRESSION)
+
+        toolbar_handle = self._discoverer.get_selenium_handle_of_page_containing_url(self.toolbar_url)
+        return self._execute_in_windows([toolbar_handle], _QUERY_ACTIVE_COMPONENTS_EXPRESSION)[toolbar_handle]
+
+    def _query_window_names(self, handles: List[str]) -> Dict[str, str]:
+        """
+        Read the Finsemble window name of each of the given windows, concurrently if Remote Debugging is available.
+        Windows that close before they can be asked are omitted.
+        """
+
+        if not handles:
+            return {}
+
+        if not self._discoverer.remote_debugger.is_available:
+            return self._execute_in_windows(handles, _QUERY_WINDOW_NAME_EXPRESSION)
+
+        connections = {}
+        try:
+            for handle in handles:
+                try:
+                    connections[handle] = self._discoverer.remote_debugger.connect_to_page(handle,
+                                                                                           self.timeout_in_seconds)
+                except Exception:
+                    continue
+            futures = {handle: connection.evaluate(_QUERY_WINDOW_NAME_EXPRESSION)
+                       for handle, connection in connections.items()}
+            window_names = {}
+            for handle, future in futures.items():
+                try:
+                    window_names[handle] = future.result(timeout=self.timeout_in_seconds)
+                except (CdpError, FutureTimeoutError):
+                    continue
+            return window_names
+        finally:
+            for connection in connections.values():
+                connection.close()
+
+    def _execute_in_windows(self, handles: Iterable[str], expression: str) -> dict:
+        """
+        Evaluate the given expression in each of the given windows with Selenium, then switch back to whichever window
+        was focused beforehand. Windows that close before they can be visited are omitted.
+        """
+
+        handles = list(handles)
+        batch = self._discoverer.focus_manager.batch()
+        for handle in handles:
+            batch.add(handle, self._driver.execute_script, f'return await {expression};')
+        results = batch.run()
+        return {handle: result for handle, result in zip(handles, results) if handle not in batch.closed_handles}
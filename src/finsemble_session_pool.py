@@ -0,0 +1,306 @@
+from __future__ import annotations
+import time
+from collections import deque
+from contextlib import contextmanager
+from src.finsemble_component_discoverer import FinsembleComponentDiscoverer
+from threading import Condition, Thread
+from typing import TYPE_CHECKING, Callable, Deque, Dict, Iterator, List, Optional
+if TYPE_CHECKING:
+    from src.selenium_finsemble_launcher import FinsembleSession
+
+
+# Creates the workspace that pooled sessions are reset back to, and reports the names of the windows open in it.
+_CREATE_BASELINE_WORKSPACE_SCRIPT = """
+const { WorkspaceClient, LauncherClient } = FSBL.Clients;
+await WorkspaceClient.createWorkspace(arguments[0], {});
+const response = await LauncherClient.getActiveDescriptors();
+return Object.keys((response && response.data) || response || {});
+"""
+
+# Switches back to the baseline workspace, then closes every window that wasn't open in it to begin with (e.g.
+# components spawned without being added to a workspace.) Reports the names of the windows that were closed.
+_RESET_TO_BASELINE_WORKSPACE_SCRIPT = """
+const [baselineWorkspaceName, baselineWindowNames] = arguments;
+const { WorkspaceClient, LauncherClient } = FSBL.Clients;
+await WorkspaceClient.switchTo({ name: baselineWorkspaceName });
+const response = await LauncherClient.getActiveDescriptors();
+const closedWindowNames = [];
+for (const name of Object.keys((response && response.data) || response || {})) {
+    if (baselineWindowNames.includes(name)) continue;
+    const { wrap } = await FSBL.FinsembleWindow.getInstance({ name });
+    await wrap.close({ removeFromWorkspace: true });
+    closedWindowNames.push(name);
+}
+return closedWindowNames;
+"""
+
+
+class _PooledSession:
+    """
+    Bookkeeping for a single session owned by a `FinsembleSessionPool`.
+    """
+
+    def __init__(self, session: FinsembleSession) -> None:
+        self.session: FinsembleSession = session
+        self.discoverer: FinsembleComponentDiscoverer = FinsembleComponentDiscoverer(session.driver)
+        self.use_count: int = 0
+        self.baseline_window_names: List[str] = []
+        self.baseline_window_count: int = 0
+
+
+class FinsembleSessionPool:
+    """
+    Launching Finsemble from cold (starting Electron, loading the manifest, and waiting for the Toolbar) takes tens of
+    seconds, which quickly dominates the run time of a test suite that launches a fresh session for every test.
+
+    This pool keeps launched sessions alive and hands them out to tests one at a time. When a test is done with its
+    session, the session is cheaply reset through the Finsemble API - by switching back to a baseline workspace that
+    was created when the session was launched, and closing any other windows that have been spawned since - rather
+    than by quitting and relaunching it.
+
+    A session is recycled (quit, and replaced by a fresh one on demand) when:
+    - it has been used `max_uses_per_session` times,
+    - resetting it fails, or
+    - it has more windows open after being reset than it did when it was launched (beyond `max_window_growth`.)
+    """
+
+    def __init__(self, launcher: Callable[[], FinsembleSession], max_size: int = 1, max_uses_per_session: int = 20,
+                 max_window_growth: int = 0, baseline_workspace_name: str = 'Automated Baseline Workspace',
+                 toolbar_url: str = 'Toolbar/index.html') -> None:
+        """
+        :param launcher: A callable that launches a new, isolated Finsemble session.
+                         E.g.: `lambda: launch_finsemble_session_from_src(PATH_TO_FINSEMBLE_SEED, PATH_TO_CHROMEDRIVER)`
+        :type launcher: Callable[[], FinsembleSession]
+
+        :param max_size: The maximum number of sessions the pool may have alive at once.
+        :type max_size: int
+
+        :param max_uses_per_session: The number of times a session may be handed out before it is recycled.
+        :type max_uses_per_session: int
+
+        :param max_window_growth: The number of extra windows a session may have open after being reset, compared to
+                                  when it was launched, before it is recycled.
+        :type max_window_growth: int
+
+        :param baseline_workspace_name: The name of the workspace each session is reset back to.
+        :type baseline_workspace_name: str
+
+        :param toolbar_url: The URL of the component to execute Finsemble API calls from.
+        :type toolbar_url: str
+        """
+
+        self.launcher: Callable[[], FinsembleSession] = launcher
+        self.max_size: int = max_size
+        self.max_uses_per_session: int = max_uses_per_session
+        self.max_window_growth: int = max_window_growth
+        self.baseline_workspace_name: str = baseline_workspace_name
+        self.toolbar_url: str = toolbar_url
+
+        self.launch_count: int = 0
+        self.recycle_count: int = 0
+
+        self._condition: Condition = Condition()
+        self._idle_sessions: Deque[_PooledSession] = deque()
+        self._sessions_in_use: Dict[int, _PooledSession] = {}
+        self._session_count: int = 0
+        self._is_closed: bool = False
+
+    def prewarm(self, session_count: Optional[int] = None) -> None:
+        """
+        Launch sessions ahead of time (concurrently), so that the first tests don't have to wait on a cold start.
+
+        :param session_count: The number of sessions to have idle and ready. Defaults to `max_size`.
+        :type session_count: Optional[int]
+
+        :raises Exception: The first error encountered, if any of the sessions failed to launch.
+        """
+
+        with self._condition:
+            if session_count is None:
+                session_count = self.max_size
+            session_count = max(0, min(session_count, self.max_size - self._session_count))
+            self._session_count += session_count
+
+        launch_errors = []
+
+        def _launch_into_pool() -> None:
+            try:
+                pooled_session = self._launch()
+            except Exception as e:
+                launch_errors.append(e)
+                with self._condition:
+                    self._session_count -= 1
+                    self._condition.notify()
+                return
+            with self._condition:
+                self._idle_sessions.append(pooled_session)
+                self._condition.notify()
+
+        threads = [Thread(target=_launch_into_pool, daemon=True) for _ in range(session_count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        if launch_errors:
+            raise launch_errors[0]
+
+    def acquire(self, timeout_in_seconds: Optional[float] = None) -> FinsembleSession:
+        """
+        Take a session out of the pool, launching a new one if none are idle and the pool isn't yet at `max_size`.
+        Otherwise, wait for another test to release one.
+
+        :param timeout_in_seconds: The maximum time, in seconds, to wait for a session to become available. `None`
+                                   waits indefinitely.
+        :type timeout_in_seconds: Optional[float]
+
+        :return: A session in its baseline state, exclusively for the caller's use until it is `release()`-d.
+        :rtype: FinsembleSession
+
+        :raises TimeoutError: If no session becomes available before the timeout elapses.
+        """
+
+        end_time = None if timeout_in_seconds is None else time.monotonic() + timeout_in_seconds
+        with self._condition:
+            while True:
+                if self._is_closed:
+                    raise Exception('This session pool has been closed.')
+                if self._idle_sessions:
+                    pooled_session = self._idle_sessions.popleft()
+                    break
+                if self._session_count < self.max_size:
+                    self._session_count += 1
+                    pooled_session = None
+                    break
+                remaining_time = None if end_time is None else end_time - time.monotonic()
+                if remaining_time is not None and remaining_time <= 0:
+                    raise TimeoutError()
+                self._condition.wait(remaining_time)
+
+        if pooled_session is None:
+            # Launch outside of the lock, so that other tests can keep acquiring & releasing in the meantime.
+            try:
+                pooled_session = self._launch()
+            except Exception:
+                with self._condition:
+                    self._session_count -= 1
+                    self._condition.notify()
+                raise
+
+        pooled_session.use_count += 1
+        with self._condition:
+            self._sessions_in_use[id(pooled_session.session)] = pooled_session
+        return pooled_session.session
+
+    def release(self, session: FinsembleSession, healthy: bool = True) -> None:
+        """
+        Return a session to the pool. It is reset to its baseline state, or recycled if it is no longer healthy.
+
+        :param session: A session previously returned by `acquire()`.
+        :type session: FinsembleSession
+
+        :param healthy: Pass False to force the session to be recycled, e.g. if the test using it left it in a state
+                        that a workspace reset can't recover from.
+        :type healthy: bool
+        """
+
+        with self._condition:
+            pooled_session = self._sessions_in_use.pop(id(session))
+
+        if healthy and not self._is_closed and pooled_session.use_count < self.max_uses_per_session \
+                and self._reset(pooled_session):
+            with self._condition:
+                self._idle_sessions.append(pooled_session)
+                self._condition.notify()
+            return
+
+        self._recycle(pooled_session)
+
+    @contextmanager
+    def session(self, timeout_in_seconds: Optional[float] = None) -> Iterator[FinsembleSession]:
+        """
+        Acquire a session for the duration of a `with` block, and release it afterwards. If the block raises, the
+        session is still reset & health-checked before being reused.
+
+        :param timeout_in_seconds: The maximum time, in seconds, to wait for a session to become available.
+        :type timeout_in_seconds: Optional[float]
+        """
+
+        session = self.acquire(timeout_in_seconds)
+        try:
+            yield session
+        finally:
+            self.release(session)
+
+    def close(self) -> None:
+        """
+        Quit every idle session. Sessions still in use are quit as they are released.
+        """
+
+        with self._condition:
+            self._is_closed = True
+            idle_sessions = list(self._idle_sessions)
+            self._idle_sessions.clear()
+            self._condition.notify_all()
+        for pooled_session in idle_sessions:
+            self._recycle(pooled_session)
+
+    def __enter__(self) -> FinsembleSessionPool:
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def _launch(self) -> _PooledSession:
+        """
+        Launch a new session, and create the baseline workspace it will be reset back to between tests.
+        """
+
+        session = self.launcher()
+        try:
+            pooled_session = _PooledSession(session)
+            self._switch_to_toolbar(pooled_session)
+            pooled_session.baseline_window_names = session.driver.execute_script(
+                _CREATE_BASELINE_WORKSPACE_SCRIPT, self.baseline_workspace_name) or []
+            pooled_session.baseline_window_count = len(session.driver.window_handles)
+        except Exception:
+            session.quit()
+            raise
+
+        with self._condition:
+            self.launch_count += 1
+        return pooled_session
+
+    def _reset(self, pooled_session: _PooledSession) -> bool:
+        """
+        Reset the given session back to its baseline workspace.
+
+        :return: True if the session was reset and is healthy; False if it should be recycled.
+        :rtype: bool
+        """
+
+        driver = pooled_session.session.driver
+        try:
+            self._switch_to_toolbar(pooled_session)
+            driver.execute_script(_RESET_TO_BASELINE_WORKSPACE_SCRIPT, self.baseline_workspace_name,
+                                  pooled_session.baseline_window_names)
+            window_count = len(driver.window_handles)
+        except Exception:
+            return False
+
+        return window_count <= pooled_session.baseline_window_count + self.max_window_growth
+
+    def _switch_to_toolbar(self, pooled_session: _PooledSession) -> None:
+        toolbar_handle = pooled_session.discoverer.get_selenium_handle_of_page_containing_url(self.toolbar_url)
+        pooled_session.discoverer.focus_manager.switch_to(toolbar_handle)
+
+    def _recycle(self, pooled_session: _PooledSession) -> None:
+        try:
+            pooled_session.discoverer.close()
+            pooled_session.session.quit()
+        except Exception:
+            pass
+        with self._condition:
+            self._session_count -= 1
+            self.recycle_count += 1
+            self._condition.notify()
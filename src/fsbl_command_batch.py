@@ -0,0 +1,270 @@
+from __future__ import annotations
+import json
+from contextlib import contextmanager
+from src.cdp_fsbl_client import CdpFsblClient
+from typing import TYPE_CHECKING, Any, Iterator, List, Optional, Union
+if TYPE_CHECKING:
+    from selenium.webdriver.remote.webdriver import WebDriver
+
+
+# Runs a batch of Finsemble API calls in-page. The batch is a list of steps, which run one after another; every call
+# within a step runs concurrently (via `Promise.all`.) Each call is reported back with its result or error, and its
+# in-page start time & duration. Once a call fails, every later step is skipped if `stopOnError` is set.
+# Each call's result is round-tripped through JSON on its own, so that an API response that isn't plain data (e.g. a
+# circular one) only fails the call that returned it, rather than the whole batch.
+_RUN_BATCH_FUNCTION = """
+async ({ steps, stopOnError, errResponsesAreErrors }) => {
+    const toPlainData = value => {
+        try {
+            const json = JSON.stringify(value);
+            return json === undefined ? null : JSON.parse(json);
+        } catch (e) {
+            throw new Error(`The result could not be serialized: ${e.message}`);
+        }
+    };
+    const batchStart = performance.now();
+    const results = [];
+    let failed = false;
+    for (const step of steps) {
+        if (failed && stopOnError) {
+            step.forEach(command => results.push({ index: command.index, status: 'skipped' }));
+            continue;
+        }
+        const stepResults = await Promise.all(step.map(async command => {
+            const start = performance.now();
+            try {
+                const path = command.path.split('.');
+                const methodName = path.pop();
+                const owner = path.reduce((object, key) => object[key], FSBL);
+                const value = await owner[methodName](...command.args);
+                if (errResponsesAreErrors && value && typeof value === 'object' && value.err) {
+                    throw value.err;
+                }
+                return { index: command.index, status: 'succeeded', value: toPlainData(value),
+                         start: start - batchStart, duration: performance.now() - start };
+            } catch (e) {
+                return { index: command.index, status: 'failed', error: String((e && e.stack) || e),
+                         start: start - batchStart, duration: performance.now() - start };
+            }
+        }));
+        failed = failed || stepResults.some(result => result.status === 'failed');
+        results.push(...stepResults);
+    }
+    return results.sort((a, b) => a.index - b.index);
+}
+"""
+
+
+class FsblCommandResult:
+    """
+    The outcome of a single Finsemble API call within a batch.
+
+    `status` is one of "succeeded", "failed", or "skipped" (if an earlier step of the batch failed and the batch was
+    set to stop on errors.) Timings are measured in-page, in milliseconds, relative to the start of the batch.
+    """
+
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+    SKIPPED = 'skipped'
+
+    def __init__(self, label: str, api_path: str, status: str, value: Any = None, error: Optional[str] = None,
+                 start_in_ms: Optional[float] = None, duration_in_ms: Optional[float] = None) -> None:
+        self.label: str = label
+        self.api_path: str = api_path
+        self.status: str = status
+        self.value: Any = value
+        self.error: Optional[str] = error
+        self.start_in_ms: Optional[float] = start_in_ms
+        self.duration_in_ms: Optional[float] = duration_in_ms
+
+    @property
+    def succeeded(self) -> bool:
+        return self.status == FsblCommandResult.SUCCEEDED
+
+    def __repr__(self) -> str:
+        return f'FsblCommandResult({self.label!r}, {self.status}, {self.duration_in_ms}ms)'
+
+
+class FsblBatchError(Exception):
+    """
+    Raised by `FsblBatchResults.raise_for_errors()` if any call within a batch failed.
+    """
+
+
+class FsblBatchResults(list):
+    """
+    The results of every call within a batch, in the order they were added to the batch.
+    """
+
+    def __getitem__(self, key: Union[int, slice, str]) -> Any:
+        # Results can also be looked up by label.
+        if isinstance(key, str):
+            result = next((result for result in self if result.label == key), None)
+            if result is None:
+                raise KeyError(key)
+            return result
+        return super().__getitem__(key)
+
+    @property
+    def succeeded(self) -> bool:
+        return all(result.succeeded for result in self)
+
+    def raise_for_errors(self) -> FsblBatchResults:
+        """
+        :return: These results, unchanged, if every call succeeded.
+        :rtype: FsblBatchResults
+
+        :raises FsblBatchError: If any call failed or was skipped.
+        """
+
+        failures = [result for result in self if not result.succeeded]
+        if failures:
+            raise FsblBatchError('\n'.join(f'{result.label} ({result.api_path}): {result.status}'
+                                           + (f'\n{result.error}' if result.error else '') for result in failures))
+        return self
+
+
+class FsblCommandBatch:
+    """
+    Every `driver.execute_script("await FSBL.Clients....")` call pays for a full round trip through ChromeDriver.
+    Setting up a test often takes dozens of them (spawning apps, creating workspaces, linking channels, ...), one after
+    another.
+
+    This class queues Finsemble API calls up instead, and ships them all to the page as a single script. Calls run one
+    after another by default, or concurrently (via `Promise.all`) when added within a `parallel()` block. The Python
+    side never has to hand-write JavaScript: each call is simply the path of an API method (relative to `FSBL`) and its
+    JSON-serializable arguments.
+
+    E.g.:
+        batch = FsblCommandBatch()
+        batch.create_workspace('Automated Workspace')
+        with batch.parallel():
+            for app in ['ChartIQ Example App', 'Welcome Component']:
+                batch.spawn(app, {'addToWorkspace': True})
+        results = batch.execute(driver).raise_for_errors()
+    """
+
+    def __init__(self, stop_on_error: bool = True, err_responses_are_errors: bool = True) -> None:
+        """
+        :param stop_on_error: Whether or not to skip every later step of the batch once any call has failed.
+        :type stop_on_error: bool
+
+        :param err_responses_are_errors: Many Finsemble API methods resolve to an `{err, data}` response object rather
+                                         than rejecting. If set, a response with a truth-y `err` counts as a failure.
+        :type err_responses_are_errors: bool
+        """
+
+        self.stop_on_error: bool = stop_on_error
+        self.err_responses_are_errors: bool = err_responses_are_errors
+        self._steps: List[List[dict]] = []
+        self._commands: List[dict] = []
+        self._parallel_step: Optional[List[dict]] = None
+
+    def __len__(self) -> int:
+        return len(self._commands)
+
+    def call(self, api_path: str, *args, label: Optional[str] = None) -> FsblCommandBatch:
+        """
+        Queue a call to a Finsemble API method.
+
+        :param api_path: The path of the method to call, relative to `FSBL`. E.g.: "Clients.LauncherClient.spawn"
+        :type api_path: str
+
+        :param args: The arguments to call the method with. Each must be JSON-serializable.
+
+        :param label: A label to look the call's result up by. Defaults to the method's path, suffixed with the call's
+                      position in the batch.
+        :type label: Optional[str]
+
+        :return: This batch, so that calls can be chained.
+        :rtype: FsblCommandBatch
+        """
+
+        command = {
+            'index': len(self._commands),
+            'path': api_path,
+            'args': list(args),
+            'label': label or f'{api_path}#{len(self._commands)}'
+        }
+        self._commands.append(command)
+        if self._parallel_step is not None:
+            self._parallel_step.append(command)
+        else:
+            self._steps.append([command])
+        return self
+
+    @contextmanager
+    def parallel(self) -> Iterator[FsblCommandBatch]:
+        """
+        Within this `with` block, every queued call runs concurrently with the others, as a single step of the batch.
+        """
+
+        if self._parallel_step is not None:
+            raise Exception('parallel() blocks cannot be nested.')
+        self._parallel_step = []
+        try:
+            yield self
+        finally:
+            if self._parallel_step:
+                self._steps.append(self._parallel_step)
+            self._parallel_step = None
+
+    def spawn(self, component: str, params: Optional[dict] = None, label: Optional[str] = None) -> FsblCommandBatch:
+        return self.call('Clients.LauncherClient.spawn', component, params or {}, label=label)
+
+    def create_workspace(self, name: str, params: Optional[dict] = None,
+                         label: Optional[str] = None) -> FsblCommandBatch:
+        return self.call('Clients.WorkspaceClient.createWorkspace', name, params or {}, label=label)
+
+    def switch_to_workspace(self, name: str, label: Optional[str] = None) -> FsblCommandBatch:
+        return self.call('Clients.WorkspaceClient.switchTo', {'name': name}, label=label)
+
+    def link_to_channel(self, channel: str, window_identifier: Optional[dict] = None,
+                        label: Optional[str] = None) -> FsblCommandBatch:
+        return self.call('Clients.LinkerClient.linkToChannel', channel, window_identifier, label=label)
+
+    def transmit_on_router_channel(self, channel: str, data: Any, label: Optional[str] = None) -> FsblCommandBatch:
+        return self.call('Clients.RouterClient.transmit', channel, data, label=label)
+
+    def build_spec(self) -> dict:
+        """
+        :return: The JSON-serializable description of the batch that is passed to the in-page script.
+        :rtype: dict
+        """
+
+        return {
+            'steps': [[{'index': command['index'], 'path': command['path'], 'args': command['args']}
+                       for command in step] for step in self._steps],
+            'stopOnError': self.stop_on_error,
+            'errResponsesAreErrors': self.err_responses_are_errors
+        }
+
+    def execute(self, executor: Union[WebDriver, CdpFsblClient]) -> FsblBatchResults:
+        """
+        Run every queued call, in a single round trip.
+
+        :param executor: Either a Selenium `WebDriver` that is currently focused on a component with access to the
+                         Finsemble API (e.g. the Toolbar), or a `CdpFsblClient` (which doesn't require any particular
+                         focus.)
+        :type executor: Union[WebDriver, CdpFsblClient]
+
+        :return: The result of every call, in the order they were queued.
+        :rtype: FsblBatchResults
+        """
+
+        if not self._commands:
+            return FsblBatchResults()
+
+        if isinstance(executor, CdpFsblClient):
+            raw_results = executor.evaluate(f'({_RUN_BATCH_FUNCTION})({json.dumps(self.build_spec())})')
+        else:
+            raw_results = executor.execute_script(f'return await ({_RUN_BATCH_FUNCTION})(arguments[0]);',
+                                                  self.build_spec())
+
+        results = FsblBatchResults()
+        for raw_result in raw_results:
+            command = self._commands[raw_result['index']]
+            results.append(FsblCommandResult(command['label'], command['path'], raw_result['status'],
+                                             raw_result.get('value'), raw_result.get('error'),
+                                             raw_result.get('start'), raw_result.get('duration')))
+        return results
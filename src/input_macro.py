@@ -0,0 +1,554 @@
+from __future__ import annotations
+import json
+import time
+from concurrent.futures import TimeoutError as FutureTimeoutError, wait
+from selenium.webdriver.common.action_chains import ActionChains
+from selenium.webdriver.common.by import By
+from selenium.webdriver.common.keys import Keys
+from src.cdp_connection import CdpConnection, CdpError
+from src.command_metrics import get_command_metrics
+from src.finsemble_component_discoverer import FinsembleComponentDiscoverer
+from threading import Lock
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple, Union
+if TYPE_CHECKING:
+    from selenium.webdriver.remote.webdriver import WebDriver
+
+
+# The `key`, `code` and Windows virtual key code of each of Selenium's special keys, as `Input.dispatchKeyEvent`
+# expects them. Keys that type something also have the text they type.
+_SPECIAL_KEY_DEFINITIONS: Dict[str, Tuple[str, str, int, str]] = {
+    Keys.CANCEL: ('Cancel', 'Abort', 3, ''),
+    Keys.HELP: ('Help', 'Help', 6, ''),
+    Keys.BACKSPACE: ('Backspace', 'Backspace', 8, ''),
+    Keys.TAB: ('Tab', 'Tab', 9, ''),
+    Keys.CLEAR: ('Clear', 'Numpad5', 12, ''),
+    Keys.RETURN: ('Enter', 'Enter', 13, '\r'),
+    Keys.ENTER: ('Enter', 'NumpadEnter', 13, '\r'),
+    Keys.SHIFT: ('Shift', 'ShiftLeft', 16, ''),
+    Keys.CONTROL: ('Control', 'ControlLeft', 17, ''),
+    Keys.ALT: ('Alt', 'AltLeft', 18, ''),
+    Keys.PAUSE: ('Pause', 'Pause', 19, ''),
+    Keys.ESCAPE: ('Escape', 'Escape', 27, ''),
+    Keys.SPACE: (' ', 'Space', 32, ' '),
+    Keys.PAGE_UP: ('PageUp', 'PageUp', 33, ''),
+    Keys.PAGE_DOWN: ('PageDown', 'PageDown', 34, ''),
+    Keys.END: ('End', 'End', 35, ''),
+    Keys.HOME: ('Home', 'Home', 36, ''),
+    Keys.LEFT: ('ArrowLeft', 'ArrowLeft', 37, ''),
+    Keys.UP: ('ArrowUp', 'ArrowUp', 38, ''),
+    Keys.RIGHT: ('ArrowRight', 'ArrowRight', 39, ''),
+    Keys.DOWN: ('ArrowDown', 'ArrowDown', 40, ''),
+    Keys.INSERT: ('Insert', 'Insert', 45, ''),
+    Keys.DELETE: ('Delete', 'Delete', 46, ''),
+    Keys.SEMICOLON: (';', 'Semicolon', 186, ';'),
+    Keys.EQUALS: ('=', 'Equal', 187, '='),
+    **{getattr(Keys, f'NUMPAD{digit}'): (str(digit), f'Numpad{digit}', 96 + digit, str(digit)) for digit in range(10)},
+    Keys.MULTIPLY: ('*', 'NumpadMultiply', 106, '*'),
+    Keys.ADD: ('+', 'NumpadAdd', 107, '+'),
+    Keys.SEPARATOR: (',', 'NumpadComma', 108, ','),
+    Keys.SUBTRACT: ('-', 'NumpadSubtract', 109, '-'),
+    Keys.DECIMAL: ('.', 'NumpadDecimal', 110, '.'),
+    Keys.DIVIDE: ('/', 'NumpadDivide', 111, '/'),
+    **{getattr(Keys, f'F{number}'): (f'F{number}', f'F{number}', 111 + number, '') for number in range(1, 13)},
+    Keys.META: ('Meta', 'MetaLeft', 91, '')
+}
+
+# The `code` and Windows virtual key code of the punctuation keys on a US keyboard.
+_PUNCTUATION_KEY_DEFINITIONS: Dict[str, Tuple[str, int]] = {
+    ';': ('Semicolon', 186), '=': ('Equal', 187), ',': ('Comma', 188), '-': ('Minus', 189), '.': ('Period', 190),
+    '/': ('Slash', 191), '`': ('Backquote', 192), '[': ('BracketLeft', 219), '\\': ('Backslash', 220),
+    ']': ('BracketRight', 221), "'": ('Quote', 222)
+}
+
+# CDP's modifier bit flags.
+_MODIFIER_BITS: Dict[str, int] = {Keys.ALT: 1, Keys.CONTROL: 2, Keys.META: 4, Keys.SHIFT: 8}
+_SHIFT_BIT = 8
+
+# CDP's bit flags for the mouse buttons that are currently held down.
+_MOUSE_BUTTON_BITS: Dict[str, int] = {'left': 1, 'right': 2, 'middle': 4}
+
+# Resolves to the viewport coordinates of the center of the first element matching each of the given CSS selectors
+# (or `null`, for those that match nothing.)
+_ELEMENT_CENTERS_EXPRESSION_TEMPLATE = """
+%(selectors)s.map(selector => {
+    const element = document.querySelector(selector);
+    if (!element) {
+        return null;
+    }
+    element.scrollIntoViewIfNeeded ? element.scrollIntoViewIfNeeded() : element.scrollIntoView();
+    const rect = element.getBoundingClientRect();
+    return [rect.left + rect.width / 2, rect.top + rect.height / 2];
+})
+"""
+
+# Where a mouse event happens: either viewport coordinates, or the center of the element matching a CSS selector.
+MouseTarget = Union[Tuple[float, float], str]
+
+
+class InputMacro:
+    """
+    A declarative, reusable sequence of keyboard & mouse input, built up with chained calls and dispatched into a
+    component's window by an `InputMacroRunner`. E.g.:
+
+        zoom_out = InputMacro('zoom_out').send_keys(Keys.CONTROL, Keys.SUBTRACT).repeat(5)
+        share = InputMacro('share').click('cq-share-button')
+
+    Keys are given the same way as to Selenium's `WebElement.send_keys()`: as strings, or as Selenium's special `Keys`.
+    """
+
+    def __init__(self, name: str = 'macro') -> None:
+        """
+        :param name: The name to report this macro's timing under.
+        :type name: str
+        """
+
+        self.name: str = name
+        # Each step is a tuple of the kind of step, followed by its arguments.
+        self.steps: List[tuple] = []
+
+    def __len__(self) -> int:
+        return len(self.steps)
+
+    def __repr__(self) -> str:
+        return f'InputMacro({self.name!r}, {len(self.steps)} steps)'
+
+    def key_down(self, key: str) -> InputMacro:
+        self.steps.append(('key_down', key))
+        return self
+
+    def key_up(self, key: str) -> InputMacro:
+        self.steps.append(('key_up', key))
+        return self
+
+    def press(self, key: str) -> InputMacro:
+        """
+        Press and release a single key.
+        """
+
+        return self.key_down(key).key_up(key)
+
+    def send_keys(self, *values: str) -> InputMacro:
+        """
+        Type the given keys, with the same semantics as `WebElement.send_keys()`: modifier keys (e.g. `Keys.CONTROL`)
+        are held down until they're given again, or until `Keys.NULL`, and any still held are released at the end.
+        """
+
+        held_modifiers = []
+        for key in ''.join(values):
+            if key in _MODIFIER_BITS:
+                if key in held_modifiers:
+                    held_modifiers.remove(key)
+                    self.key_up(key)
+                else:
+                    held_modifiers.append(key)
+                    self.key_down(key)
+            elif key == Keys.NULL:
+                while held_modifiers:
+                    self.key_up(held_modifiers.pop())
+            else:
+                self.press(key)
+        while held_modifiers:
+            self.key_up(held_modifiers.pop())
+        return self
+
+    def move_to(self, target: MouseTarget) -> InputMacro:
+        """
+        :param target: The viewport coordinates to move the mouse to, as `(x, y)`, or a CSS selector of the element to
+                       move it to the center of.
+        :type target: MouseTarget
+        """
+
+        self.steps.append(('mouse_move', _validate_mouse_target(target)))
+        return self
+
+    def mouse_down(self, target: MouseTarget, button: str = 'left') -> InputMacro:
+        self.steps.append(('mouse_down', _validate_mouse_target(target), _validate_mouse_button(button)))
+        return self
+
+    def mouse_up(self, target: MouseTarget, button: str = 'left') -> InputMacro:
+        self.steps.append(('mouse_up', _validate_mouse_target(target), _validate_mouse_button(button)))
+        return self
+
+    def click(self, target: MouseTarget, button: str = 'left', click_count: int = 1) -> InputMacro:
+        """
+        :param target: The viewport coordinates to click at, as `(x, y)`, or a CSS selector of the element to click the
+                       center of.
+        :type target: MouseTarget
+
+        :param button: "left", "right" or "middle".
+        :type button: str
+
+        :param click_count: 2 for a double-click.
+        :type click_count: int
+        """
+
+        self.steps.append(('click', _validate_mouse_target(target), _validate_mouse_button(button), click_count))
+        return self
+
+    def repeat(self, count: int) -> InputMacro:
+        """
+        Repeat every step so far the given number of times in total.
+        """
+
+        self.steps = self.steps * count
+        return self
+
+    def then(self, other: InputMacro) -> InputMacro:
+        """
+        Append the steps of another macro to this one.
+        """
+
+        self.steps.extend(other.steps)
+        return self
+
+    def get_selectors(self) -> List[str]:
+        """
+        :return: The CSS selectors of every element that this macro targets with the mouse, without duplicates.
+        :rtype: List[str]
+        """
+
+        selectors = []
+        for step in self.steps:
+            if step[0] in ('mouse_move', 'mouse_down', 'mouse_up', 'click') and isinstance(step[1], str) \
+                    and step[1] not in selectors:
+                selectors.append(step[1])
+        return selectors
+
+    def compile(self, element_centers: Optional[Dict[str, Tuple[float, float]]] = None) -> List[Tuple[str, dict]]:
+        """
+        Compile this macro into the series of CDP `Input` commands that dispatch it.
+
+        :param element_centers: The viewport coordinates of the center of the element matching each of the CSS
+                                selectors in `get_selectors()`.
+        :type element_centers: Optional[Dict[str, Tuple[float, float]]]
+
+        :return: Each CDP command to send, as a tuple of its method name & parameters.
+        :rtype: List[Tuple[str, dict]]
+        """
+
+        element_centers = element_centers or {}
+        commands = []
+        modifiers = 0
+        pressed_buttons = 0
+        position = (0, 0)
+
+        def _mouse_event(event_type: str, button: str = 'none', click_count: int = 0) -> None:
+            commands.append(('Input.dispatchMouseEvent', {
+                'type': event_type, 'x': position[0], 'y': position[1], 'modifiers': modifiers, 'button': button,
+                'buttons': pressed_buttons, 'clickCount': click_count
+            }))
+
+        for step in self.steps:
+            kind = step[0]
+            if kind in ('key_down', 'key_up'):
+                key, code, key_code, text = _get_key_definition(step[1])
+                params = {'modifiers': modifiers, 'key': key, 'code': code, 'windowsVirtualKeyCode': key_code,
+                          'nativeVirtualKeyCode': key_code}
+                if code.startswith('Numpad'):
+                    params['location'] = 3
+                if kind == 'key_down':
+                    modifiers |= _MODIFIER_BITS.get(step[1], 0)
+                    params['modifiers'] = modifiers
+                    # Holding a modifier other than Shift turns a keystroke into a shortcut, which types nothing.
+                    if text and not modifiers & ~_SHIFT_BIT:
+                        params.update(type='keyDown', text=text, unmodifiedText=text)
+                    else:
+                        params['type'] = 'rawKeyDown'
+                else:
+                    modifiers &= ~_MODIFIER_BITS.get(step[1], 0)
+                    params.update(type='keyUp', modifiers=modifiers)
+                commands.append(('Input.dispatchKeyEvent', params))
+                continue
+
+            target = step[1]
+            if isinstance(target, str):
+                if target not in element_centers:
+                    raise Exception(f'No element matching "{target}" can be found.')
+                target = element_centers[target]
+            if tuple(target) != position or kind == 'mouse_move':
+                position = tuple(target)
+                _mouse_event('mouseMoved')
+
+            if kind == 'mouse_down':
+                pressed_buttons |= _MOUSE_BUTTON_BITS[step[2]]
+                _mouse_event('mousePressed', step[2], 1)
+            elif kind == 'mouse_up':
+                pressed_buttons &= ~_MOUSE_BUTTON_BITS[step[2]]
+                _mouse_event('mouseReleased', step[2], 1)
+            elif kind == 'click':
+                button, click_count = step[2], step[3]
+                for count in range(1, click_count + 1):
+                    pressed_buttons |= _MOUSE_BUTTON_BITS[button]
+                    _mouse_event('mousePressed', button, count)
+                    pressed_buttons &= ~_MOUSE_BUTTON_BITS[button]
+                    _mouse_event('mouseReleased', button, count)
+
+        return commands
+
+
+class InputMacroTiming:
+    """
+    How long a single run of an `InputMacro` took, from locating its window to the last of its input having been
+    dispatched.
+    """
+
+    def __init__(self, name: str, handle: str, transport: str, command_count: int,
+                 duration_in_seconds: float) -> None:
+        self.name: str = name
+        self.handle: str = handle
+        # "cdp", or "selenium" if Remote Debugging wasn't available.
+        self.transport: str = transport
+        self.command_count: int = command_count
+        self.duration_in_seconds: float = duration_in_seconds
+
+    def __repr__(self) -> str:
+        return (f'InputMacroTiming({self.name!r}, {self.transport}, {self.command_count} commands, '
+                f'{self.duration_in_seconds * 1000:.1f}ms)')
+
+    def to_dict(self) -> dict:
+        return {
+            'name': self.name,
+            'handle': self.handle,
+            'transport': self.transport,
+            'command_count': self.command_count,
+            'duration_in_seconds': self.duration_in_seconds
+        }
+
+
+class InputMacroRunner:
+    """
+    Typing a hotkey with `WebElement.send_keys()` costs a full WebDriver command (and with it, a full round trip to
+    ChromeDriver & back), so a test that types hundreds of hotkeys and characters spends most of its time waiting on
+    round trips - and has to switch Selenium's focus into each window it types into first.
+
+    This runner dispatches an entire `InputMacro` in one go instead. Over a DevTools connection to the target window
+    (kept open between runs), the macro is compiled into a series of `Input.dispatchKeyEvent` /
+    `Input.dispatchMouseEvent` commands, which are all sent at once and then awaited together, so the whole macro costs
+    little more than a single round trip. Input is dispatched straight into the window's renderer, so Selenium's
+    focused window is left untouched. (Focus emulation is turned on in the window, so that it handles the input as if
+    it were focused.)
+
+    E.g.:
+        macros = InputMacroRunner(driver)
+        macros.run(InputMacro('zoom_out').send_keys(Keys.CONTROL, Keys.SUBTRACT).repeat(5), 'technical-analysis-chart')
+
+    The duration of every run is kept in `timings` (and recorded to the driver's `CommandMetrics`, if it has any, as
+    "input_macro: <name>".)
+
+    If Remote Debugging is not available, macros are instead performed with Selenium's `ActionChains` from within the
+    target window (which is focused for the duration, and then unfocused again.)
+    """
+
+    def __init__(self, driver: WebDriver, discoverer: Optional[FinsembleComponentDiscoverer] = None,
+                 timeout_in_seconds: float = 10) -> None:
+        """
+        :param driver: A Selenium `WebDriver` object that is hooked into Finsemble.
+        :type driver: WebDriver
+
+        :param discoverer: The discoverer to locate windows with. If not provided, one is created (and closed again
+                           along with the runner.)
+        :type discoverer: Optional[FinsembleComponentDiscoverer]
+
+        :param timeout_in_seconds: The maximum time, in seconds, to wait for a macro to be dispatched.
+        :type timeout_in_seconds: float
+        """
+
+        self.timeout_in_seconds: float = timeout_in_seconds
+        self.timings: List[InputMacroTiming] = []
+
+        self._driver: WebDriver = driver
+        self._owns_discoverer: bool = discoverer is None
+        self._discoverer: FinsembleComponentDiscoverer = discoverer or FinsembleComponentDiscoverer(driver)
+        self._connections: Dict[str, CdpConnection] = {}
+        self._lock: Lock = Lock()
+
+    def run(self, macro: InputMacro, target: str) -> InputMacroTiming:
+        """
+        Dispatch the given macro into a window.
+
+        :param macro: The macro to dispatch.
+        :type macro: InputMacro
+
+        :param target: The Selenium window handle of the window to dispatch the macro into, or the URL of its component
+                       (matched on a "partial" basis.)
+        :type target: str
+
+        :return: How long the macro took.
+        :rtype: InputMacroTiming
+
+        :raises Exception: If the window can't be found, or an element targeted by the macro can't be found within it.
+        """
+
+        start_time = time.monotonic()
+        handle = target if target.startswith('CDwindow-') \
+            else self._discoverer.get_selenium_handle_of_page_containing_url(target)
+
+        succeeded = False
+        try:
+            if self._discoverer.remote_debugger.is_available:
+                transport = 'cdp'
+                command_count = self._run_over_cdp(macro, handle)
+            else:
+                transport = 'selenium'
+                command_count = self._run_with_selenium(macro, handle)
+            succeeded = True
+        finally:
+            duration = time.monotonic() - start_time
+            command_metrics = get_command_metrics(self._driver)
+            if command_metrics:
+                command_metrics.record(f'input_macro: {macro.name}', duration, succeeded)
+
+        timing = InputMacroTiming(macro.name, handle, transport, command_count, duration)
+        with self._lock:
+            self.timings.append(timing)
+        return timing
+
+    def get_summary(self) -> Dict[str, dict]:
+        """
+        :return: The number of runs, and the total, mean & slowest duration (in seconds) of each macro, by name.
+        :rtype: Dict[str, dict]
+        """
+
+        summary = {}
+        with self._lock:
+            timings = list(self.timings)
+        for timing in timings:
+            entry = summary.setdefault(timing.name, {'count': 0, 'total_in_seconds': 0.0, 'max_in_seconds': 0.0})
+            entry['count'] += 1
+            entry['total_in_seconds'] += timing.duration_in_seconds
+            entry['max_in_seconds'] = max(entry['max_in_seconds'], timing.duration_in_seconds)
+        for entry in summary.values():
+            entry['mean_in_seconds'] = entry['total_in_seconds'] / entry['count']
+        return summary
+
+    def close(self) -> None:
+        with self._lock:
+            connections, self._connections = list(self._connections.values()), {}
+        for connection in connections:
+            connection.close()
+        if self._owns_discoverer:
+            self._discoverer.close()
+
+    def __enter__(self) -> InputMacroRunner:
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def _get_connection(self, handle: str) -> CdpConnection:
+        with self._lock:
+            connection = self._connections.get(handle)
+        if connection and connection.is_connected:
+            return connection
+
+        connection = self._discoverer.remote_debugger.connect_to_page(handle, self.timeout_in_seconds)
+        if not connection:
+            raise Exception(f'Unable to connect to the window "{handle}".')
+        # Not every version of Chromium supports focus emulation; input is still dispatched without it.
+        connection.send('Emulation.setFocusEmulationEnabled', {'enabled': True})
+        with self._lock:
+            self._connections[handle] = connection
+        return connection
+
+    def _run_over_cdp(self, macro: InputMacro, handle: str) -> int:
+        connection = self._get_connection(handle)
+
+        element_centers = {}
+        selectors = macro.get_selectors()
+        if selectors:
+            expression = _ELEMENT_CENTERS_EXPRESSION_TEMPLATE % {'selectors': json.dumps(selectors)}
+            centers = connection.evaluate(expression).result(timeout=self.timeout_in_seconds)
+            element_centers = {selector: tuple(center) for selector, center in zip(selectors, centers) if center}
+
+        # Send every command before waiting on any; the window handles them in order.
+        commands = macro.compile(element_centers)
+        futures = [connection.send(method, params) for method, params in commands]
+        _done, not_done = wait(futures, timeout=self.timeout_in_seconds)
+        if not_done:
+            raise FutureTimeoutError(f'The macro "{macro.name}" was not dispatched within {self.timeout_in_seconds} '
+                                     f'seconds.')
+        for future in futures:
+            error = future.exception()
+            if isinstance(error, CdpError):
+                raise error
+        return len(commands) + (1 if selectors else 0)
+
+    def _run_with_selenium(self, macro: InputMacro, handle: str) -> int:
+        with self._discoverer.focus_manager.in_window(handle):
+            actions = ActionChains(self._driver)
+            command_count = 0
+            for step in macro.steps:
+                kind = step[0]
+                if kind == 'key_down':
+                    # Outside of W3C mode, only modifier keys can be held down; any other key is typed when pressed.
+                    if step[1] in _MODIFIER_BITS:
+                        actions.key_down(step[1])
+                    else:
+                        actions.send_keys(step[1])
+                    command_count += 1
+                elif kind == 'key_up':
+                    if step[1] in _MODIFIER_BITS:
+                        actions.key_up(step[1])
+                        command_count += 1
+                else:
+                    self._add_mouse_step_to_actions(actions, step)
+                    command_count += 2
+            actions.perform()
+            return command_count
+
+    def _add_mouse_step_to_actions(self, actions: ActionChains, step: tuple) -> None:
+        kind, target = step[0], step[1]
+        if isinstance(target, str):
+            actions.move_to_element(self._driver.find_element(By.CSS_SELECTOR, target))
+        else:
+            actions.move_to_element_with_offset(self._driver.find_element(By.TAG_NAME, 'body'), *target)
+
+        if kind in ('mouse_down', 'mouse_up'):
+            if step[2] != 'left':
+                raise Exception('Only the left mouse button can be held down without Remote Debugging.')
+            if kind == 'mouse_down':
+                actions.click_and_hold()
+            else:
+                actions.release()
+        elif kind == 'click':
+            button, click_count = step[2], step[3]
+            if button == 'right':
+                actions.context_click()
+            elif button == 'left' and click_count == 2:
+                actions.double_click()
+            elif button == 'left' and click_count == 1:
+                actions.click()
+            else:
+                raise Exception(f'A {button} click (x{click_count}) cannot be performed without Remote Debugging.')
+
+
+def _get_key_definition(key: str) -> Tuple[str, str, int, str]:
+    """
+    :return: The `key`, `code`, Windows virtual key code and text of the given key, as `Input.dispatchKeyEvent`
+             expects them.
+    :rtype: Tuple[str, str, int, str]
+    """
+
+    if key in _SPECIAL_KEY_DEFINITIONS:
+        return _SPECIAL_KEY_DEFINITIONS[key]
+    if key.isascii() and key.isalpha():
+        return key, f'Key{key.upper()}', ord(key.upper()), key
+    if key.isascii() and key.isdigit():
+        return key, f'Digit{key}', ord(key), key
+    if key == ' ':
+        return _SPECIAL_KEY_DEFINITIONS[Keys.SPACE]
+    code, key_code = _PUNCTUATION_KEY_DEFINITIONS.get(key, ('', 0))
+    return key, code, key_code, key
+
+
+def _validate_mouse_target(target: MouseTarget) -> MouseTarget:
+    if isinstance(target, str):
+        return target
+    x, y = target
+    return x, y
+
+
+def _validate_mouse_button(button: str) -> str:
+    if button not in _MOUSE_BUTTON_BITS:
+        raise ValueError(f'Unknown mouse button "{button}"; expected one of {list(_MOUSE_BUTTON_BITS)}.')
+    return button
@@ -0,0 +1,484 @@
+from __future__ import annotations
+import json
+import time
+import traceback
+from os import path
+from src.wait import BackoffPolicy
+from threading import Condition, Lock, Thread
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterable, List, Mapping, Optional, Union
+if TYPE_CHECKING:
+    from src.selenium_finsemble_launcher import FinsembleSession
+
+
+# How long a worker waits before relaunching after a failed launch: 1s at first, doubling up to 10s.
+DEFAULT_LAUNCH_BACKOFF_POLICY = BackoffPolicy(initial_delay_in_seconds=1.0, first_backoff_in_seconds=2.0,
+                                              max_delay_in_seconds=10.0)
+
+# A test scenario is any callable that accepts the `FinsembleSession` to run against. It passes if it returns, and
+# fails if it raises.
+Scenario = Callable[['FinsembleSession'], Any]
+
+
+class ScenarioResult:
+    """
+    The outcome of running a single scenario.
+
+    `status` is one of:
+    - "passed": The scenario returned without raising.
+    - "failed": The scenario raised, and the session it ran against was still healthy afterwards.
+    - "crashed": The session died while running the scenario (on every attempt.)
+    - "not_run": Every worker died before the scenario could be run.
+    - "error": The worker running the scenario stopped unexpectedly (e.g. its health check raised.)
+    """
+
+    PASSED = 'passed'
+    FAILED = 'failed'
+    CRASHED = 'crashed'
+    NOT_RUN = 'not_run'
+    ERROR = 'error'
+
+    def __init__(self, name: str, status: str, duration_in_seconds: float = 0.0, error: Optional[str] = None,
+                 worker_index: Optional[int] = None, attempts: int = 0) -> None:
+        self.name: str = name
+        self.status: str = status
+        self.duration_in_seconds: float = duration_in_seconds
+        self.error: Optional[str] = error
+        self.worker_index: Optional[int] = worker_index
+        self.attempts: int = attempts
+
+    def to_dict(self) -> dict:
+        return {
+            'name': self.name,
+            'status': self.status,
+            'duration_in_seconds': self.duration_in_seconds,
+            'error': self.error,
+            'worker_index': self.worker_index,
+            'attempts': self.attempts
+        }
+
+
+class ParallelRunReport:
+    """
+    The merged results of every scenario run by a `ParallelTestRunner`, across all of its workers.
+    """
+
+    def __init__(self, results: List[ScenarioResult], wall_time_in_seconds: float, worker_count: int,
+                 relaunch_count: int) -> None:
+        self.results: List[ScenarioResult] = results
+        self.wall_time_in_seconds: float = wall_time_in_seconds
+        self.worker_count: int = worker_count
+        self.relaunch_count: int = relaunch_count
+
+    @property
+    def succeeded(self) -> bool:
+        """
+        :return: True if every scenario passed; False otherwise.
+        :rtype: bool
+        """
+
+        return all(result.status == ScenarioResult.PASSED for result in self.results)
+
+    def count(self, status: str) -> int:
+        return sum(1 for result in self.results if result.status == status)
+
+    def to_dict(self) -> dict:
+        return {
+            'wall_time_in_seconds': self.wall_time_in_seconds,
+            'worker_count': self.worker_count,
+            'relaunch_count': self.relaunch_count,
+            'results': [result.to_dict() for result in self.results]
+        }
+
+    def to_json(self, path_to_report: str) -> None:
+        """
+        Write this report out as a JSON file.
+
+        :param path_to_report: The path of the JSON file to write.
+        :type path_to_report: str
+        """
+
+        with open(path_to_report, 'w') as report_file:
+            json.dump(self.to_dict(), report_file, indent=2)
+
+    def summary(self) -> str:
+        """
+        :return: A human-readable, one-line-per-scenario summary of the run, with any failures listed last.
+        :rtype: str
+        """
+
+        lines = [f'{len(self.results)} scenarios across {self.worker_count} workers in '
+                 f'{self.wall_time_in_seconds:.1f}s ({self.relaunch_count} relaunches): '
+                 f'{self.count(ScenarioResult.PASSED)} passed, {self.count(ScenarioResult.FAILED)} failed, '
+                 f'{self.count(ScenarioResult.CRASHED)} crashed, {self.count(ScenarioResult.NOT_RUN)} not run, '
+                 f'{self.count(ScenarioResult.ERROR)} errors']
+        for result in sorted(self.results, key=lambda r: r.status != ScenarioResult.PASSED):
+            lines.append(f'  [{result.status:>7}] {result.name} ({result.duration_in_seconds:.1f}s, '
+                         f'worker {result.worker_index})')
+        return '\n'.join(lines)
+
+
+class DurationHistory:
+    """
+    Remembers how long each scenario has historically taken to run, so that scenarios can be spread evenly across
+    workers. Durations are smoothed with an exponentially-weighted moving average, and optionally persisted to a JSON
+    file between runs.
+    """
+
+    def __init__(self, path_to_history: Optional[str] = None, smoothing: float = 0.5) -> None:
+        """
+        :param path_to_history: The JSON file to load durations from (if it exists) and `save()` them to.
+        :type path_to_history: Optional[str]
+
+        :param smoothing: The weight given to the newest duration when updating the moving average. `1` always uses
+                          the most recent duration as-is.
+        :type smoothing: float
+        """
+
+        self.path_to_history: Optional[str] = path_to_history
+        self.smoothing: float = smoothing
+        self.durations: Dict[str, float] = {}
+        if path_to_history and path.exists(path_to_history):
+            with open(path_to_history) as history_file:
+                self.durations = {name: float(duration) for name, duration in json.load(history_file).items()}
+
+    def estimate(self, name: str) -> float:
+        """
+        :return: The expected duration of the given scenario, in seconds. Scenarios that have never been run are
+                 assumed to take as long as the average known scenario. (Or 1 second, if nothing is known.)
+        :rtype: float
+        """
+
+        if name in self.durations:
+            return self.durations[name]
+        if self.durations:
+            return sum(self.durations.values()) / len(self.durations)
+        return 1.0
+
+    def update(self, name: str, duration_in_seconds: float) -> None:
+        previous_duration = self.durations.get(name)
+        if previous_duration is None:
+            self.durations[name] = duration_in_seconds
+        else:
+            self.durations[name] = self.smoothing * duration_in_seconds + (1 - self.smoothing) * previous_duration
+
+    def save(self) -> None:
+        if self.path_to_history:
+            with open(self.path_to_history, 'w') as history_file:
+                json.dump(self.durations, history_file, indent=2, sort_keys=True)
+
+
+def plan_shards(names: Iterable[str], history: DurationHistory, worker_count: int) -> List[List[str]]:
+    """
+    Split the given scenarios into one shard per worker, such that every shard is expected to take about as long as
+    every other. Scenarios are assigned longest-first, each to whichever shard is currently expected to finish
+    earliest (the "longest processing time" heuristic.) Within each shard, scenarios remain longest-first.
+
+    :param names: The names of the scenarios to shard.
+    :type names: Iterable[str]
+
+    :param history: The historical durations to estimate each scenario's duration from.
+    :type history: DurationHistory
+
+    :param worker_count: The number of shards to create.
+    :type worker_count: int
+
+    :return: One list of scenario names per worker.
+    :rtype: List[List[str]]
+    """
+
+    shards: List[List[str]] = [[] for _ in range(worker_count)]
+    shard_durations = [0.0] * worker_count
+    for name in sorted(names, key=history.estimate, reverse=True):
+        shortest_shard_index = min(range(worker_count), key=lambda index: shard_durations[index])
+        shards[shortest_shard_index].append(name)
+        shard_durations[shortest_shard_index] += history.estimate(name)
+    return shards
+
+
+def _name_scenarios(scenarios: Iterable[Scenario]) -> Dict[str, Scenario]:
+    """
+    :return: The given scenarios, keyed by their `__qualname__`. Scenarios that share a name (e.g. lambdas) are told
+             apart by a "#2", "#3", etc. suffix, in the order given.
+    :rtype: Dict[str, Scenario]
+    """
+
+    named_scenarios: Dict[str, Scenario] = {}
+    for scenario in scenarios:
+        base_name = getattr(scenario, '__qualname__', repr(scenario))
+        name, suffix = base_name, 1
+        while name in named_scenarios:
+            suffix += 1
+            name = f'{base_name}#{suffix}'
+        named_scenarios[name] = scenario
+    return named_scenarios
+
+
+def _is_session_healthy(session: FinsembleSession) -> bool:
+    """
+    The default health check: a session is healthy as long as ChromeDriver can still list its windows.
+    """
+
+    try:
+        return bool(session.driver.window_handles)
+    except Exception:
+        return False
+
+
+class ParallelTestRunner:
+    """
+    Runs a collection of test scenarios across a pool of workers, each of which owns its own Finsemble session.
+
+    Scenarios are first sharded across the workers by their historical durations (see `plan_shards()`.) Since
+    estimates are never perfect, a worker that finishes its own shard early steals the longest remaining scenario from
+    whichever other worker has the most (estimated) work left, so that all of the workers finish at about the same time.
+
+    If a scenario raises and the worker's session turns out to be dead (e.g. Finsemble or ChromeDriver crashed), the
+    session is relaunched and the scenario retried. Failed launches are retried after a growing delay (see
+    `launch_backoff`.) A worker whose session can't be relaunched retires, and the rest of its shard (including the
+    scenario it was about to run) is picked up by the remaining workers - which is why a worker that runs out of work
+    waits for every other worker to finish before it stops, rather than stopping right away.
+
+    The launcher is any callable returning a `FinsembleSession` (or anything with a `driver` and a `quit()`), e.g.
+    `lambda: launch_finsemble_session_from_src(PATH_TO_FINSEMBLE_SEED, PATH_TO_CHROMEDRIVER)`, so scheduling can be
+    exercised with a fake launcher that doesn't start Electron at all.
+    """
+
+    def __init__(self, launcher: Callable[[], FinsembleSession], worker_count: int,
+                 history: Optional[DurationHistory] = None,
+                 health_check: Callable[[FinsembleSession], bool] = _is_session_healthy,
+                 max_attempts_per_scenario: int = 2, max_launch_failures_per_worker: int = 3,
+                 launch_backoff: Optional[BackoffPolicy] = None) -> None:
+        """
+        :param launcher: A callable that launches a new, isolated Finsemble session.
+        :type launcher: Callable[[], FinsembleSession]
+
+        :param worker_count: The number of workers (and thus, concurrent Finsemble sessions) to run.
+        :type worker_count: int
+
+        :param history: The historical scenario durations to shard by. Updated (and saved) after every run.
+        :type history: Optional[DurationHistory]
+
+        :param health_check: A callable returning whether or not a session is still usable. Used after a scenario
+                             raises, to tell a failing scenario apart from a crashed session.
+        :type health_check: Callable[[FinsembleSession], bool]
+
+        :param max_attempts_per_scenario: How many times a scenario may be run in total when its session crashes.
+        :type max_attempts_per_scenario: int
+
+        :param max_launch_failures_per_worker: How many consecutive failed launches a worker tolerates before retiring.
+        :type max_launch_failures_per_worker: int
+
+        :param launch_backoff: The policy determining how long a worker waits before relaunching after a failed
+                               launch. Defaults to `DEFAULT_LAUNCH_BACKOFF_POLICY`.
+        :type launch_backoff: Optional[BackoffPolicy]
+        """
+
+        self.launcher: Callable[[], FinsembleSession] = launcher
+        self.worker_count: int = worker_count
+        self.history: DurationHistory = history or DurationHistory()
+        self.health_check: Callable[[FinsembleSession], bool] = health_check
+        self.max_attempts_per_scenario: int = max_attempts_per_scenario
+        self.max_launch_failures_per_worker: int = max_launch_failures_per_worker
+        self.launch_backoff: BackoffPolicy = launch_backoff or DEFAULT_LAUNCH_BACKOFF_POLICY
+
+        self._lock: Lock = Lock()
+        # Notified whenever a scenario is finished or given back, i.e. whenever an idle worker may have work again.
+        self._work_changed: Condition = Condition(self._lock)
+        self._shards: List[List[str]] = []
+        # The number of scenarios that have been taken by a worker, but not yet finished or given back.
+        self._taken_scenario_count: int = 0
+        self._results: Dict[str, ScenarioResult] = {}
+        self._relaunch_count: int = 0
+
+    def run(self, scenarios: Union[Mapping[str, Scenario], Iterable[Scenario]]) -> ParallelRunReport:
+        """
+        Run every given scenario, and wait for all of them to finish.
+
+        :param scenarios: The scenarios to run, either as a mapping of names to callables, or as a collection of
+                          callables (which are named after their `__qualname__`, with a "#2", "#3", etc. suffix for
+                          any that share a name, e.g. lambdas.)
+        :type scenarios: Union[Mapping[str, Scenario], Iterable[Scenario]]
+
+        :return: The merged results of every scenario.
+        :rtype: ParallelRunReport
+        """
+
+        if not isinstance(scenarios, Mapping):
+            scenarios = _name_scenarios(scenarios)
+
+        start_time = time.monotonic()
+        self._results = {}
+        self._relaunch_count = 0
+        self._taken_scenario_count = 0
+        self._shards = plan_shards(scenarios, self.history, self.worker_count)
+
+        workers = [Thread(target=self._run_worker, args=(worker_index, scenarios),
+                          name=f'ParallelTestRunner-worker-{worker_index}', daemon=True)
+                   for worker_index in range(self.worker_count)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        # Anything left in a shard at this point was stranded by every worker retiring.
+        for shard in self._shards:
+            for name in shard:
+                self._results[name] = ScenarioResult(name, ScenarioResult.NOT_RUN)
+            shard.clear()
+
+        for result in self._results.values():
+            if result.status in (ScenarioResult.PASSED, ScenarioResult.FAILED):
+                self.history.update(result.name, result.duration_in_seconds)
+        self.history.save()
+
+        return ParallelRunReport([self._results[name] for name in scenarios], time.monotonic() - start_time,
+                                 self.worker_count, self._relaunch_count)
+
+    def _take_next_scenario(self, worker_index: int) -> Optional[str]:
+        """
+        Take the next scenario off of the given worker's own shard or, if that's empty, steal the longest scenario
+        remaining in whichever other shard has the most estimated work left. If every shard is empty but other workers
+        are still running scenarios, wait - any of them may yet retire and give its scenario back.
+
+        :return: The name of the scenario to run, or `None` once there is no work left at all.
+        """
+
+        with self._work_changed:
+            while True:
+                own_shard = self._shards[worker_index]
+                busiest_shard = own_shard or max(self._shards,
+                                                 key=lambda shard: sum(map(self.history.estimate, shard)))
+                if busiest_shard:
+                    self._taken_scenario_count += 1
+                    return busiest_shard.pop(0)
+                if not self._taken_scenario_count:
+                    return None
+                self._work_changed.wait()
+
+    def _release_scenario(self, worker_index: int, name: str, result: Optional[ScenarioResult]) -> None:
+        """
+        Record the result of a scenario taken with `_take_next_scenario()` or, if there is none, give the scenario
+        back (to the front of the given worker's shard), and wake up any idle workers.
+        """
+
+        with self._work_changed:
+            if result is None:
+                self._shards[worker_index].insert(0, name)
+            else:
+                self._results[name] = result
+            self._taken_scenario_count -= 1
+            self._work_changed.notify_all()
+
+    def _run_worker(self, worker_index: int, scenarios: Mapping[str, Scenario]) -> None:
+        session = None
+        launch_failures = 0
+        launch_delays = self.launch_backoff.delays()
+        name = None
+        try:
+            while True:
+                name = self._take_next_scenario(worker_index)
+                if name is None:
+                    return
+
+                result = ScenarioResult(name, ScenarioResult.CRASHED, worker_index=worker_index)
+                while result.attempts < self.max_attempts_per_scenario:
+                    if session is None:
+                        try:
+                            session = self.launcher()
+                            launch_failures = 0
+                            launch_delays = self.launch_backoff.delays()
+                        except Exception:
+                            launch_failures += 1
+                            if launch_failures >= self.max_launch_failures_per_worker:
+                                # Give the scenario back, so that another worker can run it, and retire.
+                                self._release_scenario(worker_index, name, None)
+                                name = None
+                                return
+                            time.sleep(next(launch_delays))
+                            continue
+
+                    result.attempts += 1
+                    start_time = time.monotonic()
+                    try:
+                        scenarios[name](session)
+                        result.status, result.error = ScenarioResult.PASSED, None
+                    except Exception:
+                        result.error = traceback.format_exc()
+                        result.status = ScenarioResult.FAILED if self.health_check(session) \
+                            else ScenarioResult.CRASHED
+                    result.duration_in_seconds = time.monotonic() - start_time
+
+                    if result.status != ScenarioResult.CRASHED:
+                        break
+
+                    # The session died underneath the scenario - throw it away and retry on a fresh one.
+                    self._quit_quietly(session)
+                    session = None
+                    with self._lock:
+                        self._relaunch_count += 1
+
+                self._release_scenario(worker_index, name, result)
+                name = None
+        except Exception:
+            # e.g. the health check raised. Record why this worker stopped against the scenario it was running.
+            if name is not None:
+                self._release_scenario(worker_index, name, ScenarioResult(
+                    name, ScenarioResult.ERROR, error=traceback.format_exc(), worker_index=worker_index))
+                name = None
+        finally:
+            if name is not None:
+                # The worker was interrupted outright. The scenario must not stay taken, or idle workers would wait on
+                # it forever.
+                self._release_scenario(worker_index, name, ScenarioResult(
+                    name, ScenarioResult.ERROR, error='The worker running this scenario stopped unexpectedly.',
+                    worker_index=worker_index))
+            if session is not None:
+                self._quit_quietly(session)
+
+    @staticmethod
+    def _quit_quietly(session: FinsembleSession) -> None:
+        try:
+            session.quit()
+        except Exception:
+            pass
+
+
+def run_scenarios_in_parallel(scenarios: Union[Mapping[str, Scenario], Iterable[Scenario]],
+                              launcher: Callable[[], FinsembleSession], worker_count: int,
+                              path_to_duration_history: Optional[str] = None,
+                              path_to_report: Optional[str] = None, verbose: bool = False) -> ParallelRunReport:
+    """
+    Run the given scenarios across `worker_count` concurrent Finsemble sessions.
+
+    :param scenarios: The scenarios to run, either as a mapping of names to callables, or as a collection of
+                      callables. Each is passed the `FinsembleSession` to run against.
+    :type scenarios: Union[Mapping[str, Scenario], Iterable[Scenario]]
+
+    :param launcher: A callable that launches a new, isolated Finsemble session.
+                     E.g.: `lambda: launch_finsemble_session_from_src(PATH_TO_FINSEMBLE_SEED, PATH_TO_CHROMEDRIVER)`
+    :type launcher: Callable[[], FinsembleSession]
+
+    :param worker_count: The number of workers (and thus, concurrent Finsemble sessions) to run.
+    :type worker_count: int
+
+    :param path_to_duration_history: A JSON file of historical scenario durations to shard by, which is updated with
+                                     the durations of this run.
+    :type path_to_duration_history: Optional[str]
+
+    :param path_to_report: A JSON file to write the merged results to.
+    :type path_to_report: Optional[str]
+
+    :param verbose: Whether or not to print a summary of the results (see `ParallelRunReport.summary()`.)
+    :type verbose: bool
+
+    :return: The merged results of every scenario.
+    :rtype: ParallelRunReport
+    """
+
+    runner = ParallelTestRunner(launcher, worker_count, DurationHistory(path_to_duration_history))
+    report = runner.run(scenarios)
+    if path_to_report:
+        report.to_json(path_to_report)
+    if verbose:
+        print(report.summary())
+    return report
@@ -0,0 +1,468 @@
+from __future__ import annotations
+import json
+import time
+from array import array
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from contextlib import contextmanager
+from src.cdp_connection import CdpConnection, CdpError
+from src.finsemble_component_discoverer import FinsembleComponentDiscoverer
+from threading import Event, Lock, Thread
+from typing import TYPE_CHECKING, Dict, Iterator, List, Optional
+if TYPE_CHECKING:
+    from selenium.webdriver.remote.webdriver import WebDriver
+
+
+# The `Performance.getMetrics` metrics that are recorded by default. Counts & sizes are point-in-time values, while the
+# `*Duration` metrics are cumulative totals (in seconds), so both are best compared as the difference between samples.
+DEFAULT_METRIC_NAMES = ['JSHeapUsedSize', 'JSHeapTotalSize', 'Nodes', 'Documents', 'JSEventListeners', 'LayoutCount',
+                        'RecalcStyleCount', 'LayoutDuration', 'RecalcStyleDuration', 'ScriptDuration', 'TaskDuration']
+
+
+class PerformanceBudgetExceededError(AssertionError):
+    """
+    Raised by `PerformanceMetricsCollector.assert_within_budget()` when a component has exceeded its budget.
+    """
+
+
+class ComponentMetricSeries:
+    """
+    The time series of performance metrics sampled from a single window. Samples are stored column-wise (one compact
+    array of floats per metric), so that a long-running collection stays small.
+
+    `timestamps` are in seconds, relative to the start of the collection, as measured by a monotonic clock.
+    """
+
+    def __init__(self, handle: str, url: str, title: str, metric_names: List[str]) -> None:
+        self.handle: str = handle
+        self.url: str = url
+        self.title: str = title
+        self.closed: bool = False
+        self.timestamps: array = array('d')
+        self.values: Dict[str, array] = {metric_name: array('d') for metric_name in metric_names}
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    def latest(self) -> Optional[Dict[str, float]]:
+        """
+        :return: The most recent sample's metrics, or `None` if the window has never been sampled.
+        :rtype: Optional[Dict[str, float]]
+        """
+
+        if not self.timestamps:
+            return None
+        return {metric_name: values[-1] for metric_name, values in self.values.items()}
+
+    def peak(self, metric_name: str) -> Optional[float]:
+        """
+        :return: The highest value of the given metric across every sample, or `None` if there are no samples.
+        :rtype: Optional[float]
+        """
+
+        values = self.values.get(metric_name)
+        return max(values) if values else None
+
+    def to_dict(self) -> dict:
+        return {
+            'handle': self.handle,
+            'url': self.url,
+            'title': self.title,
+            'closed': self.closed,
+            'timestamps': list(self.timestamps),
+            'values': {metric_name: list(values) for metric_name, values in self.values.items()}
+        }
+
+    def _append(self, timestamp: float, metrics: Dict[str, float]) -> None:
+        self.timestamps.append(timestamp)
+        for metric_name, values in self.values.items():
+            # CDP omits metrics it doesn't track for a page (e.g. before its first layout), which are effectively 0.
+            values.append(metrics.get(metric_name, 0.0))
+
+
+class PerformanceStep:
+    """
+    The metrics of every window just before & just after a step of a test, as recorded by
+    `PerformanceMetricsCollector.step()`.
+    """
+
+    def __init__(self, name: str, before: Dict[str, Dict[str, float]]) -> None:
+        self.name: str = name
+        self.before: Dict[str, Dict[str, float]] = before
+        self.after: Dict[str, Dict[str, float]] = {}
+        self.duration_in_seconds: Optional[float] = None
+
+    @property
+    def deltas(self) -> Dict[str, Dict[str, float]]:
+        """
+        :return: For each window that was open both before & after the step, keyed by Selenium window handle, the
+                 change in each metric over the course of the step.
+        :rtype: Dict[str, Dict[str, float]]
+        """
+
+        return {handle: {metric_name: value - self.before[handle].get(metric_name, 0.0)
+                         for metric_name, value in metrics.items()}
+                for handle, metrics in self.after.items() if handle in self.before}
+
+
+class PerformanceBudget:
+    """
+    The limits that every window whose URL contains `url` must stay within.
+
+    E.g. to allow the ChartIQ window at most 200MB of JS heap, and at most 50 layouts per test step:
+        PerformanceBudget('chartiq', max_values={'JSHeapUsedSize': 200 * 1024 ** 2}, max_deltas={'LayoutCount': 50})
+    """
+
+    def __init__(self, url: str, max_values: Optional[Dict[str, float]] = None,
+                 max_deltas: Optional[Dict[str, float]] = None) -> None:
+        """
+        :param url: The URL (or part of the URL) of the windows the budget applies to.
+        :type url: str
+
+        :param max_values: The highest value each metric may reach, keyed by metric name.
+        :type max_values: Optional[Dict[str, float]]
+
+        :param max_deltas: The most each metric may increase by over the course of a step (or, when not checking a
+                           step, between the first & latest samples of a window), keyed by metric name.
+        :type max_deltas: Optional[Dict[str, float]]
+        """
+
+        self.url: str = url
+        self.max_values: Dict[str, float] = max_values or {}
+        self.max_deltas: Dict[str, float] = max_deltas or {}
+
+    def applies_to(self, url: str) -> bool:
+        return self.url.lower() in url.lower()
+
+    def check(self, url: str, values: Dict[str, float], deltas: Optional[Dict[str, float]] = None) -> List[str]:
+        """
+        :return: A description of every limit of this budget that the given metrics exceed.
+        :rtype: List[str]
+        """
+
+        violations = []
+        for metric_name, max_value in self.max_values.items():
+            if values.get(metric_name, 0.0) > max_value:
+                violations.append(f'{url}: {metric_name} of {values[metric_name]:g} exceeds the budget of '
+                                  f'{max_value:g}')
+        for metric_name, max_delta in self.max_deltas.items():
+            if deltas is not None and deltas.get(metric_name, 0.0) > max_delta:
+                violations.append(f'{url}: {metric_name} increased by {deltas[metric_name]:g}, exceeding the budget '
+                                  f'of {max_delta:g}')
+        return violations
+
+
+class PerformanceMetricsCollector:
+    """
+    Samples the Chrome DevTools Protocol `Performance.getMetrics` counters (JS heap size, DOM node count, layout
+    count, script duration, etc.) of every window Finsemble has open, so that tests can catch performance regressions
+    as well as functional ones.
+
+    Further reading: https://chromedevtools.github.io/devtools-protocol/tot/Performance/
+
+    Every page listed by the Remote Debugger gets its own DevTools connection, which is kept open between samples, so
+    a sample of every window costs one round-trip per window, all issued concurrently - and never changes which window
+    Selenium is focused on. Windows that open later are picked up by the next sample.
+
+    Samples can be taken on demand (`sample()`), on an interval in the background (`start()` / `stop()`), or around a
+    step of a test (`step()`.) Each window's samples are kept as a compact time series (see `ComponentMetricSeries`),
+    and can be checked against a `PerformanceBudget`.
+
+    E.g.:
+        with PerformanceMetricsCollector(driver) as collector:
+            with collector.step('open_chart') as step:
+                open_chart()
+            collector.assert_within_budget(PerformanceBudget('chartiq', max_deltas={'Nodes': 5000}), step)
+
+    Remote Debugging must be available for the driver.
+    """
+
+    def __init__(self, driver: WebDriver, discoverer: Optional[FinsembleComponentDiscoverer] = None,
+                 metric_names: Optional[List[str]] = None, timeout_in_seconds: float = 10) -> None:
+        """
+        :param driver: A Selenium `WebDriver` object that is hooked into Finsemble.
+        :type driver: WebDriver
+
+        :param discoverer: The discoverer to list the available pages with. If not provided, one is created (and closed
+                           again along with the collector.)
+        :type discoverer: Optional[FinsembleComponentDiscoverer]
+
+        :param metric_names: The metrics to record. Defaults to `DEFAULT_METRIC_NAMES`.
+        :type metric_names: Optional[List[str]]
+
+        :param timeout_in_seconds: The maximum time, in seconds, to wait for any single window to report its metrics.
+        :type timeout_in_seconds: float
+
+        :raises Exception: If Remote Debugging is not available for the driver.
+        """
+
+        self.metric_names: List[str] = list(metric_names or DEFAULT_METRIC_NAMES)
+        self.timeout_in_seconds: float = timeout_in_seconds
+
+        self._owns_discoverer: bool = discoverer is None
+        self._discoverer: FinsembleComponentDiscoverer = discoverer or FinsembleComponentDiscoverer(driver)
+        if not self._discoverer.remote_debugger.is_available:
+            self.close()
+            raise Exception('Remote Debugging is not available, so performance metrics cannot be collected.')
+
+        self._connections: Dict[str, CdpConnection] = {}
+        self._series: Dict[str, ComponentMetricSeries] = {}
+        self._lock: Lock = Lock()
+        self._monotonic_start: float = time.monotonic()
+        self._sampling_thread: Optional[Thread] = None
+        self._stop_sampling: Event = Event()
+
+    @property
+    def series(self) -> List[ComponentMetricSeries]:
+        """
+        :return: The time series of every window that has been sampled, including those that have since closed.
+        :rtype: List[ComponentMetricSeries]
+        """
+
+        with self._lock:
+            return list(self._series.values())
+
+    def get_series(self, handle: str) -> Optional[ComponentMetricSeries]:
+        with self._lock:
+            return self._series.get(handle)
+
+    def find_series(self, url: str) -> List[ComponentMetricSeries]:
+        """
+        :param url: The URL (or part of the URL) of the windows to look up, e.g. "chartiq".
+        :type url: str
+
+        :return: The time series of every window (open or closed) whose URL contains the given URL.
+        :rtype: List[ComponentMetricSeries]
+        """
+
+        return [series for series in self.series if url.lower() in series.url.lower()]
+
+    def discard_closed_series(self, empty_only: bool = False) -> None:
+        """
+        Discard the time series of every window that has closed, e.g. to keep memory flat while windows are spawned &
+        closed over and over.
+
+        :param empty_only: Whether or not to only discard the series that hold no samples, e.g. of windows that were
+                           only ever sampled with `sample(record=False)`.
+        :type empty_only: bool
+        """
+
+        with self._lock:
+            for handle in [handle for handle, series in self._series.items()
+                           if series.closed and not (empty_only and len(series))]:
+                del self._series[handle]
+
+    def sample(self, record: bool = True) -> Dict[str, Dict[str, float]]:
+        """
+        Sample the metrics of every open window, and append them to each window's time series.
+
+        :param record: Whether or not to append the samples to each window's time series. If not, the current metrics
+                       are only returned, so that sampling over and over (e.g. for hours) doesn't grow memory.
+        :type record: bool
+
+        :return: The metrics of every window that reported them, keyed by Selenium window handle.
+        :rtype: Dict[str, Dict[str, float]]
+        """
+
+        with self._lock:
+            self._sync_connections()
+            timestamp = time.monotonic() - self._monotonic_start
+            futures = {handle: connection.send('Performance.getMetrics')
+                       for handle, connection in self._connections.items()}
+
+            samples = {}
+            for handle, future in futures.items():
+                try:
+                    result = future.result(timeout=self.timeout_in_seconds)
+                except (CdpError, FutureTimeoutError):
+                    # The window closed (or hung) mid-sample; it'll be dropped by the next sample if it's gone.
+                    continue
+                metrics = {metric['name']: metric['value'] for metric in result.get('metrics', [])}
+                samples[handle] = {metric_name: metrics.get(metric_name, 0.0) for metric_name in self.metric_names}
+                if record:
+                    self._series[handle]._append(timestamp, metrics)
+            return samples
+
+    def collect_garbage(self) -> None:
+        """
+        Force a garbage collection in every open window, so that the JS heap sizes sampled next reflect memory that is
+        actually still reachable.
+        """
+
+        with self._lock:
+            self._sync_connections()
+            futures = [connection.send('HeapProfiler.collectGarbage') for connection in self._connections.values()]
+            for future in futures:
+                try:
+                    future.result(timeout=self.timeout_in_seconds)
+                except (CdpError, FutureTimeoutError):
+                    continue
+
+    def start(self, interval_in_seconds: float = 1.0) -> None:
+        """
+        Sample every window on an interval, in the background, until `stop()` is called.
+
+        :param interval_in_seconds: The time, in seconds, between the start of consecutive samples.
+        :type interval_in_seconds: float
+        """
+
+        if self._sampling_thread:
+            return
+        self._stop_sampling.clear()
+        self._sampling_thread = Thread(target=self._sample_on_interval, args=(interval_in_seconds,),
+                                       name='PerformanceMetricsCollector', daemon=True)
+        self._sampling_thread.start()
+
+    def stop(self) -> None:
+        """
+        Stop sampling in the background, once the sample in progress (if any) completes.
+        """
+
+        if not self._sampling_thread:
+            return
+        self._stop_sampling.set()
+        self._sampling_thread.join()
+        self._sampling_thread = None
+
+    @contextmanager
+    def step(self, name: str) -> Iterator[PerformanceStep]:
+        """
+        Sample every window just before & just after the body of a `with` block, so that the cost of a single step of a
+        test can be measured (see `PerformanceStep.deltas`) and checked against a budget.
+
+        :param name: The name of the step, e.g. "open_chart".
+        :type name: str
+        """
+
+        performance_step = PerformanceStep(name, self.sample())
+        start_time = time.monotonic()
+        try:
+            yield performance_step
+        finally:
+            performance_step.duration_in_seconds = time.monotonic() - start_time
+            performance_step.after = self.sample()
+
+    def check_budget(self, budget: PerformanceBudget, step: Optional[PerformanceStep] = None) -> List[str]:
+        """
+        Check every window the budget applies to against it.
+
+        :param budget: The budget to check.
+        :type budget: PerformanceBudget
+
+        :param step: If provided, the windows are checked as they were at the end of the step, and `max_deltas` are
+                     checked against the change over the step. Otherwise, the latest sample of each open window is
+                     checked, and `max_deltas` against the change since its first sample.
+        :type step: Optional[PerformanceStep]
+
+        :return: A description of every limit that was exceeded, or an empty list if every window is within budget.
+        :rtype: List[str]
+        """
+
+        violations = []
+        for series in self.series:
+            if not budget.applies_to(series.url):
+                continue
+            if step is not None:
+                if series.handle not in step.after:
+                    continue
+                values = step.after[series.handle]
+                deltas = step.deltas.get(series.handle)
+            else:
+                if series.closed or not len(series):
+                    continue
+                values = series.latest()
+                deltas = {metric_name: metric_values[-1] - metric_values[0]
+                          for metric_name, metric_values in series.values.items()}
+            violations.extend(budget.check(series.url, values, deltas))
+        return violations
+
+    def assert_within_budget(self, *budgets: PerformanceBudget, step: Optional[PerformanceStep] = None) -> None:
+        """
+        Check every window against each of the given budgets. (See `check_budget()`.)
+
+        :raises PerformanceBudgetExceededError: If any window exceeds any of the budgets.
+        """
+
+        violations = [violation for budget in budgets for violation in self.check_budget(budget, step)]
+        if violations:
+            raise PerformanceBudgetExceededError('Performance budget exceeded:\n  ' + '\n  '.join(violations))
+
+    def to_dict(self) -> dict:
+        return {'metric_names': self.metric_names, 'series': [series.to_dict() for series in self.series]}
+
+    def to_json(self, path_to_json: Optional[str] = None) -> str:
+        """
+        Export every time series as JSON.
+
+        :param path_to_json: A file to write the JSON to, if any.
+        :type path_to_json: Optional[str]
+
+        :return: The JSON representation of every time series.
+        :rtype: str
+        """
+
+        metrics_json = json.dumps(self.to_dict())
+        if path_to_json:
+            with open(path_to_json, 'w') as json_file:
+                json_file.write(metrics_json)
+        return metrics_json
+
+    def close(self) -> None:
+        """
+        Stop sampling, and release every connection held open by the collector.
+        """
+
+        if getattr(self, '_sampling_thread', None):
+            self.stop()
+        for connection in getattr(self, '_connections', {}).values():
+            connection.close()
+        if self._owns_discoverer:
+            self._discoverer.close()
+
+    def __enter__(self) -> PerformanceMetricsCollector:
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def _sync_connections(self) -> None:
+        """
+        Connect to (and enable the `Performance` domain of) every window that has opened since the last sample, and
+        disconnect from every window that has closed.
+        """
+
+        remote_debugger = self._discoverer.remote_debugger
+        pages = remote_debugger.get_pages(use_cache=False)
+
+        for handle in list(self._connections):
+            if handle not in pages or not self._connections[handle].is_connected:
+                self._connections.pop(handle).close()
+                if handle not in pages:
+                    self._series[handle].closed = True
+
+        for handle, page in pages.items():
+            if handle in self._connections:
+                continue
+            try:
+                connection = remote_debugger.connect_to_page(handle, self.timeout_in_seconds)
+            except Exception:
+                # The window closed before it could be connected to.
+                continue
+            # Commands are answered in order, so there's no need to wait for this before asking for metrics.
+            connection.send('Performance.enable')
+            self._connections[handle] = connection
+            series = self._series.get(handle)
+            if series is None or series.closed:
+                self._series[handle] = ComponentMetricSeries(handle, page['url'], page['title'], self.metric_names)
+            else:
+                series.url = page['url']
+
+    def _sample_on_interval(self, interval_in_seconds: float) -> None:
+        next_sample_time = time.monotonic()
+        while not self._stop_sampling.is_set():
+            try:
+                self.sample()
+            except Exception:
+                # e.g. the Remote Debugger is briefly unreachable; try again on the next interval.
+                pass
+            next_sample_time += interval_in_seconds
+            self._stop_sampling.wait(max(0.0, next_sample_time - time.monotonic()))
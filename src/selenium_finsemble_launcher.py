@@ -1,14 +1,123 @@
 from __future__ import annotations
+import re
+import shutil
+import socket
+import tempfile
 from selenium import webdriver
 from selenium.common.exceptions import WebDriverException
+from selenium.webdriver.chrome.remote_connection import ChromeRemoteConnection
+from selenium.webdriver.chrome.service import Service as ChromeService
+from selenium.webdriver.remote.webdriver import WebDriver as RemoteWebDriver
+from src.asset_cache import AssetCache, AssetCacheInterceptor, AssetCacheServer
+from src.command_metrics import CommandMetrics, instrument_command_executor
+from src.finsemble_component_discoverer import FinsembleComponentDiscoverer
+from src.startup_timeline import StartupTimeline
 from os import path, environ
-
-from typing import TYPE_CHECKING
+from threading import Lock
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Set
 if TYPE_CHECKING:
     from selenium.webdriver.remote.webdriver import WebDriver
     from selenium.webdriver.chrome.options import Options as ChromeOptions
 
 
+# Debugging ports that have been handed out to a session launched by this process, but which its Electron app may not
+# have bound to yet. (So that sessions launched concurrently are never given the same port.)
+_reserved_debugging_ports: Set[int] = set()
+_reserved_debugging_ports_lock: Lock = Lock()
+
+
+class FinsembleSession:
+    """
+    A single running instance of Finsemble under test, along with everything that was set up to isolate it from any
+    other instance running on the same machine: its own remote debugging port, its own (temporary) user-data directory,
+    and its own ChromeDriver process.
+
+    Any number of sessions can be launched and run concurrently from the same Python process, e.g. from separate
+    threads. Use `quit()` (or a `with` block) to shut the session down and clean up after it.
+
+    The `startup_timeline` records how long each phase of launching this session took. Call
+    `wait_for_first_component()` to add Finsemble's own startup (loading the manifest, and the first component
+    appearing) to the timeline.
+
+    If the session was launched with an asset cache, `asset_cache_interceptor` is serving (and/or recording) its
+    windows' requests. (See `AssetCacheInterceptor`.)
+    """
+
+    def __init__(self, driver: WebDriver, debugging_port: int, user_data_dir: Optional[str],
+                 startup_timeline: Optional[StartupTimeline] = None,
+                 asset_cache_interceptor: Optional[AssetCacheInterceptor] = None) -> None:
+        """
+        :param driver: The Selenium `WebDriver` object that is hooked into this instance of Finsemble.
+        :type driver: WebDriver
+
+        :param debugging_port: The remote debugging port that this instance of Finsemble was launched with.
+        :type debugging_port: int
+
+        :param user_data_dir: The user-data directory that this instance of Finsemble was launched with, if it was
+                              given an isolated one.
+        :type user_data_dir: Optional[str]
+
+        :param startup_timeline: The timeline of this session's launch, if it was recorded.
+        :type startup_timeline: Optional[StartupTimeline]
+
+        :param asset_cache_interceptor: The interceptor serving this session's requests from an asset cache, if any.
+        :type asset_cache_interceptor: Optional[AssetCacheInterceptor]
+        """
+
+        self.driver: WebDriver = driver
+        self.debugging_port: int = debugging_port
+        self.user_data_dir: Optional[str] = user_data_dir
+        self.startup_timeline: StartupTimeline = startup_timeline or StartupTimeline()
+        self.asset_cache_interceptor: Optional[AssetCacheInterceptor] = asset_cache_interceptor
+
+    def wait_for_first_component(self, desired_url: str = 'Toolbar/index.html', timeout_in_seconds: float = 60) -> str:
+        """
+        Wait for Finsemble to finish starting up, as far as the given component is concerned, recording two more
+        phases on the `startup_timeline`:
+        - "manifest_load": Until the first page served over HTTP(S) appears, i.e. Finsemble has loaded its manifest
+          and begun to spawn the components it defines.
+        - "first_component_discovery": Until the given component appears.
+
+        :param desired_url: The URL of the component to wait for. This is matched on a "partial" basis.
+        :type desired_url: str
+
+        :param timeout_in_seconds: The maximum time, in seconds, to wait across both phases.
+        :type timeout_in_seconds: float
+
+        :return: The Selenium window handle of the component.
+        :rtype: str
+        """
+
+        discoverer = FinsembleComponentDiscoverer(self.driver)
+        end_time = self.startup_timeline.elapsed() + timeout_in_seconds
+
+        def _count_windows() -> int:
+            return len(discoverer.discover_all_available_pages())
+
+        try:
+            with self.startup_timeline.phase('manifest_load', _count_windows):
+                discoverer.get_selenium_handles_of_pages_matching_urls(
+                    [re.compile(r'^https?://')], timeout_in_seconds=end_time - self.startup_timeline.elapsed())
+            with self.startup_timeline.phase('first_component_discovery', _count_windows):
+                return discoverer.get_selenium_handles_of_pages_matching_urls(
+                    [desired_url], timeout_in_seconds=end_time - self.startup_timeline.elapsed())[desired_url]
+        finally:
+            discoverer.close()
+
+    def quit(self) -> None:
+        """
+        Shut down Finsemble and ChromeDriver, and remove this session's isolated user-data directory (if any).
+        """
+
+        self.driver.quit()
+
+    def __enter__(self) -> FinsembleSession:
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.quit()
+
+
 def launch_chromedriver_for_finsemble_from_src(path_to_finsemble_project: str, path_to_chromedriver: str) -> WebDriver:
     """
     Given that Finsemble server is already running (e.g. `yarn server` in finsemble-seed), this method will launch
@@ -34,17 +143,85 @@ def launch_chromedriver_for_finsemble_from_src(path_to_finsemble_project: str, p
     :rtype: WebDriver
     """
 
+    session = launch_finsemble_session_from_src(path_to_finsemble_project, path_to_chromedriver,
+                                                isolated_profile=False)
+    return session.driver
+
+
+def launch_finsemble_session_from_src(path_to_finsemble_project: str, path_to_chromedriver: str,
+                                      isolated_profile: bool = True,
+                                      environment: Optional[Dict[str, str]] = None,
+                                      asset_cache_directory: Optional[str] = None,
+                                      asset_cache_mode: str = 'replay_or_record',
+                                      command_metrics: Optional[CommandMetrics] = None) -> FinsembleSession:
+    """
+    Given that Finsemble server is already running (e.g. `yarn server` in finsemble-seed), this method will launch
+    a local Finsemble project from src as an Electron app with Selenium + ChromeDriver hooked into it.
+
+    Unlike `launch_chromedriver_for_finsemble_from_src()`, the resulting session is isolated from any other instance
+    of Finsemble on this machine (it's given a free remote debugging port of its own and, optionally, its own
+    user-data directory), so several sessions can be launched and run concurrently.
+
+    :param path_to_finsemble_project: The path to the location of the local Finsemble project (e.g. finsemble-seed) to
+                                      launch. The project's underlying installations of `Electron` and
+                                      `@finsemble/finsemble-electron-adapter` within `node_modules` will be used
+                                      to launch Selenium + ChromeDriver.
+                                      E.g.: "%UserProfile%/Dev/Finsemble/finsemble-seed"
+    :type path_to_finsemble_project: str
+
+    :param path_to_chromedriver: The path to the location of the chromedriver.exe binary to use. Please note that the
+                                 ChromeDriver version is highly dependent on the underlying version of Finsemble,
+                                 Electron, and Chromium under test. If a version of ChromeDriver is used that does not
+                                 match the underlying Chromium <--> Electron <--> Finsemble under test, then Selenium
+                                 will fail to start and this method will raise an exception.
+                                 E.g.: "%UserProfile%/Dev/Utils/WebDrivers/chromedriver_78/win32/chromedriver.exe"
+    :type path_to_chromedriver: str
+
+    :param isolated_profile: Whether or not to launch Finsemble with its own temporary user-data directory (which is
+                             removed again when the session quits), so that it shares no local state with any other
+                             instance of Finsemble on this machine.
+    :type isolated_profile: bool
+
+    :param environment: Additional environment variables to launch ChromeDriver (and thus, Finsemble) with. These are
+                        passed to the child process only - the environment of this process is left untouched.
+    :type environment: Optional[Dict[str, str]]
+
+    :param asset_cache_directory: If provided, the requests of Finsemble's windows are intercepted and served from (or
+                                  recorded to) a content-addressed cache in this directory. (See
+                                  `AssetCacheInterceptor`.)
+    :type asset_cache_directory: Optional[str]
+
+    :param asset_cache_mode: How to use the asset cache, as one of `ASSET_CACHE_MODES`: "record" to (re-)record it
+                             from the server, "replay" to serve from it alone, or "replay_or_record" to serve from it
+                             where possible and record whatever is missing. When replaying, any server on this machine
+                             that the cache holds responses for (e.g. the one serving Finsemble's manifest) is stood in
+                             for by an `AssetCacheServer` if it isn't running; a server elsewhere is still needed for
+                             anything Electron's main process fetches from it.
+    :type asset_cache_mode: str
+
+    :param command_metrics: The metrics to record the latency of every WebDriver command to, e.g.
+                            `CommandMetrics([SummaryReportSink()])` to print a summary of the slowest commands once the
+                            session quits. Defaults to new metrics that are only kept in memory. Available afterwards as
+                            the driver's `command_metrics`.
+    :type command_metrics: Optional[CommandMetrics]
+
+    :return: A `FinsembleSession` that is hooked into the newly-launched Finsemble application under test.
+    :rtype: FinsembleSession
+    """
+
     try:
-        # BEFORE launching ChromeDriver, we need to set the `ELECTRON_DEV` environment variable so that Finsemble is
-        # launched in development mode. (Electron-applications can't be tested via e2e while in production mode.)
-        # Without setting this flag, you'll get an "Unable to find embedded manifest URL." error on startup.
-        environ['ELECTRON_DEV'] = 'true'
+        # We need to set the `ELECTRON_DEV` environment variable so that Finsemble is launched in development mode.
+        # (Electron-applications can't be tested via e2e while in production mode.) Without setting this flag, you'll
+        # get an "Unable to find embedded manifest URL." error on startup.
+        # This is passed to the ChromeDriver child process only, rather than set on `os.environ`, so that it doesn't
+        # leak into any other session launched from this process.
+        environment = {'ELECTRON_DEV': 'true', **(environment or {})}
 
         # Generate the specific `ChromeOptions` needed to launch Finsemble from src and then pass those options in
         # to launch Finsemble as an Electron app with Selenium + ChromeDriver hooked in.
         chrome_options = _get_chrome_options_for_finsemble_from_src(path_to_finsemble_project)
-        driver = _launch_chromedriver_for_electron_app(path_to_chromedriver, chrome_options)
-        return driver
+        return _launch_finsemble_session(path_to_chromedriver, chrome_options, isolated_profile, environment,
+                                         'from_src', asset_cache_directory, asset_cache_mode, command_metrics)
     except WebDriverException as e:
         if 'unable to discover open pages' in e.msg:
             raise Exception(f"WebDriverException encountered: {e.msg}\n\n"
@@ -78,12 +255,76 @@ def launch_chromedriver_for_finsemble_from_exe(path_to_finsemble_exe: str, path_
     :rtype: WebDriver
     """
 
+    session = launch_finsemble_session_from_exe(path_to_finsemble_exe, path_to_chromedriver, isolated_profile=False)
+    return session.driver
+
+
+def launch_finsemble_session_from_exe(path_to_finsemble_exe: str, path_to_chromedriver: str,
+                                      isolated_profile: bool = True,
+                                      environment: Optional[Dict[str, str]] = None,
+                                      asset_cache_directory: Optional[str] = None,
+                                      asset_cache_mode: str = 'replay_or_record',
+                                      command_metrics: Optional[CommandMetrics] = None) -> FinsembleSession:
+    """
+    Given that Finsemble has been built and installed as an exe on this machine, this method will launch
+    the compiled Finsemble exe as an Electron app with Selenium + ChromeDriver hooked into it.
+
+    Unlike `launch_chromedriver_for_finsemble_from_exe()`, the resulting session is isolated from any other instance
+    of Finsemble on this machine (it's given a free remote debugging port of its own and, optionally, its own
+    user-data directory), so several sessions can be launched and run concurrently.
+
+    :param path_to_finsemble_exe: The path to the location of the installed Finsemble executable to launch. Keep in
+                                  mind that this should be the application executable itself, NOT the installer
+                                  executable. (i.e. this should probably be a location within %LocalAppData%)
+                                  E.g.: "%LocalAppData%/XyzDev/app-1.0.0/XyzDev.exe"
+    :type path_to_finsemble_exe: str
+
+    :param path_to_chromedriver: The path to the location of the chromedriver.exe binary to use. Please note that the
+                                 ChromeDriver version is highly dependent on the underlying version of Finsemble,
+                                 Electron, and Chromium under test. If a version of ChromeDriver is used that does not
+                                 match the underlying Chromium <--> Electron <--> Finsemble under test, then Selenium
+                                 will fail to start and this method will raise an exception.
+                                 E.g.: "%UserProfile%/Dev/Utils/WebDrivers/chromedriver_78/win32/chromedriver.exe"
+    :type path_to_chromedriver: str
+
+    :param isolated_profile: Whether or not to launch Finsemble with its own temporary user-data directory (which is
+                             removed again when the session quits), so that it shares no local state with any other
+                             instance of Finsemble on this machine.
+    :type isolated_profile: bool
+
+    :param environment: Additional environment variables to launch ChromeDriver (and thus, Finsemble) with. These are
+                        passed to the child process only - the environment of this process is left untouched.
+    :type environment: Optional[Dict[str, str]]
+
+    :param asset_cache_directory: If provided, the requests of Finsemble's windows are intercepted and served from (or
+                                  recorded to) a content-addressed cache in this directory. (See
+                                  `AssetCacheInterceptor`.)
+    :type asset_cache_directory: Optional[str]
+
+    :param asset_cache_mode: How to use the asset cache, as one of `ASSET_CACHE_MODES`: "record" to (re-)record it
+                             from the server, "replay" to serve from it alone, or "replay_or_record" to serve from it
+                             where possible and record whatever is missing. When replaying, any server on this machine
+                             that the cache holds responses for (e.g. the one serving Finsemble's manifest) is stood in
+                             for by an `AssetCacheServer` if it isn't running; a server elsewhere is still needed for
+                             anything Electron's main process fetches from it.
+    :type asset_cache_mode: str
+
+    :param command_metrics: The metrics to record the latency of every WebDriver command to, e.g.
+                            `CommandMetrics([SummaryReportSink()])` to print a summary of the slowest commands once the
+                            session quits. Defaults to new metrics that are only kept in memory. Available afterwards as
+                            the driver's `command_metrics`.
+    :type command_metrics: Optional[CommandMetrics]
+
+    :return: A `FinsembleSession` that is hooked into the newly-launched Finsemble application under test.
+    :rtype: FinsembleSession
+    """
+
     try:
         # Generate the specific `ChromeOptions` needed to launch Finsemble from exe and then pass those options in
         # to launch Finsemble as an Electron app with Selenium + ChromeDriver hooked in.
         chrome_options = _get_chrome_options_for_finsemble_from_exe(path_to_finsemble_exe)
-        driver = _launch_chromedriver_for_electron_app(path_to_chromedriver, chrome_options)
-        return driver
+        return _launch_finsemble_session(path_to_chromedriver, chrome_options, isolated_profile, environment,
+                                         'from_exe', asset_cache_directory, asset_cache_mode, command_metrics)
     except WebDriverException as e:
         if 'unable to discover open pages' in e.msg:
             raise Exception(f"WebDriverException encountered: {e.msg}\n\n"
@@ -166,7 +407,100 @@ def _get_chrome_options_for_finsemble_from_exe(path_to_finsemble_exe: str) -> Ch
     return chrome_options
 
 
-def _launch_chromedriver_for_electron_app(path_to_chromedriver: str, chrome_options: ChromeOptions) -> WebDriver:
+def _launch_finsemble_session(path_to_chromedriver: str, chrome_options: ChromeOptions, isolated_profile: bool,
+                              environment: Optional[Dict[str, str]], label: str = '',
+                              asset_cache_directory: Optional[str] = None,
+                              asset_cache_mode: str = 'replay_or_record',
+                              command_metrics: Optional[CommandMetrics] = None) -> FinsembleSession:
+    """
+    Launch the Electron application defined by the given Chrome Options as an isolated `FinsembleSession`.
+
+    :param path_to_chromedriver: The path to the location of the chromedriver.exe binary to use. Please note that the
+                                 ChromeDriver version is highly dependent on the underlying version of Finsemble,
+                                 Electron, and Chromium under test. If a version of ChromeDriver is used that does not
+                                 match the underlying Chromium <--> Electron <--> Finsemble under test, then Selenium
+                                 will fail to start and this method will raise an exception.
+                                 E.g.: "%UserProfile%/Dev/Utils/WebDrivers/chromedriver_78/win32/chromedriver.exe"
+    :type path_to_chromedriver: str
+
+    :param chrome_options: A set of Chrome Options that define how to launch the desired Electron application.
+    :type chrome_options: ChromeOptions
+
+    :param isolated_profile: Whether or not to launch Finsemble with its own temporary user-data directory (which is
+                             removed again when the session quits), so that it shares no local state with any other
+                             instance of Finsemble on this machine.
+    :type isolated_profile: bool
+
+    :param environment: Additional environment variables to launch ChromeDriver (and thus, Finsemble) with. These are
+                        passed to the child process only - the environment of this process is left untouched.
+    :type environment: Optional[Dict[str, str]]
+
+    :param label: A label to identify this launch by in its `StartupTimeline`, e.g. "from_src".
+    :type label: str
+
+    :param asset_cache_directory: If provided, the directory of the asset cache to serve requests from.
+    :type asset_cache_directory: Optional[str]
+
+    :param asset_cache_mode: How to use the asset cache, as one of `ASSET_CACHE_MODES`.
+    :type asset_cache_mode: str
+
+    :param command_metrics: The metrics to record the latency of every WebDriver command to. Defaults to new metrics
+                            that are only kept in memory.
+    :type command_metrics: Optional[CommandMetrics]
+
+    :return: A `FinsembleSession` that is hooked into the newly-launched Electron application under test.
+    :rtype: FinsembleSession
+    """
+
+    startup_timeline = StartupTimeline(label)
+    debugging_port = _reserve_free_debugging_port()
+    user_data_dir = tempfile.mkdtemp(prefix='finsemble-selenium-') if isolated_profile else None
+    asset_cache = AssetCache(asset_cache_directory) if asset_cache_directory else None
+    asset_cache_interceptor = AssetCacheInterceptor(asset_cache, asset_cache_mode) if asset_cache else None
+    # Stands in for local servers when replaying, for the requests (e.g. the manifest) that can't be intercepted.
+    asset_cache_server = AssetCacheServer(asset_cache) if asset_cache and asset_cache_mode != 'record' else None
+
+    def _clean_up() -> None:
+        if asset_cache_interceptor:
+            asset_cache_interceptor.close()
+        if asset_cache_server:
+            asset_cache_server.close()
+        _release_debugging_port(debugging_port)
+        if user_data_dir:
+            shutil.rmtree(user_data_dir, ignore_errors=True)
+
+    try:
+        if user_data_dir:
+            chrome_options.add_argument(f'--user-data-dir={user_data_dir}')
+        if asset_cache_server:
+            asset_cache_server.start()
+        if asset_cache_interceptor:
+            # Attach as soon as the app starts listening, i.e. while it's still being launched, so that the requests of
+            # the very first windows are intercepted as well.
+            asset_cache_interceptor.attach_when_available(debugging_port)
+        driver = _launch_chromedriver_for_electron_app(path_to_chromedriver, chrome_options, debugging_port,
+                                                       environment, startup_timeline, command_metrics)
+    except Exception:
+        _clean_up()
+        raise
+
+    driver.add_quit_callback(_clean_up)
+    if asset_cache_interceptor:
+        # The app is listening by now, so the interceptor should have attached. If it hasn't, nothing is being served
+        # from (or recorded to) the cache, which shouldn't go unnoticed.
+        try:
+            asset_cache_interceptor.wait_until_attached()
+        except Exception:
+            driver.quit()
+            raise
+    return FinsembleSession(driver, debugging_port, user_data_dir, startup_timeline, asset_cache_interceptor)
+
+
+def _launch_chromedriver_for_electron_app(path_to_chromedriver: str, chrome_options: ChromeOptions,
+                                          debugging_port: int = 9222,
+                                          environment: Optional[Dict[str, str]] = None,
+                                          startup_timeline: Optional[StartupTimeline] = None,
+                                          command_metrics: Optional[CommandMetrics] = None) -> WebDriver:
     """
     Launch the Electron application defined by the given Chrome Options and hook Selenium + ChromeDriver into it.
 
@@ -181,6 +515,21 @@ def _launch_chromedriver_for_electron_app(path_to_chromedriver: str, chrome_opti
     :param chrome_options: A set of Chrome Options that define how to launch the desired Electron application.
     :type chrome_options: ChromeOptions
 
+    :param debugging_port: The remote debugging port to launch the Electron application with.
+    :type debugging_port: int
+
+    :param environment: Additional environment variables to launch ChromeDriver (and thus, the Electron application)
+                        with. These are passed to the child process only.
+    :type environment: Optional[Dict[str, str]]
+
+    :param startup_timeline: The timeline to record the "chromedriver_spawn" and "electron_boot" phases of the launch
+                             to. The timeline is also available afterwards as the driver's `startup_timeline`.
+    :type startup_timeline: Optional[StartupTimeline]
+
+    :param command_metrics: The metrics to record the latency of every WebDriver command to. Defaults to new metrics
+                            that are only kept in memory. Available afterwards as the driver's `command_metrics`.
+    :type command_metrics: Optional[CommandMetrics]
+
     :return: A Selenium WebDriver object that is hooked into the newly-launched Electron application under test.
     :rtype: WebDriver
     """
@@ -189,9 +538,91 @@ def _launch_chromedriver_for_electron_app(path_to_chromedriver: str, chrome_opti
     path_to_chromedriver = path.abspath(path.expandvars(path_to_chromedriver))
 
     # Set any additional ChromeOptions needed to hook Selenium + ChromeDriver into an Electron app.
-    chrome_options.add_argument('--remote-debugging-port=9222')
+    chrome_options.add_argument(f'--remote-debugging-port={debugging_port}')
     chrome_options.add_experimental_option('w3c', False)
 
     # Launch and return the Electron app with Selenium + ChromeDriver hooked into it.
-    driver = webdriver.Chrome(executable_path=path_to_chromedriver, options=chrome_options)
+    service = ChromeService(path_to_chromedriver, env={**environ, **(environment or {})})
+    driver = _ElectronChromeDriver(service, chrome_options, startup_timeline, command_metrics)
     return driver
+
+
+def _reserve_free_debugging_port() -> int:
+    """
+    Ask the OS for a currently-unused TCP port to use as a remote debugging port, making sure it isn't one that has
+    already been handed out to another session launched by this process.
+
+    :return: The reserved port. Release it with `_release_debugging_port()` once the session using it has quit.
+    :rtype: int
+    """
+
+    with _reserved_debugging_ports_lock:
+        while True:
+            with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as probe:
+                probe.bind(('127.0.0.1', 0))
+                port = probe.getsockname()[1]
+            if port not in _reserved_debugging_ports:
+                _reserved_debugging_ports.add(port)
+                return port
+
+
+def _release_debugging_port(port: int) -> None:
+    with _reserved_debugging_ports_lock:
+        _reserved_debugging_ports.discard(port)
+
+
+class _ElectronChromeDriver(webdriver.Chrome):
+    """
+    A Chrome `WebDriver` whose ChromeDriver service is created by the caller, rather than by Selenium. (Selenium v3's
+    `webdriver.Chrome` provides no way to pass environment variables through to ChromeDriver, and thus, to the
+    Electron app it launches.) Callbacks can also be registered to run once the driver quits.
+
+    Launching is recorded to a `StartupTimeline` in two phases: "chromedriver_spawn" (starting the ChromeDriver
+    process) and "electron_boot" (ChromeDriver launching the Electron app & establishing a session with it.)
+
+    The latency of every command sent to ChromeDriver is recorded to `command_metrics` (see `CommandMetrics`), whose
+    sinks are closed once the driver quits. By default, the metrics have no sinks and are only kept in memory.
+    """
+
+    # noinspection PyMissingConstructor
+    def __init__(self, service: ChromeService, chrome_options: ChromeOptions,
+                 startup_timeline: Optional[StartupTimeline] = None,
+                 command_metrics: Optional[CommandMetrics] = None) -> None:
+        # This mirrors `webdriver.Chrome.__init__()`, minus the creation of the service itself.
+        self._quit_callbacks: List[Callable[[], None]] = []
+        self.startup_timeline: StartupTimeline = startup_timeline or StartupTimeline()
+        self.command_metrics: CommandMetrics = command_metrics or CommandMetrics()
+        self.add_quit_callback(self.command_metrics.close)
+        self.service = service
+        # No windows can be counted yet - the Electron app isn't launched until a session is established below.
+        with self.startup_timeline.phase('chromedriver_spawn'):
+            self.service.start()
+
+        try:
+            with self.startup_timeline.phase('electron_boot', lambda: len(self.window_handles)):
+                command_executor = ChromeRemoteConnection(remote_server_addr=self.service.service_url, keep_alive=True)
+                instrument_command_executor(command_executor, self.command_metrics)
+                RemoteWebDriver.__init__(self, command_executor=command_executor,
+                                         desired_capabilities=chrome_options.to_capabilities())
+        except Exception:
+            self.quit()
+            raise
+        self._is_remote = False
+
+    def add_quit_callback(self, callback: Callable[[], None]) -> None:
+        """
+        Register a callback to be invoked after this driver quits and ChromeDriver has been shut down.
+
+        :param callback: The callable to invoke.
+        :type callback: Callable[[], None]
+        """
+
+        self._quit_callbacks.append(callback)
+
+    def quit(self) -> None:
+        try:
+            super().quit()
+        finally:
+            callbacks, self._quit_callbacks = self._quit_callbacks, []
+            for callback in callbacks:
+                callback()
@@ -0,0 +1,337 @@
+from __future__ import annotations
+import json
+import time
+from collections import defaultdict
+from src.performance_metrics import PerformanceMetricsCollector
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, TextIO
+if TYPE_CHECKING:
+    from selenium.webdriver.remote.webdriver import WebDriver
+
+try:
+    import psutil
+except ImportError:
+    # Only needed to track the memory of the application's processes, which is optional.
+    psutil = None
+
+
+# The per-cycle growth, by metric, above which a steadily-growing component is flagged as leaking. `windows` is the
+# number of open windows sharing the component's URL, and `process_rss` the resident memory of every process of the
+# application combined (recorded under the `PROCESS_COMPONENT` component.)
+DEFAULT_GROWTH_THRESHOLDS = {
+    'JSHeapUsedSize': 100 * 1024,
+    'Nodes': 10,
+    'JSEventListeners': 5,
+    'windows': 0.5,
+    'process_rss': 1024 * 1024
+}
+
+PROCESS_COMPONENT = '(process)'
+
+
+class LinearTrend:
+    """
+    An ordinary least-squares fit of `y = slope * x + intercept`, computed online from running means and co-moments
+    (Welford's method, which stays accurate even for large, nearly-constant values such as heap sizes), so that the
+    trend of an arbitrarily long series can be tracked in constant memory.
+    """
+
+    def __init__(self) -> None:
+        self.count: int = 0
+        self.first_value: Optional[float] = None
+        self.last_value: Optional[float] = None
+        self._mean_x: float = 0.0
+        self._mean_y: float = 0.0
+        self._sum_of_squares_x: float = 0.0
+        self._sum_of_squares_y: float = 0.0
+        self._sum_of_products: float = 0.0
+
+    def add(self, x: float, y: float) -> None:
+        self.count += 1
+        if self.first_value is None:
+            self.first_value = y
+        self.last_value = y
+        delta_x = x - self._mean_x
+        delta_y = y - self._mean_y
+        self._mean_x += delta_x / self.count
+        self._mean_y += delta_y / self.count
+        self._sum_of_squares_x += delta_x * (x - self._mean_x)
+        self._sum_of_squares_y += delta_y * (y - self._mean_y)
+        self._sum_of_products += delta_x * (y - self._mean_y)
+
+    @property
+    def slope(self) -> float:
+        if self._sum_of_squares_x <= 0:
+            return 0.0
+        return self._sum_of_products / self._sum_of_squares_x
+
+    @property
+    def intercept(self) -> float:
+        return self._mean_y - self.slope * self._mean_x
+
+    @property
+    def r_squared(self) -> float:
+        """
+        :return: How well the values fit a straight line, from 0 (not at all) to 1 (perfectly.) A constant series
+                 counts as a perfect fit.
+        :rtype: float
+        """
+
+        if self._sum_of_squares_x <= 0:
+            return 0.0
+        if self._sum_of_squares_y <= 0:
+            return 1.0
+        return min(1.0, self._sum_of_products ** 2 / (self._sum_of_squares_x * self._sum_of_squares_y))
+
+    def to_dict(self) -> dict:
+        return {
+            'count': self.count,
+            'slope': self.slope,
+            'intercept': self.intercept,
+            'r_squared': self.r_squared,
+            'first_value': self.first_value,
+            'last_value': self.last_value
+        }
+
+
+class SuspectedLeak:
+    """
+    A metric of a component that grew (close to) linearly, by more than its threshold, per cycle of a soak test.
+    """
+
+    def __init__(self, component: str, metric_name: str, trend: LinearTrend) -> None:
+        self.component: str = component
+        self.metric_name: str = metric_name
+        self.growth_per_cycle: float = trend.slope
+        self.r_squared: float = trend.r_squared
+        self.first_value: Optional[float] = trend.first_value
+        self.last_value: Optional[float] = trend.last_value
+
+    def __str__(self) -> str:
+        return (f'{self.component}: {self.metric_name} grew by {self.growth_per_cycle:,.1f} per cycle '
+                f'(r^2 = {self.r_squared:.2f}; {self.first_value:,.0f} -> {self.last_value:,.0f})')
+
+    def to_dict(self) -> dict:
+        return {
+            'component': self.component,
+            'metric_name': self.metric_name,
+            'growth_per_cycle': self.growth_per_cycle,
+            'r_squared': self.r_squared,
+            'first_value': self.first_value,
+            'last_value': self.last_value
+        }
+
+
+class SoakTestResult:
+    """
+    The trend of every metric of every component over a soak test, and the components suspected of leaking.
+    """
+
+    def __init__(self, cycle_count: int, duration_in_seconds: float, trends: Dict[str, Dict[str, LinearTrend]],
+                 leaks: List[SuspectedLeak]) -> None:
+        self.cycle_count: int = cycle_count
+        self.duration_in_seconds: float = duration_in_seconds
+        self.trends: Dict[str, Dict[str, LinearTrend]] = trends
+        self.leaks: List[SuspectedLeak] = leaks
+
+    def assert_no_leaks(self) -> None:
+        """
+        :raises AssertionError: If any component is suspected of leaking.
+        """
+
+        if self.leaks:
+            raise AssertionError(f'Suspected leaks after {self.cycle_count} cycles:\n  '
+                                 + '\n  '.join(str(leak) for leak in self.leaks))
+
+    def to_dict(self) -> dict:
+        return {
+            'cycle_count': self.cycle_count,
+            'duration_in_seconds': self.duration_in_seconds,
+            'trends': {component: {metric_name: trend.to_dict() for metric_name, trend in metric_trends.items()}
+                       for component, metric_trends in self.trends.items()},
+            'leaks': [leak.to_dict() for leak in self.leaks]
+        }
+
+    def summary(self) -> str:
+        lines = [f'Soak test: {self.cycle_count} cycles in {self.duration_in_seconds:.1f}s, '
+                 f'{len(self.leaks)} suspected leak(s)']
+        lines.extend(f'  {leak}' for leak in self.leaks)
+        return '\n'.join(lines)
+
+
+class SoakTest:
+    """
+    Memory that creeps up over many spawn / close / workspace switch cycles only shows after a long run, and only as a
+    trend - a single before & after comparison is easily thrown off by caching and garbage collection timing.
+
+    A soak test runs a scenario (e.g. spawning and closing a component, or switching workspaces) over and over. After
+    every cycle, it forces a garbage collection in every window, then records the JS heap size, DOM node count and
+    event listener count of every component, along with how many windows of each component are open (and, if
+    requested, the resident memory of the application's processes.) Windows are grouped into components by URL, so
+    that the trend of a component spans every window of it, even as windows are replaced from one cycle to the next.
+
+    The trend of each metric is fitted as it goes (see `LinearTrend`), and a component is suspected of leaking if a
+    metric grows steadily (i.e. fits a straight line well) by more than its threshold per cycle. Every cycle's
+    measurements are appended to a JSON lines file as soon as they're taken, so that nothing but the running trends is
+    held in memory, and a soak that dies hours in still leaves its data behind.
+
+    E.g.:
+        def open_and_close_chart(cycle: int) -> None:
+            ...
+
+        result = SoakTest(driver, open_and_close_chart, 'soak.jsonl').run(500)
+        print(result.summary())
+        result.assert_no_leaks()
+
+    Remote Debugging must be available for the driver. Tracking the memory of the application's processes also
+    requires `psutil` to be installed.
+    """
+
+    def __init__(self, driver: WebDriver, scenario: Callable[[int], None], output_path: Optional[str] = None,
+                 collector: Optional[PerformanceMetricsCollector] = None, track_process_memory: bool = False,
+                 growth_thresholds: Optional[Dict[str, float]] = None, min_r_squared: float = 0.8,
+                 warm_up_cycle_count: int = 1, min_cycle_count: int = 5) -> None:
+        """
+        :param driver: A Selenium `WebDriver` object that is hooked into Finsemble.
+        :type driver: WebDriver
+
+        :param scenario: The scenario to repeat. It's passed the (zero-based) number of the cycle.
+        :type scenario: Callable[[int], None]
+
+        :param output_path: A JSON lines file to append every cycle's measurements (and, finally, the result) to.
+        :type output_path: Optional[str]
+
+        :param collector: The collector to sample metrics with. If not provided, one is created (and closed again once
+                          the soak test finishes.)
+        :type collector: Optional[PerformanceMetricsCollector]
+
+        :param track_process_memory: Whether or not to also record the resident memory of the ChromeDriver process and
+                                     all of its descendants (i.e. the application's processes.) Requires `psutil`.
+        :type track_process_memory: bool
+
+        :param growth_thresholds: The per-cycle growth, by metric, above which a metric is flagged. Merged into
+                                  `DEFAULT_GROWTH_THRESHOLDS`. Metrics without a threshold are recorded, not flagged.
+        :type growth_thresholds: Optional[Dict[str, float]]
+
+        :param min_r_squared: How well a metric's values must fit a straight line to be flagged, from 0 to 1.
+        :type min_r_squared: float
+
+        :param warm_up_cycle_count: How many cycles to leave out of the trends, so that one-off allocations (e.g. the
+                                    first spawn of a component filling caches) aren't mistaken for growth.
+        :type warm_up_cycle_count: int
+
+        :param min_cycle_count: The least number of (post-warm-up) cycles needed to flag anything.
+        :type min_cycle_count: int
+
+        :raises Exception: If process memory is to be tracked, but `psutil` isn't installed.
+        """
+
+        if track_process_memory and psutil is None:
+            raise Exception('psutil must be installed to track process memory.')
+
+        self.scenario: Callable[[int], None] = scenario
+        self.output_path: Optional[str] = output_path
+        self.track_process_memory: bool = track_process_memory
+        self.growth_thresholds: Dict[str, float] = {**DEFAULT_GROWTH_THRESHOLDS, **(growth_thresholds or {})}
+        self.min_r_squared: float = min_r_squared
+        self.warm_up_cycle_count: int = warm_up_cycle_count
+        self.min_cycle_count: int = min_cycle_count
+
+        self._driver: WebDriver = driver
+        self._collector: Optional[PerformanceMetricsCollector] = collector
+
+    def run(self, cycle_count: int) -> SoakTestResult:
+        """
+        Run the scenario the given number of times, measuring every component after each cycle.
+
+        :param cycle_count: The number of times to run the scenario.
+        :type cycle_count: int
+
+        :return: The trends of every component, and those suspected of leaking.
+        :rtype: SoakTestResult
+        """
+
+        owns_collector = self._collector is None
+        collector = self._collector or PerformanceMetricsCollector(self._driver)
+        trends: Dict[str, Dict[str, LinearTrend]] = defaultdict(lambda: defaultdict(LinearTrend))
+        output_file: Optional[TextIO] = open(self.output_path, 'a') if self.output_path else None
+        start_time = time.monotonic()
+
+        try:
+            for cycle in range(cycle_count):
+                self.scenario(cycle)
+                measurements = self._measure(collector)
+                # Measuring doesn't record samples, so the series of closed windows are empty - don't let them pile up.
+                # (If the collector was passed in, any series it recorded itself are kept.)
+                collector.discard_closed_series(empty_only=not owns_collector)
+
+                if cycle >= self.warm_up_cycle_count:
+                    for component, metrics in measurements.items():
+                        for metric_name, value in metrics.items():
+                            trends[component][metric_name].add(cycle, value)
+
+                if output_file:
+                    output_file.write(json.dumps({'cycle': cycle, 'elapsed_in_seconds': time.monotonic() - start_time,
+                                                  'components': measurements}) + '\n')
+                    output_file.flush()
+
+            result = SoakTestResult(cycle_count, time.monotonic() - start_time,
+                                    {component: dict(metric_trends) for component, metric_trends in trends.items()},
+                                    self._find_leaks(trends))
+            if output_file:
+                output_file.write(json.dumps({'result': result.to_dict()}) + '\n')
+            return result
+        finally:
+            if output_file:
+                output_file.close()
+            if owns_collector:
+                collector.close()
+
+    def _measure(self, collector: PerformanceMetricsCollector) -> Dict[str, Dict[str, float]]:
+        """
+        :return: The metrics of every component (summed across its windows), keyed by component URL.
+        :rtype: Dict[str, Dict[str, float]]
+        """
+
+        collector.collect_garbage()
+        # Every measurement needed is returned, and kept only in the running trends; appending them to the windows'
+        # time series as well would grow memory by a sample per window per cycle.
+        samples = collector.sample(record=False)
+
+        measurements: Dict[str, Dict[str, float]] = {}
+        for handle, metrics in samples.items():
+            component = collector.get_series(handle).url
+            component_measurements = measurements.setdefault(component, {'windows': 0})
+            component_measurements['windows'] += 1
+            for metric_name in ('JSHeapUsedSize', 'Nodes', 'JSEventListeners'):
+                component_measurements[metric_name] = component_measurements.get(metric_name, 0.0) + \
+                    metrics.get(metric_name, 0.0)
+
+        if self.track_process_memory:
+            measurements[PROCESS_COMPONENT] = {'process_rss': self._measure_process_memory()}
+        return measurements
+
+    def _measure_process_memory(self) -> float:
+        """
+        :return: The resident memory, in bytes, of the ChromeDriver process and all of its descendants.
+        :rtype: float
+        """
+
+        root_process = psutil.Process(self._driver.service.process.pid)
+        total_rss = 0
+        for process in [root_process] + root_process.children(recursive=True):
+            try:
+                total_rss += process.memory_info().rss
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                continue
+        return total_rss
+
+    def _find_leaks(self, trends: Dict[str, Dict[str, LinearTrend]]) -> List[SuspectedLeak]:
+        leaks = []
+        for component, metric_trends in trends.items():
+            for metric_name, trend in metric_trends.items():
+                threshold = self.growth_thresholds.get(metric_name)
+                if threshold is None or trend.count < self.min_cycle_count:
+                    continue
+                if trend.slope > threshold and trend.r_squared >= self.min_r_squared:
+                    leaks.append(SuspectedLeak(component, metric_name, trend))
+        return sorted(leaks, key=lambda leak: (leak.component, leak.metric_name))
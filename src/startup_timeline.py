@@ -0,0 +1,182 @@
+from __future__ import annotations
+import csv
+import json
+import time
+import uuid
+from contextlib import contextmanager
+from os import path
+from typing import Callable, Iterator, List, Optional
+
+
+class StartupPhase:
+    """
+    A single timed phase of launching Finsemble. Times are in seconds, relative to the start of the launch, as
+    measured by a monotonic clock.
+    """
+
+    def __init__(self, name: str, start_in_seconds: float, end_in_seconds: Optional[float] = None,
+                 window_count: Optional[int] = None, error: Optional[str] = None) -> None:
+        self.name: str = name
+        self.start_in_seconds: float = start_in_seconds
+        self.end_in_seconds: Optional[float] = end_in_seconds
+        self.window_count: Optional[int] = window_count
+        self.error: Optional[str] = error
+
+    @property
+    def duration_in_seconds(self) -> Optional[float]:
+        if self.end_in_seconds is None:
+            return None
+        return self.end_in_seconds - self.start_in_seconds
+
+    def to_dict(self) -> dict:
+        return {
+            'name': self.name,
+            'start_in_seconds': self.start_in_seconds,
+            'end_in_seconds': self.end_in_seconds,
+            'duration_in_seconds': self.duration_in_seconds,
+            'window_count': self.window_count,
+            'error': self.error
+        }
+
+
+class StartupTimeline:
+    """
+    A structured record of where the time went while launching a single instance of Finsemble: spawning ChromeDriver,
+    booting Electron, loading the Finsemble manifest, and discovering the first component (e.g. the Toolbar.) Each
+    phase is timed with a monotonic clock, and the number of windows open at the end of each phase is recorded too.
+
+    Timelines can be exported as JSON or appended to a CSV file (one row per phase), so that startup times can be
+    tracked across runs - e.g. to catch a startup regression after a Finsemble upgrade.
+    """
+
+    CSV_FIELDS = ['launch_id', 'label', 'started_at', 'phase', 'start_in_seconds', 'end_in_seconds',
+                  'duration_in_seconds', 'window_count', 'error']
+
+    def __init__(self, label: str = '') -> None:
+        """
+        :param label: A free-form label to identify this launch by in exported records, e.g. "from_src".
+        :type label: str
+        """
+
+        self.launch_id: str = uuid.uuid4().hex
+        self.label: str = label
+        # The wall-clock start time, purely so that exported records can be placed on a dashboard's time axis. All of
+        # the phase timings themselves are measured with the monotonic clock.
+        self.started_at: float = time.time()
+        self.phases: List[StartupPhase] = []
+        self._monotonic_start: float = time.monotonic()
+
+    @property
+    def total_duration_in_seconds(self) -> float:
+        """
+        :return: The time from the start of the launch to the end of the latest phase that has finished.
+        :rtype: float
+        """
+
+        return max((phase.end_in_seconds for phase in self.phases if phase.end_in_seconds is not None), default=0.0)
+
+    def elapsed(self) -> float:
+        """
+        :return: The time, in seconds, since the start of the launch.
+        :rtype: float
+        """
+
+        return time.monotonic() - self._monotonic_start
+
+    @contextmanager
+    def phase(self, name: str, count_windows: Optional[Callable[[], int]] = None) -> Iterator[StartupPhase]:
+        """
+        Time the body of a `with` block as a phase of the launch.
+
+        :param name: The name of the phase, e.g. "electron_boot".
+        :type name: str
+
+        :param count_windows: A callable returning the number of windows currently open, which is invoked once the
+                              phase ends. (Failures to count windows are ignored.)
+        :type count_windows: Optional[Callable[[], int]]
+        """
+
+        startup_phase = StartupPhase(name, self.elapsed())
+        self.phases.append(startup_phase)
+        try:
+            yield startup_phase
+        except BaseException as e:
+            startup_phase.error = f'{type(e).__name__}: {e}'
+            raise
+        finally:
+            startup_phase.end_in_seconds = self.elapsed()
+            if count_windows is not None and startup_phase.window_count is None:
+                try:
+                    startup_phase.window_count = count_windows()
+                except Exception:
+                    pass
+
+    def get_phase(self, name: str) -> Optional[StartupPhase]:
+        return next((phase for phase in self.phases if phase.name == name), None)
+
+    def to_dict(self) -> dict:
+        return {
+            'launch_id': self.launch_id,
+            'label': self.label,
+            'started_at': self.started_at,
+            'total_duration_in_seconds': self.total_duration_in_seconds,
+            'phases': [phase.to_dict() for phase in self.phases]
+        }
+
+    def to_json(self, path_to_json: Optional[str] = None) -> str:
+        """
+        Export this timeline as JSON.
+
+        :param path_to_json: A file to write the JSON to, if any.
+        :type path_to_json: Optional[str]
+
+        :return: The JSON representation of this timeline.
+        :rtype: str
+        """
+
+        timeline_json = json.dumps(self.to_dict(), indent=2)
+        if path_to_json:
+            with open(path_to_json, 'w') as json_file:
+                json_file.write(timeline_json)
+        return timeline_json
+
+    def append_to_csv(self, path_to_csv: str) -> None:
+        """
+        Append one row per phase of this timeline to a CSV file, writing the header first if the file is new. Appending
+        every launch to the same file builds up a history that can be loaded straight into a dashboard.
+
+        :param path_to_csv: The CSV file to append to.
+        :type path_to_csv: str
+        """
+
+        is_new_file = not path.exists(path_to_csv) or path.getsize(path_to_csv) == 0
+        with open(path_to_csv, 'a', newline='') as csv_file:
+            writer = csv.DictWriter(csv_file, fieldnames=StartupTimeline.CSV_FIELDS)
+            if is_new_file:
+                writer.writeheader()
+            for phase in self.phases:
+                writer.writerow({
+                    'launch_id': self.launch_id,
+                    'label': self.label,
+                    'started_at': self.started_at,
+                    'phase': phase.name,
+                    'start_in_seconds': phase.start_in_seconds,
+                    'end_in_seconds': phase.end_in_seconds,
+                    'duration_in_seconds': phase.duration_in_seconds,
+                    'window_count': phase.window_count,
+                    'error': phase.error
+                })
+
+    def summary(self) -> str:
+        """
+        :return: A human-readable, one-line-per-phase summary of this timeline.
+        :rtype: str
+        """
+
+        lines = [f'Startup timeline ({self.label or self.launch_id}): {self.total_duration_in_seconds:.2f}s']
+        for phase in self.phases:
+            duration = f'{phase.duration_in_seconds:.2f}s' if phase.duration_in_seconds is not None else '-'
+            window_count = phase.window_count if phase.window_count is not None else '-'
+            lines.append(f'  {phase.name:<28} +{phase.start_in_seconds:>7.2f}s  {duration:>8}  windows: {window_count}'
+                         + (f'  ({phase.error})' if phase.error else ''))
+        return '\n'.join(lines)
@@ -0,0 +1,171 @@
+from __future__ import annotations
+import fnmatch
+import re
+from collections import deque
+from typing import Dict, Iterable, List, Pattern, Set, Union
+
+
+class UrlPattern:
+    """
+    A single URL pattern to search for among the pages visible to Selenium. Three forms are supported:
+    - "substring": Matches any URL containing the pattern, case-insensitively. (The same "partial" matching used by
+      `FinsembleComponentDiscoverer.get_selenium_handle_of_page_containing_url()`.)
+    - "regex": Matches any URL that the regular expression can be found in, via `re.search()`.
+    - "glob": Matches any URL that the shell-style wildcard pattern matches in its entirety, case-insensitively.
+      E.g.: "*/components/toolbar/*.html"
+
+    Plain strings and compiled regular expressions can be used anywhere a `UrlPattern` is accepted, and are treated
+    as "substring" and "regex" patterns respectively.
+    """
+
+    SUBSTRING = 'substring'
+    REGEX = 'regex'
+    GLOB = 'glob'
+
+    def __init__(self, pattern: Union[str, Pattern], kind: str = SUBSTRING) -> None:
+        if kind not in (UrlPattern.SUBSTRING, UrlPattern.REGEX, UrlPattern.GLOB):
+            raise ValueError(f'Unknown URL pattern kind "{kind}".')
+        self.pattern: Union[str, Pattern] = pattern
+        self.kind: str = kind
+
+    @classmethod
+    def substring(cls, pattern: str) -> UrlPattern:
+        return cls(pattern, UrlPattern.SUBSTRING)
+
+    @classmethod
+    def regex(cls, pattern: Union[str, Pattern]) -> UrlPattern:
+        return cls(pattern, UrlPattern.REGEX)
+
+    @classmethod
+    def glob(cls, pattern: str) -> UrlPattern:
+        return cls(pattern, UrlPattern.GLOB)
+
+    @classmethod
+    def coerce(cls, pattern: Union[str, Pattern, UrlPattern]) -> UrlPattern:
+        """
+        Convert a plain string, compiled regular expression, or `UrlPattern` into a `UrlPattern`.
+
+        :param pattern: The pattern to convert.
+        :type pattern: Union[str, Pattern, UrlPattern]
+
+        :return: The equivalent `UrlPattern`.
+        :rtype: UrlPattern
+        """
+
+        if isinstance(pattern, UrlPattern):
+            return pattern
+        if isinstance(pattern, str):
+            return cls.substring(pattern)
+        return cls.regex(pattern)
+
+    def to_regex(self) -> Pattern:
+        """
+        :return: A compiled regular expression that can be `search()`-ed against a URL to evaluate this pattern.
+        :rtype: Pattern
+        """
+
+        if self.kind == UrlPattern.SUBSTRING:
+            return re.compile(re.escape(self.pattern), re.IGNORECASE)
+        if self.kind == UrlPattern.GLOB:
+            return re.compile(fnmatch.translate(self.pattern), re.IGNORECASE)
+        return re.compile(self.pattern) if isinstance(self.pattern, str) else self.pattern
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, UrlPattern) and (self.kind, self.pattern) == (other.kind, other.pattern)
+
+    def __hash__(self) -> int:
+        return hash((self.kind, self.pattern))
+
+    def __repr__(self) -> str:
+        return f'UrlPattern.{self.kind}({self.pattern!r})'
+
+
+class UrlMatcher:
+    """
+    Evaluates many URL patterns against a URL in a single pass, rather than scanning the URL once per pattern.
+
+    All of the "substring" patterns are compiled into one Aho-Corasick automaton, so the cost of matching a URL
+    against them is proportional to the length of the URL (plus the number of matches), no matter how many substring
+    patterns there are. The (typically few) "regex" and "glob" patterns are compiled once up-front and evaluated
+    individually.
+
+    Further reading: https://en.wikipedia.org/wiki/Aho%E2%80%93Corasick_algorithm
+    """
+
+    def __init__(self, patterns: Iterable[Union[str, Pattern, UrlPattern]]) -> None:
+        """
+        :param patterns: The patterns to match URLs against. The index of each pattern within this collection is what
+                         `match()` reports back.
+        :type patterns: Iterable[Union[str, Pattern, UrlPattern]]
+        """
+
+        self.patterns: List[UrlPattern] = [UrlPattern.coerce(pattern) for pattern in patterns]
+
+        # Aho-Corasick automaton over the lower-cased substring patterns. Each state has a dictionary of transitions,
+        # a failure link, and the set of pattern indices that are matched upon reaching it.
+        self._transitions: List[Dict[str, int]] = [{}]
+        self._failure_links: List[int] = [0]
+        self._outputs: List[Set[int]] = [set()]
+
+        self._compiled_regexes: List[tuple] = []
+
+        for index, pattern in enumerate(self.patterns):
+            if pattern.kind == UrlPattern.SUBSTRING:
+                self._add_to_automaton(pattern.pattern.lower(), index)
+            else:
+                self._compiled_regexes.append((index, pattern.to_regex()))
+        self._build_failure_links()
+
+    def match(self, url: str) -> Set[int]:
+        """
+        Find every pattern that matches the given URL.
+
+        :param url: The URL to match.
+        :type url: str
+
+        :return: The indices (within `patterns`) of every pattern that matches the URL.
+        :rtype: Set[int]
+        """
+
+        matched_indices = set(self._outputs[0])
+
+        state = 0
+        for character in url.lower():
+            while state and character not in self._transitions[state]:
+                state = self._failure_links[state]
+            state = self._transitions[state].get(character, 0)
+            if self._outputs[state]:
+                matched_indices |= self._outputs[state]
+
+        for index, compiled_regex in self._compiled_regexes:
+            if compiled_regex.search(url):
+                matched_indices.add(index)
+
+        return matched_indices
+
+    def _add_to_automaton(self, keyword: str, index: int) -> None:
+        state = 0
+        for character in keyword:
+            next_state = self._transitions[state].get(character)
+            if next_state is None:
+                next_state = len(self._transitions)
+                self._transitions.append({})
+                self._failure_links.append(0)
+                self._outputs.append(set())
+                self._transitions[state][character] = next_state
+            state = next_state
+        self._outputs[state].add(index)
+
+    def _build_failure_links(self) -> None:
+        # Breadth-first, so that each state's failure link is always resolved before any of its children's.
+        queue = deque(self._transitions[0].values())
+        while queue:
+            state = queue.popleft()
+            for character, next_state in self._transitions[state].items():
+                queue.append(next_state)
+                failure_state = self._failure_links[state]
+                while failure_state and character not in self._transitions[failure_state]:
+                    failure_state = self._failure_links[failure_state]
+                fallback_state = self._transitions[failure_state].get(character, 0)
+                self._failure_links[next_state] = fallback_state if fallback_state != next_state else 0
+                self._outputs[next_state] |= self._outputs[self._failure_links[next_state]]
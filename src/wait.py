@@ -1,11 +1,361 @@
+from __future__ import annotations
+import random
 import time
-from typing import Callable
+from threading import Lock
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
 
 
-def wait_until(predicate: Callable, timeout_in_seconds: int, *args, **kwargs):
+class BackoffPolicy:
+    """
+    Determines how long to sleep between successive polls of a predicate.
+
+    The first retry happens after `initial_delay_in_seconds` (by default, immediately - many conditions become true
+    within a few milliseconds, e.g. a window that is already in the middle of loading), and each subsequent delay grows
+    by `multiplier` until it reaches `max_delay_in_seconds`. Each delay is randomly adjusted by up to `jitter` (as a
+    fraction of the delay) so that many concurrent waits don't all poll in lock-step.
+    """
+
+    def __init__(self, initial_delay_in_seconds: float = 0.0, first_backoff_in_seconds: float = 0.01,
+                 multiplier: float = 2.0, max_delay_in_seconds: float = 0.25, jitter: float = 0.1) -> None:
+        """
+        :param initial_delay_in_seconds: The delay before the first retry. `0` retries immediately.
+        :type initial_delay_in_seconds: float
+
+        :param first_backoff_in_seconds: The delay before the second retry, from which all later delays grow.
+        :type first_backoff_in_seconds: float
+
+        :param multiplier: The factor by which each delay grows over the one before it. `1` results in a fixed delay.
+        :type multiplier: float
+
+        :param max_delay_in_seconds: The cap on any single delay.
+        :type max_delay_in_seconds: float
+
+        :param jitter: The maximum random adjustment applied to each delay, as a fraction of that delay. `0` disables
+                       jitter.
+        :type jitter: float
+        """
+
+        self.initial_delay_in_seconds: float = initial_delay_in_seconds
+        self.first_backoff_in_seconds: float = first_backoff_in_seconds
+        self.multiplier: float = multiplier
+        self.max_delay_in_seconds: float = max_delay_in_seconds
+        self.jitter: float = jitter
+
+    @classmethod
+    def fixed(cls, delay_in_seconds: float) -> BackoffPolicy:
+        """
+        :return: A policy that always sleeps for the same amount of time between polls, without jitter.
+        :rtype: BackoffPolicy
+        """
+
+        return cls(delay_in_seconds, delay_in_seconds, 1.0, delay_in_seconds, 0.0)
+
+    def delays(self) -> Iterator[float]:
+        """
+        :return: An endless sequence of delays, in seconds, to sleep between each successive poll.
+        :rtype: Iterator[float]
+        """
+
+        yield self._apply_jitter(self.initial_delay_in_seconds)
+        delay = self.first_backoff_in_seconds
+        while True:
+            yield self._apply_jitter(min(delay, self.max_delay_in_seconds))
+            delay *= self.multiplier
+
+    def _apply_jitter(self, delay: float) -> float:
+        if not self.jitter or not delay:
+            return delay
+        return max(0.0, delay * (1 + random.uniform(-self.jitter, self.jitter)))
+
+
+# The policy used by every wait that doesn't specify its own.
+DEFAULT_BACKOFF_POLICY = BackoffPolicy()
+
+
+class Deadline:
+    """
+    A fixed point in (monotonic) time by which some unit of work must be finished.
+
+    Unlike a plain timeout, a deadline can be shared: when one wait is made up of several smaller waits, each of them
+    can draw down the same deadline (or a tighter `child()` of it), so that the total time spent never exceeds the
+    overall budget, no matter how it's divided up.
+    """
+
+    def __init__(self, timeout_in_seconds: Optional[float] = None, _end_time: Optional[float] = None) -> None:
+        """
+        :param timeout_in_seconds: The time, in seconds, from now until the deadline expires. `None` never expires.
+        :type timeout_in_seconds: Optional[float]
+        """
+
+        if _end_time is not None:
+            self.end_time: float = _end_time
+        elif timeout_in_seconds is None:
+            self.end_time = float('inf')
+        else:
+            self.end_time = time.monotonic() + timeout_in_seconds
+
+    @property
+    def remaining(self) -> float:
+        """
+        :return: The time, in seconds, left before the deadline expires. (Never negative.)
+        :rtype: float
+        """
+
+        return max(0.0, self.end_time - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        """
+        :return: True if the deadline has passed; False otherwise.
+        :rtype: bool
+        """
+
+        return time.monotonic() >= self.end_time
+
+    def child(self, timeout_in_seconds: Optional[float] = None) -> Deadline:
+        """
+        Create a nested deadline that expires after the given timeout, or when this deadline expires, whichever comes
+        first.
+
+        :param timeout_in_seconds: The time, in seconds, from now until the nested deadline expires. `None` inherits
+                                   this deadline as-is.
+        :type timeout_in_seconds: Optional[float]
+
+        :return: The nested deadline.
+        :rtype: Deadline
+        """
+
+        if timeout_in_seconds is None:
+            return Deadline(_end_time=self.end_time)
+        return Deadline(_end_time=min(self.end_time, time.monotonic() + timeout_in_seconds))
+
+    def __repr__(self) -> str:
+        return f'Deadline(remaining={self.remaining:.3f}s)'
+
+
+class WaitStatistics:
+    """
+    Aggregated statistics about every wait made under a given name: how many times it has waited, how often it
+    succeeded vs. timed out, how many polls it took, and how long it took to succeed.
+    """
+
+    def __init__(self, name: str) -> None:
+        self.name: str = name
+        self.wait_count: int = 0
+        self.timeout_count: int = 0
+        self.poll_count: int = 0
+        self.total_time_in_seconds: float = 0.0
+        self.max_time_in_seconds: float = 0.0
+
+    @property
+    def mean_time_in_seconds(self) -> float:
+        return self.total_time_in_seconds / self.wait_count if self.wait_count else 0.0
+
+    @property
+    def mean_poll_count(self) -> float:
+        return self.poll_count / self.wait_count if self.wait_count else 0.0
+
+    def to_dict(self) -> dict:
+        return {
+            'name': self.name,
+            'wait_count': self.wait_count,
+            'timeout_count': self.timeout_count,
+            'poll_count': self.poll_count,
+            'total_time_in_seconds': self.total_time_in_seconds,
+            'mean_time_in_seconds': self.mean_time_in_seconds,
+            'max_time_in_seconds': self.max_time_in_seconds
+        }
+
+
+class WaitStatisticsRecorder:
+    """
+    Collects `WaitStatistics` for every named wait, so that the slowest waits in a test run can be found.
+    All waits report to the module-level `wait_statistics` recorder.
+    """
+
+    def __init__(self) -> None:
+        self._statistics: Dict[str, WaitStatistics] = {}
+        self._lock: Lock = Lock()
+
+    def record(self, name: str, poll_count: int, elapsed_time_in_seconds: float, succeeded: bool) -> None:
+        with self._lock:
+            statistics = self._statistics.get(name)
+            if statistics is None:
+                statistics = self._statistics[name] = WaitStatistics(name)
+            statistics.wait_count += 1
+            statistics.poll_count += poll_count
+            statistics.total_time_in_seconds += elapsed_time_in_seconds
+            statistics.max_time_in_seconds = max(statistics.max_time_in_seconds, elapsed_time_in_seconds)
+            if not succeeded:
+                statistics.timeout_count += 1
+
+    def get_statistics(self) -> List[WaitStatistics]:
+        """
+        :return: The statistics of every named wait, slowest (by total time spent waiting) first.
+        :rtype: List[WaitStatistics]
+        """
+
+        with self._lock:
+            return sorted(self._statistics.values(), key=lambda statistics: statistics.total_time_in_seconds,
+                          reverse=True)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._statistics.clear()
+
+    def summary(self, limit: int = 10) -> str:
+        """
+        :return: A human-readable table of the slowest named waits.
+        :rtype: str
+        """
+
+        lines = [f'{"wait":<60} {"count":>6} {"timeouts":>8} {"polls/wait":>10} {"mean (s)":>9} {"max (s)":>8}']
+        for statistics in self.get_statistics()[:limit]:
+            lines.append(f'{statistics.name[:60]:<60} {statistics.wait_count:>6} {statistics.timeout_count:>8} '
+                         f'{statistics.mean_poll_count:>10.1f} {statistics.mean_time_in_seconds:>9.3f} '
+                         f'{statistics.max_time_in_seconds:>8.3f}')
+        return '\n'.join(lines)
+
+
+wait_statistics = WaitStatisticsRecorder()
+
+
+def wait_for(predicate: Callable[[], Any], timeout_in_seconds: Optional[float] = None,
+             deadline: Optional[Deadline] = None, backoff: Optional[BackoffPolicy] = None,
+             name: Optional[str] = None) -> Any:
+    """
+    Repeatedly call and wait for the specified callable predicate to return a "truth-y" value, sleeping between polls
+    according to the given backoff policy.
+
+    :param predicate: A callable, accepting no arguments, that you wish to wait on. This will be called repeatedly
+                      until it returns a "truth-y" value, which is then immediately returned.
+    :type predicate: Callable[[], Any]
+
+    :param timeout_in_seconds: The maximum time, in seconds, to wait. If a `deadline` is also given, whichever expires
+                               first applies.
+    :type timeout_in_seconds: Optional[float]
+
+    :param deadline: A shared deadline to draw this wait down from.
+    :type deadline: Optional[Deadline]
+
+    :param backoff: The policy determining how long to sleep between polls. Defaults to `DEFAULT_BACKOFF_POLICY`.
+    :type backoff: Optional[BackoffPolicy]
+
+    :param name: The name to record this wait's statistics under. Defaults to the predicate's qualified name.
+    :type name: Optional[str]
+
+    :return: The return value of the given callable predicate once it resolves to a "truth-y" value.
+
+    :raises TimeoutError: If the given callable predicate does not resolve to a "truth-y" value before the timeout
+                          or deadline elapses.
+    """
+
+    index_and_result = wait_any([predicate], timeout_in_seconds, deadline, backoff,
+                                name or _get_predicate_name(predicate))
+    return index_and_result[1]
+
+
+def wait_any(predicates: Sequence[Callable[[], Any]], timeout_in_seconds: Optional[float] = None,
+             deadline: Optional[Deadline] = None, backoff: Optional[BackoffPolicy] = None,
+             name: Optional[str] = None) -> Tuple[int, Any]:
+    """
+    Poll several predicates within a single loop, and wait for any one of them to return a "truth-y" value.
+
+    Like `wait_until()`, every predicate is guaranteed to be called at least twice before timing out. (Handle cases in
+    which the duration to execute the predicates is longer than the allotted timeout.)
+
+    :param predicates: The callables, each accepting no arguments, to wait on. They're called in order on every poll.
+    :type predicates: Sequence[Callable[[], Any]]
+
+    :param timeout_in_seconds: The maximum time, in seconds, to wait. If a `deadline` is also given, whichever expires
+                               first applies.
+    :type timeout_in_seconds: Optional[float]
+
+    :param deadline: A shared deadline to draw this wait down from.
+    :type deadline: Optional[Deadline]
+
+    :param backoff: The policy determining how long to sleep between polls. Defaults to `DEFAULT_BACKOFF_POLICY`.
+    :type backoff: Optional[BackoffPolicy]
+
+    :param name: The name to record this wait's statistics under. Defaults to the predicates' qualified names.
+    :type name: Optional[str]
+
+    :return: The index (within `predicates`) of the first predicate found to return a "truth-y" value, along with
+             that value.
+    :rtype: Tuple[int, Any]
+
+    :raises TimeoutError: If none of the predicates resolve to a "truth-y" value before the timeout or deadline
+                          elapses.
+    """
+
+    name = name or ' | '.join(_get_predicate_name(predicate) for predicate in predicates)
+    found = {}
+
+    def _poll() -> bool:
+        for index, predicate in enumerate(predicates):
+            result = predicate()
+            if bool(result):
+                found['result'] = (index, result)
+                return True
+        return False
+
+    _poll_until(_poll, timeout_in_seconds, deadline, backoff, name)
+    return found['result']
+
+
+def wait_all(predicates: Sequence[Callable[[], Any]], timeout_in_seconds: Optional[float] = None,
+             deadline: Optional[Deadline] = None, backoff: Optional[BackoffPolicy] = None,
+             name: Optional[str] = None) -> List[Any]:
+    """
+    Poll several predicates within a single loop, and wait for every one of them to return a "truth-y" value. Once a
+    predicate has returned a "truth-y" value, it is not called again.
+
+    :param predicates: The callables, each accepting no arguments, to wait on.
+    :type predicates: Sequence[Callable[[], Any]]
+
+    :param timeout_in_seconds: The maximum time, in seconds, to wait. If a `deadline` is also given, whichever expires
+                               first applies.
+    :type timeout_in_seconds: Optional[float]
+
+    :param deadline: A shared deadline to draw this wait down from.
+    :type deadline: Optional[Deadline]
+
+    :param backoff: The policy determining how long to sleep between polls. Defaults to `DEFAULT_BACKOFF_POLICY`.
+    :type backoff: Optional[BackoffPolicy]
+
+    :param name: The name to record this wait's statistics under. Defaults to the predicates' qualified names.
+    :type name: Optional[str]
+
+    :return: The "truth-y" value returned by each predicate, in the same order as `predicates`.
+    :rtype: List[Any]
+
+    :raises TimeoutError: If any of the predicates have not resolved to a "truth-y" value before the timeout or
+                          deadline elapses.
+    """
+
+    name = name or ' & '.join(_get_predicate_name(predicate) for predicate in predicates)
+    results = {}
+
+    def _poll() -> bool:
+        for index, predicate in enumerate(predicates):
+            if index in results:
+                continue
+            result = predicate()
+            if bool(result):
+                results[index] = result
+        return len(results) == len(predicates)
+
+    _poll_until(_poll, timeout_in_seconds, deadline, backoff, name)
+    return [results[index] for index in range(len(predicates))]
+
+
+def wait_until(predicate: Callable, timeout_in_seconds: float, *args, **kwargs):
     """
     Repeatedly call and wait for the specified callable predicate to return a "truth-y" value.
 
+    Polls are spaced out according to `DEFAULT_BACKOFF_POLICY`, and the wait's statistics are recorded under the
+    predicate's qualified name. (Use `wait_for()` directly for control over the deadline, backoff policy, or name.)
+
     :param predicate: A callable method or function that you wish to wait on. This method will be called repeatedly.
                       If the result resolves to a "false-y" value, then the method will continue to be called.
                       If the result resolves to a "truth-y" value, then the result of the predicate will be
@@ -14,7 +364,7 @@ def wait_until(predicate: Callable, timeout_in_seconds: int, *args, **kwargs):
 
     :param timeout_in_seconds: The maximum time, in seconds, to wait for the specified predicate to eventually
                                return a "truth-y" value.
-    :type timeout_in_seconds: int
+    :type timeout_in_seconds: float
 
     :param args: Arbitrary non-keyworded args to pass into the callable predicate when it is invoked.
 
@@ -26,19 +376,46 @@ def wait_until(predicate: Callable, timeout_in_seconds: int, *args, **kwargs):
                           timeout elapses.
     """
 
-    # Invoke the method once first before starting any countdown, to guarantee that we can call the method at
-    # least twice before timing out with an error.
+    return wait_for(lambda: predicate(*args, **kwargs), timeout_in_seconds=timeout_in_seconds,
+                    name=_get_predicate_name(predicate))
+
+
+def _poll_until(poll: Callable[[], bool], timeout_in_seconds: Optional[float], deadline: Optional[Deadline],
+                backoff: Optional[BackoffPolicy], name: str) -> None:
+    """
+    The polling loop shared by every type of wait: call `poll` until it returns True, sleeping between calls per the
+    backoff policy (but never past the deadline), and record the outcome to `wait_statistics`.
+    """
+
+    start_time = time.monotonic()
+    poll_count = 0
+
+    def _record(succeeded: bool) -> None:
+        wait_statistics.record(name, poll_count, time.monotonic() - start_time, succeeded)
+
+    # Invoke the poll once first before starting any countdown, to guarantee that we can call it at least twice before
+    # timing out with an error.
     # (Handle cases in which the duration to execute the given predicate is longer than the allotted timeout.)
-    result = predicate(*args, **kwargs)
-    if bool(result):
-        return result
-
-    # Begin to repeatedly invoke the predicate within a countdown.
-    end_time = time.time() + timeout_in_seconds
-    while time.time() < end_time:
-        result = predicate(*args, **kwargs)
-        if bool(result):
-            return result
-        else:
-            time.sleep(0.25)
+    poll_count += 1
+    if poll():
+        _record(True)
+        return
+
+    # Begin to repeatedly invoke the poll within a countdown.
+    deadline = (deadline or Deadline()).child(timeout_in_seconds)
+    for delay in (backoff or DEFAULT_BACKOFF_POLICY).delays():
+        if deadline.expired:
+            break
+        if delay:
+            time.sleep(min(delay, deadline.remaining))
+        poll_count += 1
+        if poll():
+            _record(True)
+            return
+
+    _record(False)
     raise TimeoutError()
+
+
+def _get_predicate_name(predicate: Callable) -> str:
+    return getattr(predicate, '__qualname__', None) or repr(predicate)
@@ -0,0 +1,205 @@
+from __future__ import annotations
+import base64
+import json
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from src.finsemble_component_discoverer import FinsembleComponentDiscoverer
+from typing import TYPE_CHECKING, Callable, List, Optional
+if TYPE_CHECKING:
+    from selenium.webdriver.remote.webdriver import WebDriver
+
+
+class WindowCapture:
+    """
+    The screenshot & DOM snapshot taken of a single window, as written to disk by `WindowCapturer.capture_all()`.
+    Paths are `None` for anything that wasn't captured, in which case `error` says why.
+    """
+
+    def __init__(self, handle: str, url: str, title: str) -> None:
+        self.handle: str = handle
+        self.url: str = url
+        self.title: str = title
+        self.screenshot_path: Optional[str] = None
+        self.dom_path: Optional[str] = None
+        self.duration_in_seconds: Optional[float] = None
+        self.error: Optional[str] = None
+
+    def to_dict(self) -> dict:
+        return {
+            'handle': self.handle,
+            'url': self.url,
+            'title': self.title,
+            'screenshot_path': self.screenshot_path,
+            'dom_path': self.dom_path,
+            'duration_in_seconds': self.duration_in_seconds,
+            'error': self.error
+        }
+
+
+class WindowCapturer:
+    """
+    When a test fails, a screenshot of every window (not just the focused one) is usually what's needed to make sense
+    of it - but with Selenium alone, that means switching into each window in turn and taking screenshots one at a
+    time, which takes many seconds with dozens of windows open, and disturbs the very focus state being debugged.
+
+    This class instead opens a DevTools connection to every window at once, and captures each window's screenshot
+    (`Page.captureScreenshot`) and DOM (`document.documentElement.outerHTML`) over its own connection, in parallel.
+    Each file is written to disk as soon as it arrives, so no more than a handful of captures are held in memory at
+    once, and Selenium's focused window is left untouched. A `manifest.json` listing every capture is written last.
+
+    E.g. to capture every window when a pytest test fails:
+        @pytest.hookimpl(hookwrapper=True)
+        def pytest_runtest_makereport(item, call):
+            report = (yield).get_result()
+            if report.failed:
+                WindowCapturer(driver).capture_all(f'failures/{item.name}')
+
+    If Remote Debugging is not available, windows are instead visited one by one with Selenium (via
+    `WindowFocusManager`, so the previously-focused window is restored afterwards.)
+    """
+
+    def __init__(self, driver: WebDriver, discoverer: Optional[FinsembleComponentDiscoverer] = None,
+                 max_concurrent_captures: int = 8, timeout_in_seconds: float = 10) -> None:
+        """
+        :param driver: A Selenium `WebDriver` object that is hooked into Finsemble.
+        :type driver: WebDriver
+
+        :param discoverer: The discoverer to list the available pages with. If not provided, one is created (and closed
+                           again once each capture finishes.)
+        :type discoverer: Optional[FinsembleComponentDiscoverer]
+
+        :param max_concurrent_captures: The most windows to capture at once.
+        :type max_concurrent_captures: int
+
+        :param timeout_in_seconds: The maximum time, in seconds, to wait for any single window's screenshot or DOM.
+                                   (Windows that are hidden or minimized may never render a screenshot.)
+        :type timeout_in_seconds: float
+        """
+
+        self.max_concurrent_captures: int = max_concurrent_captures
+        self.timeout_in_seconds: float = timeout_in_seconds
+
+        self._driver: WebDriver = driver
+        self._discoverer: Optional[FinsembleComponentDiscoverer] = discoverer
+
+    def capture_all(self, output_directory: str, screenshots: bool = True, dom_snapshots: bool = True,
+                    url_filter: Optional[Callable[[str], bool]] = None) -> List[WindowCapture]:
+        """
+        Capture every open window, writing one file per screenshot / DOM snapshot into the given directory.
+
+        :param output_directory: The directory to write the captures into. Created if it doesn't exist.
+        :type output_directory: str
+
+        :param screenshots: Whether or not to capture a PNG screenshot of each window.
+        :type screenshots: bool
+
+        :param dom_snapshots: Whether or not to capture the serialized DOM (HTML) of each window.
+        :type dom_snapshots: bool
+
+        :param url_filter: If provided, only windows whose URL it returns True for are captured.
+        :type url_filter: Optional[Callable[[str], bool]]
+
+        :return: A record of every window's capture, including those that failed.
+        :rtype: List[WindowCapture]
+        """
+
+        os.makedirs(output_directory, exist_ok=True)
+        discoverer = self._discoverer or FinsembleComponentDiscoverer(self._driver)
+        try:
+            discoverer.invalidate()
+            pages = discoverer.discover_all_available_pages()
+            captures = [WindowCapture(handle, page['url'], page['title']) for handle, page in pages.items()
+                        if url_filter is None or url_filter(page['url'])]
+
+            if discoverer.remote_debugger.is_available:
+                with ThreadPoolExecutor(max_workers=self.max_concurrent_captures) as executor:
+                    for index, capture in enumerate(captures):
+                        executor.submit(self._capture_over_cdp, discoverer, capture,
+                                        os.path.join(output_directory, _get_file_stem(index, capture)),
+                                        screenshots, dom_snapshots)
+            else:
+                self._capture_with_selenium(discoverer, captures, output_directory, screenshots, dom_snapshots)
+        finally:
+            if not self._discoverer:
+                discoverer.close()
+
+        with open(os.path.join(output_directory, 'manifest.json'), 'w') as manifest_file:
+            json.dump([capture.to_dict() for capture in captures], manifest_file, indent=2)
+        return captures
+
+    def _capture_over_cdp(self, discoverer: FinsembleComponentDiscoverer, capture: WindowCapture, file_stem: str,
+                          screenshot: bool, dom_snapshot: bool) -> None:
+        """
+        Capture a single window over its own DevTools connection. (Runs on a worker thread.)
+        """
+
+        start_time = time.monotonic()
+        connection = None
+        try:
+            connection = discoverer.remote_debugger.connect_to_page(capture.handle, self.timeout_in_seconds)
+            # Issue both requests before waiting on either, so that the window works on them back-to-back.
+            screenshot_future = connection.send('Page.captureScreenshot', {'format': 'png'}) if screenshot else None
+            dom_future = connection.evaluate('document.documentElement.outerHTML') if dom_snapshot else None
+
+            if screenshot_future:
+                png_data = base64.b64decode(screenshot_future.result(timeout=self.timeout_in_seconds)['data'])
+                capture.screenshot_path = _write_file(f'{file_stem}.png', png_data)
+            if dom_future:
+                html = dom_future.result(timeout=self.timeout_in_seconds) or ''
+                capture.dom_path = _write_file(f'{file_stem}.html', html.encode('utf-8'))
+        except FutureTimeoutError:
+            capture.error = f'The window did not respond within {self.timeout_in_seconds} seconds.'
+        except Exception as e:
+            # e.g. the window closed before it could be connected to, or a `CdpError`.
+            capture.error = f'{type(e).__name__}: {e}'
+        finally:
+            if connection:
+                connection.close()
+            capture.duration_in_seconds = time.monotonic() - start_time
+
+    def _capture_with_selenium(self, discoverer: FinsembleComponentDiscoverer, captures: List[WindowCapture],
+                               output_directory: str, screenshot: bool, dom_snapshot: bool) -> None:
+        """
+        Capture each window in turn by switching into it with Selenium.
+        """
+
+        def _capture(capture: WindowCapture, file_stem: str) -> None:
+            start_time = time.monotonic()
+            try:
+                if screenshot:
+                    capture.screenshot_path = _write_file(f'{file_stem}.png', self._driver.get_screenshot_as_png())
+                if dom_snapshot:
+                    capture.dom_path = _write_file(f'{file_stem}.html', self._driver.page_source.encode('utf-8'))
+            except Exception as e:
+                capture.error = f'{type(e).__name__}: {e}'
+            finally:
+                capture.duration_in_seconds = time.monotonic() - start_time
+
+        batch = discoverer.focus_manager.batch()
+        for index, capture in enumerate(captures):
+            batch.add(capture.handle, _capture, capture, os.path.join(output_directory, _get_file_stem(index, capture)))
+        batch.run()
+        for capture in captures:
+            if capture.handle in batch.closed_handles:
+                capture.error = 'The window closed before it could be captured.'
+
+
+def _get_file_stem(index: int, capture: WindowCapture) -> str:
+    """
+    :return: A file name (without extension) for the given window's captures that is unique, sorts in discovery order,
+             and is recognizable at a glance, e.g. "03-chartiq-example-app-A1B2C3D4".
+    :rtype: str
+    """
+
+    label = capture.title or capture.url.rstrip('/').rsplit('/', 1)[-1] or 'window'
+    slug = re.sub(r'[^a-z0-9]+', '-', label.lower()).strip('-')[:40] or 'window'
+    target_id = capture.handle[len('CDwindow-'):] if capture.handle.startswith('CDwindow-') else capture.handle
+    return f'{index:02d}-{slug}-{target_id[:8]}'
+
+
+def _write_file(path: str, data: bytes) -> str:
+    with open(path, 'wb') as output_file:
+        output_file.write(data)
+    return path
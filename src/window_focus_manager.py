@@ -0,0 +1,316 @@
+from __future__ import annotations
+from collections import OrderedDict
+from contextlib import contextmanager
+from selenium.common.exceptions import NoSuchWindowException, WebDriverException
+from selenium.webdriver.remote.command import Command
+from threading import Condition, Lock, get_ident
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterator, List, Optional, Set
+if TYPE_CHECKING:
+    from selenium.webdriver.remote.webdriver import WebDriver
+
+
+class WindowFocusManager:
+    """
+    `driver.switch_to.window()` is one of the most frequently issued WebDriver commands when automating a multi-window
+    application like Finsemble, and one of the slowest - yet Selenium keeps no record of which window is focused, so
+    helpers tend to switch "just in case", even into the window that is already focused.
+
+    This class keeps track of the focused window of a driver, and skips every switch into the window that is already
+    focused. `in_window()` switches into a window for the duration of a `with` block and restores the previous focus
+    afterwards, and `batch()` groups operations by window, so that each window is only switched into once no matter how
+    many operations were queued for it.
+
+    There is one focus manager per driver (see `for_driver()`), shared by every helper in this project. It observes the
+    "switchToWindow" & "close" commands sent by the driver's command executor, so it stays accurate even when test code
+    switches windows directly through `driver.switch_to.window()`. (`detach()` stops observing again.)
+
+    Only one thread at a time may own the driver's focus, i.e. be within an `in_window()` block or a batch, or be in
+    the middle of a `switch_to()`. Other threads wait for ownership only when they need to move the focus themselves;
+    reading `current_handle` never waits.
+    """
+
+    _focus_managers_lock: Lock = Lock()
+
+    def __init__(self, driver: WebDriver) -> None:
+        """
+        Use `for_driver()` instead, so that every helper shares the same view of the driver's focus.
+
+        :param driver: A Selenium `WebDriver` object.
+        :type driver: WebDriver
+        """
+
+        self.switch_count: int = 0
+        self.skipped_switch_count: int = 0
+
+        self._driver: WebDriver = driver
+        # Guards the tracked state below; never held while a WebDriver command is in-flight.
+        self._lock: Lock = Lock()
+        self._focus_released: Condition = Condition(self._lock)
+        # The ident of the thread that currently owns the focus (if any), and how many times it has claimed it.
+        self._focus_owner: Optional[int] = None
+        self._focus_depth: int = 0
+        # `None` means that the focused window isn't known (yet), and has to be asked for.
+        self._current_handle: Optional[str] = None
+
+        # Observe switches & closes at the command executor, so that the driver's own API is left untouched.
+        self._is_observing: bool = True
+        self._command_executor: Any = driver.command_executor
+        self._execute: Callable[[str, dict], dict] = self._command_executor.execute
+        self._command_executor.execute = self._observe_command
+
+    @classmethod
+    def for_driver(cls, driver: WebDriver) -> WindowFocusManager:
+        """
+        :param driver: A Selenium `WebDriver` object.
+        :type driver: WebDriver
+
+        :return: The focus manager of the given driver, creating it first if needed.
+        :rtype: WindowFocusManager
+        """
+
+        # The manager is kept on the driver itself, so that it lives (and is garbage-collected) along with it.
+        with cls._focus_managers_lock:
+            focus_manager = getattr(driver, '_window_focus_manager', None)
+            if focus_manager is None:
+                focus_manager = driver._window_focus_manager = cls(driver)
+            return focus_manager
+
+    @property
+    def current_handle(self) -> Optional[str]:
+        """
+        :return: The handle of the focused window, or `None` if the focused window has been closed.
+        :rtype: Optional[str]
+        """
+
+        with self._lock:
+            if self._current_handle is not None:
+                return self._current_handle
+        try:
+            current_handle = self._driver.current_window_handle
+        except NoSuchWindowException:
+            return None
+        with self._lock:
+            if self._current_handle is None:
+                self._current_handle = current_handle
+            return self._current_handle
+
+    def forget(self) -> None:
+        """
+        Discard the tracked focus, so that it is asked for again the next time it's needed. (Only necessary if focus
+        may have been changed in a way the manager can't observe, e.g. through another driver object.)
+        """
+
+        with self._lock:
+            self._current_handle = None
+
+    def detach(self) -> None:
+        """
+        Stop observing the driver's commands, and remove this manager from the driver. (`for_driver()` creates a new
+        one the next time it's called.)
+        """
+
+        with self._focus_managers_lock:
+            if getattr(self._driver, '_window_focus_manager', None) is self:
+                del self._driver._window_focus_manager
+        self._is_observing = False
+        # (If something else has wrapped the executor since, this manager simply passes every command through.)
+        if self._command_executor.execute == self._observe_command:
+            self._command_executor.execute = self._execute
+
+    def switch_to(self, handle: str) -> None:
+        """
+        Focus the given window, unless it's already focused. Waits for any other thread that owns the focus to release
+        it first.
+
+        :param handle: A Selenium window handle.
+        :type handle: str
+
+        :raises NoSuchWindowException: If the window has been closed.
+        """
+
+        with self._own_focus():
+            with self._lock:
+                if handle == self._current_handle:
+                    self.skipped_switch_count += 1
+                    return
+            self._driver.switch_to.window(handle)
+
+    @contextmanager
+    def in_window(self, handle: str) -> Iterator[str]:
+        """
+        Focus the given window for the duration of a `with` block, then focus whichever window was focused beforehand
+        (if it's still open.) Blocks may be nested. The calling thread owns the focus for the duration of the block.
+
+        :param handle: A Selenium window handle.
+        :type handle: str
+        """
+
+        with self._own_focus():
+            previous_handle = self.current_handle
+            self.switch_to(handle)
+            try:
+                yield handle
+            finally:
+                if previous_handle:
+                    self._restore(previous_handle)
+
+    def batch(self) -> WindowOperationBatch:
+        """
+        :return: A new, empty batch of per-window operations, to be run against this manager's driver.
+        :rtype: WindowOperationBatch
+        """
+
+        return WindowOperationBatch(self)
+
+    @contextmanager
+    def _own_focus(self) -> Iterator[None]:
+        """
+        Claim ownership of the driver's focus for the calling thread, waiting for any other owner to release it first.
+        Claims are re-entrant, and released once the outermost claim ends. The state lock itself is only held while
+        ownership changes hands, never for the duration of the claim.
+        """
+
+        thread_id = get_ident()
+        with self._focus_released:
+            while self._focus_owner not in (None, thread_id):
+                self._focus_released.wait()
+            self._focus_owner = thread_id
+            self._focus_depth += 1
+        try:
+            yield
+        finally:
+            with self._focus_released:
+                self._focus_depth -= 1
+                if not self._focus_depth:
+                    self._focus_owner = None
+                    self._focus_released.notify_all()
+
+    def _restore(self, handle: str) -> None:
+        try:
+            self.switch_to(handle)
+        except WebDriverException:
+            # The previously-focused window has since closed, so there's nothing to go back to.
+            with self._lock:
+                self._current_handle = None
+
+    def _observe_command(self, command: str, params: dict) -> dict:
+        if not self._is_observing or command not in (Command.SWITCH_TO_WINDOW, Command.CLOSE):
+            return self._execute(command, params)
+
+        try:
+            response = self._execute(command, params)
+        except Exception:
+            with self._lock:
+                self._current_handle = None
+            raise
+
+        with self._lock:
+            if command == Command.CLOSE or not _is_successful_response(response):
+                # The focused window is now gone (or in an unknown state, if the command failed.)
+                self._current_handle = None
+            else:
+                self.switch_count += 1
+                self._current_handle = params.get('handle') or params.get('name')
+        return response
+
+
+class WindowOperationBatch:
+    """
+    A set of operations to run against a driver, each within a particular window. Operations are grouped by window, and
+    each window is switched into exactly once when the batch is run (starting with the window that's already focused,
+    if it has any operations queued), after which the previous focus is restored.
+
+    E.g.:
+        batch = WindowFocusManager.for_driver(driver).batch()
+        for handle in driver.window_handles:
+            batch.add(handle, lambda: driver.title)
+            batch.add(handle, lambda: driver.execute_script('return window.name;'))
+        titles_and_names = batch.run()
+    """
+
+    def __init__(self, focus_manager: WindowFocusManager) -> None:
+        self.closed_handles: Set[str] = set()
+        self._focus_manager: WindowFocusManager = focus_manager
+        self._operations: Dict[str, List[tuple]] = OrderedDict()
+        self._operation_count: int = 0
+
+    def __len__(self) -> int:
+        return self._operation_count
+
+    def add(self, handle: str, operation: Callable, *args, **kwargs) -> int:
+        """
+        Queue an operation to run within the given window.
+
+        :param handle: The Selenium window handle of the window to run the operation within.
+        :type handle: str
+
+        :param operation: A callable to run once the window is focused.
+        :type operation: Callable
+
+        :param args: Arbitrary non-keyworded args to pass into the operation.
+
+        :param kwargs: Arbitrary keyworded args to pass into the operation.
+
+        :return: The index of the operation's result within the list returned by `run()`.
+        :rtype: int
+        """
+
+        index = self._operation_count
+        self._operations.setdefault(handle, []).append((index, operation, args, kwargs))
+        self._operation_count += 1
+        return index
+
+    def run(self) -> List[Any]:
+        """
+        Run every queued operation, then restore the previous focus. The batch is emptied afterwards, so it can be
+        reused.
+
+        :return: The result of every operation, in the order they were added. Operations within windows that had
+                 closed by the time they were visited are skipped and reported as `None` (and those windows are listed
+                 in `closed_handles`.)
+        :rtype: List[Any]
+        """
+
+        results: List[Any] = [None] * self._operation_count
+        operations, self._operations, self._operation_count = self._operations, OrderedDict(), 0
+        self.closed_handles = set()
+        if not operations:
+            return results
+
+        focus_manager = self._focus_manager
+        with focus_manager._own_focus():
+            previous_handle = focus_manager.current_handle
+            # Visit the focused window first (if it has anything queued), so that switching into it is free.
+            handles = sorted(operations, key=lambda handle: handle != previous_handle)
+            try:
+                for handle in handles:
+                    try:
+                        focus_manager.switch_to(handle)
+                    except NoSuchWindowException:
+                        self.closed_handles.add(handle)
+                        continue
+                    for index, operation, args, kwargs in operations[handle]:
+                        try:
+                            results[index] = operation(*args, **kwargs)
+                        except NoSuchWindowException:
+                            # The window closed part-way through its operations.
+                            self.closed_handles.add(handle)
+                            break
+            finally:
+                if previous_handle:
+                    focus_manager._restore(previous_handle)
+
+        return results
+
+
+def _is_successful_response(response: Optional[dict]) -> bool:
+    """
+    :return: Whether or not a raw command response (before Selenium's error handling) reports success, in either the
+             JSON Wire Protocol's format (a non-zero `status`) or the W3C format (an `error` within the `value`.)
+    :rtype: bool
+    """
+
+    if not response:
+        return True
+    value = response.get('value')
+    return not response.get('status') and not (isinstance(value, dict) and 'error' in value)
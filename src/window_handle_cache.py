@@ -0,0 +1,120 @@
+from __future__ import annotations
+import time
+from src.window_focus_manager import WindowFocusManager
+from typing import TYPE_CHECKING, Dict, Iterable, Optional
+if TYPE_CHECKING:
+    from selenium.webdriver.remote.webdriver import WebDriver
+
+
+class WindowHandleMetadataCache:
+    """
+    When Remote Debugging isn't available, the only way to learn the URL & title of each window with "pure" Selenium
+    is to `switch_to.window()` into it and ask - three WebDriver round trips per window. Doing that for every window on
+    every lookup gets very expensive once Finsemble has a few dozen windows open.
+
+    This class remembers what it has already learned about each window handle. Each time the pages are requested, the
+    current `driver.window_handles` is diffed against the previous snapshot: windows that have closed are forgotten,
+    and only windows that are new (or whose cached entry has gone stale) are visited. The cost of a lookup is therefore
+    proportional to the number of new windows, rather than to the number of windows overall.
+
+    Whichever window Selenium was focused on before a lookup is focused again afterwards, and each window is switched
+    into at most once per lookup (see `WindowFocusManager`.)
+    """
+
+    # Pages that haven't finished their initial navigation yet report one of these URLs, which is guaranteed to change
+    # shortly - so they're always re-queried, rather than being cached until they go stale.
+    _PENDING_URLS = ('', 'about:blank')
+
+    def __init__(self, driver: WebDriver, ttl_in_seconds: Optional[float] = 5) -> None:
+        """
+        :param driver: A Selenium `WebDriver` object that is hooked into a Chromium-based application.
+        :type driver: WebDriver
+
+        :param ttl_in_seconds: How long, in seconds, the cached URL & title of a window may be reused before that window
+                               is visited again. Use `None` to never re-visit a window once its URL is known (i.e.
+                               only refresh via `refresh()` or `invalidate()`.)
+        :type ttl_in_seconds: Optional[float]
+        """
+
+        self.ttl_in_seconds: Optional[float] = ttl_in_seconds
+        self._driver: WebDriver = driver
+        self._focus_manager: WindowFocusManager = WindowFocusManager.for_driver(driver)
+        self._pages: Dict[str, dict] = {}
+        self._timestamps: Dict[str, float] = {}
+
+    def get_pages(self) -> dict:
+        """
+        Return every window handle currently visible to Selenium, along with the page URL & title for each one,
+        visiting only the windows that aren't already known (or whose cached entries are stale.)
+
+        :return: A dictionary keyed on Selenium window handles, with each key containing the values "title" and "url"
+                 corresponding to that page.
+        :rtype: dict
+        """
+
+        current_handles = self._driver.window_handles
+
+        # Forget every window that has closed since the last snapshot.
+        for handle in set(self._pages) - set(current_handles):
+            self._forget(handle)
+
+        now = time.monotonic()
+        handles_to_visit = [handle for handle in current_handles if self._is_stale(handle, now)]
+        self._visit(handles_to_visit)
+
+        return {handle: dict(self._pages[handle]) for handle in current_handles if handle in self._pages}
+
+    def refresh(self, handles: Optional[Iterable[str]] = None) -> None:
+        """
+        Immediately re-visit the given windows (or every known window) to update their cached URLs & titles.
+
+        :param handles: The window handles to refresh. If not provided, every window currently visible to Selenium is
+                        refreshed.
+        :type handles: Optional[Iterable[str]]
+        """
+
+        self._visit(list(handles) if handles is not None else self._driver.window_handles)
+
+    def invalidate(self, handles: Optional[Iterable[str]] = None) -> None:
+        """
+        Discard the cached URLs & titles of the given windows (or of every window), so that they'll be visited again
+        during the next call to `get_pages()`.
+
+        :param handles: The window handles to invalidate. If not provided, the entire cache is discarded.
+        :type handles: Optional[Iterable[str]]
+        """
+
+        for handle in (list(handles) if handles is not None else list(self._pages)):
+            self._forget(handle)
+
+    def _is_stale(self, handle: str, now: float) -> bool:
+        if handle not in self._pages or self._pages[handle]['url'] in WindowHandleMetadataCache._PENDING_URLS:
+            return True
+        return self.ttl_in_seconds is not None and now - self._timestamps[handle] >= self.ttl_in_seconds
+
+    def _forget(self, handle: str) -> None:
+        self._pages.pop(handle, None)
+        self._timestamps.pop(handle, None)
+
+    def _visit(self, handles: Iterable[str]) -> None:
+        """
+        Switch into each of the given windows to query its URL & title, then switch back to whichever window was
+        focused beforehand. (The focused window itself, if it's among them, is queried without switching at all.)
+        """
+
+        handles = list(handles)
+        if not handles:
+            return
+
+        batch = self._focus_manager.batch()
+        for handle in handles:
+            batch.add(handle, lambda: {'title': self._driver.title, 'url': self._driver.current_url})
+        pages = batch.run()
+
+        for handle, page in zip(handles, pages):
+            if handle in batch.closed_handles:
+                # The window closed between listing the handles and visiting it.
+                self._forget(handle)
+            else:
+                self._pages[handle] = page
+                self._timestamps[handle] = time.monotonic()